@@ -2,6 +2,10 @@
 Admin 权限管理工具
 为租户管理员提供后台访问权限
 """
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+
 from apps.shops.models import ShopStaff
 
 
@@ -26,52 +30,75 @@ def get_user_tenant(user):
     return None
 
 
-class TenantAdminMixin:
+def is_tenant_manager(request):
     """
-    租户 Admin 混入类
-    为租户管理员提供查看和编辑权限
+    判断当前用户是否为租户的店主或店长
+    结果缓存在 request 上，同一请求内的多次权限检查只查询一次
     """
-
-    def has_view_permission(self, request, obj=None):
-        """控制查看权限"""
-        if request.user.is_superuser:
-            return True
-
-        # 对于非 superuser，检查是否是租户员工（owner 或 manager）
+    cached = getattr(request, '_tenant_manager_cache', None)
+    if cached is not None:
+        return cached
+
+    result = False
+    if request.user.is_superuser:
+        result = True
+    else:
         tenant = getattr(request, 'tenant', None)
         if not tenant:
             # 尝试从用户关联中获取租户
             tenant = get_user_tenant(request.user)
 
         if tenant:
-            return ShopStaff.objects.filter(
+            result = ShopStaff.objects.filter(
                 user=request.user,
                 shop=tenant,
                 is_active=True,
                 role__in=['owner', 'manager']
             ).exists()
 
-        return False
+    request._tenant_manager_cache = result
+    return result
 
-    def has_change_permission(self, request, obj=None):
-        """控制编辑权限"""
-        if request.user.is_superuser:
-            return True
 
-        # 对于非 superuser，检查是否是租户员工（owner 或 manager）
-        tenant = getattr(request, 'tenant', None)
-        if not tenant:
-            tenant = get_user_tenant(request.user)
+class EstimatedCountPaginator(Paginator):
+    """
+    大表分页器
+    未筛选时使用 PostgreSQL 统计信息中的估算行数，避免对大表执行 COUNT(*)
+    """
+    estimate_threshold = 10000
 
-        if tenant:
-            return ShopStaff.objects.filter(
-                user=request.user,
-                shop=tenant,
-                is_active=True,
-                role__in=['owner', 'manager']
-            ).exists()
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+
+        if query is not None and not query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+
+            if row and row[0] and row[0] > self.estimate_threshold:
+                return int(row[0])
+
+        return super().count
 
-        return False
+
+class TenantAdminMixin:
+    """
+    租户 Admin 混入类
+    为租户管理员提供查看和编辑权限
+    """
+
+    def has_view_permission(self, request, obj=None):
+        """控制查看权限"""
+        return is_tenant_manager(request)
+
+    def has_change_permission(self, request, obj=None):
+        """控制编辑权限"""
+        return is_tenant_manager(request)
 
     def has_delete_permission(self, request, obj=None):
         """控制删除权限 - 只有超级管理员可以删除"""
@@ -79,22 +106,16 @@ class TenantAdminMixin:
 
     def has_add_permission(self, request):
         """控制添加权限 - 租户管理员可以添加"""
-        if request.user.is_superuser:
-            return True
+        return is_tenant_manager(request)
 
-        tenant = getattr(request, 'tenant', None)
-        if not tenant:
-            tenant = get_user_tenant(request.user)
-
-        if tenant:
-            return ShopStaff.objects.filter(
-                user=request.user,
-                shop=tenant,
-                is_active=True,
-                role__in=['owner', 'manager']
-            ).exists()
 
-        return False
+class LargeTableAdminMixin:
+    """
+    大表 Admin 混入类
+    使用估算总数分页，并关闭额外的全表计数
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 def get_user_shop_role(user, tenant):
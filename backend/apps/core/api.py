@@ -0,0 +1,97 @@
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .memory import tracker
+
+
+def _tracing_disabled_response():
+    return Response(
+        {'error': '内存分析未启用（MEMORY_PROFILING_ENABLED）'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def _parse_limit(request, default=20):
+    """解析 limit 参数，无效时返回 None"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        return None
+    return limit if limit > 0 else None
+
+
+def _invalid_limit_response():
+    return Response({'error': 'limit 必须为正整数'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def memory_overview(request):
+    """当前 worker 的内存概况和各接口分配统计"""
+    if not tracker.is_tracing:
+        return _tracing_disabled_response()
+
+    limit = _parse_limit(request)
+    if limit is None:
+        return _invalid_limit_response()
+
+    return Response({
+        'traced_memory': tracker.traced_memory(),
+        'endpoints': tracker.endpoint_stats()[:limit],
+        'snapshots': tracker.list_snapshots(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def memory_top(request):
+    """当前内存占用最多的分配位置"""
+    if not tracker.is_tracing:
+        return _tracing_disabled_response()
+
+    limit = _parse_limit(request)
+    if limit is None:
+        return _invalid_limit_response()
+
+    key_type = request.GET.get('group_by', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return Response({'error': '不支持的分组方式'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(tracker.top(limit=limit, key_type=key_type))
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def memory_snapshot(request):
+    """保存一个内存快照"""
+    if not tracker.is_tracing:
+        return _tracing_disabled_response()
+
+    snapshot_id = tracker.take_snapshot(label=request.data.get('label', ''))
+    return Response({'snapshot_id': snapshot_id}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def memory_diff(request):
+    """对比两个快照（未指定 target 时与当前状态对比）"""
+    if not tracker.is_tracing:
+        return _tracing_disabled_response()
+
+    try:
+        base_id = int(request.GET['base'])
+        target_id = int(request.GET['target']) if request.GET.get('target') else None
+    except (KeyError, ValueError):
+        return Response({'error': '请提供有效的 base 快照ID'}, status=status.HTTP_400_BAD_REQUEST)
+
+    limit = _parse_limit(request)
+    if limit is None:
+        return _invalid_limit_response()
+
+    try:
+        stats = tracker.diff(base_id, target_id, limit=limit)
+    except KeyError:
+        return Response({'error': '快照不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(stats)
@@ -0,0 +1,110 @@
+"""
+缓存版本号工具
+为每个租户维护单调递增的版本号，用于 ETag、快照和读缓存失效
+版本号保存在默认缓存中，多进程部署必须使用共享缓存（配置 REDIS_URL）：
+本地内存缓存中每个 worker 各有一份版本号，ETag 不一致，其他 worker 的写入也无法让缓存失效
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+CATALOG_SCOPE = 'catalog'
+
+# 只在当前进程内有效的缓存后端
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias='default'):
+    """默认缓存是否在多个进程间共享（Redis、Memcached、数据库等）"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def _version_key(scope, schema_name):
+    return f'ver:{schema_name}:{scope}'
+
+
+def _initial_version():
+    # 以毫秒时间戳作为初始值，缓存被清空后也不会与旧版本号重复
+    return int(time.time() * 1000)
+
+
+def current_schema_name():
+    """获取当前连接所在的租户 schema"""
+    return getattr(connection, 'schema_name', 'public')
+
+
+def get_version(scope, schema_name=None):
+    """获取指定租户、指定范围的当前版本号"""
+    key = _version_key(scope, schema_name or current_schema_name())
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope, schema_name=None):
+    """递增版本号（在事务提交后执行，避免读到未提交的数据）"""
+    key = _version_key(scope, schema_name or current_schema_name())
+
+    def _bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+
+    transaction.on_commit(_bump)
+
+
+def _item_version_key(scope, schema_name, item_id):
+    return f'ver:{schema_name}:{scope}:{item_id}'
+
+
+def get_item_versions(scope, item_ids, schema_name=None):
+    """
+    获取一组对象各自的版本号 {对象ID: 版本号}
+    读缓存时先读取版本号再构建数据，并把版本号写入缓存键：构建期间发生的失效会递增版本号，
+    构建完成后写入的旧数据落在旧的键上，不会覆盖这次失效
+    """
+    schema_name = schema_name or current_schema_name()
+    keys = {_item_version_key(scope, schema_name, item_id): item_id for item_id in item_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(list(keys)).items()}
+
+    missing = [key for key, item_id in keys.items() if item_id not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial_version(), None)
+        versions.update({keys[key]: version for key, version in cache.get_many(missing).items()})
+    return versions
+
+
+def bump_item_versions(scope, item_ids, schema_name=None):
+    """递增一组对象的版本号（在事务提交后执行）"""
+    schema_name = schema_name or current_schema_name()
+    keys = [_item_version_key(scope, schema_name, item_id) for item_id in item_ids if item_id]
+    if not keys:
+        return
+
+    def _bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, _initial_version(), None)
+
+    transaction.on_commit(_bump)
+
+
+def get_catalog_version(schema_name=None):
+    """获取商品目录版本号"""
+    return get_version(CATALOG_SCOPE, schema_name)
+
+
+def bump_catalog_version(schema_name=None):
+    """商品目录发生变化时递增版本号"""
+    bump_version(CATALOG_SCOPE, schema_name)
@@ -0,0 +1,21 @@
+"""
+部署检查（python manage.py check --deploy）
+"""
+from django.conf import settings
+from django.core.checks import Warning, register, Tags
+
+from .caching import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """版本号、ETag、菜单快照和热点库存计数器都依赖多进程共享的缓存"""
+    if cache_is_shared() or settings.DEBUG:
+        return []
+    return [
+        Warning(
+            '默认缓存为进程内缓存，多 worker 部署时各进程的目录版本号、ETag 和热点库存计数器互不可见',
+            hint='配置 REDIS_URL 使用 Redis 缓存',
+            id='core.W001',
+        )
+    ]
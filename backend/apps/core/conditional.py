@@ -0,0 +1,120 @@
+"""
+条件请求（ETag / Last-Modified）支持
+根据廉价的版本戳判断资源是否变化，未变化时直接返回 304，跳过序列化
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def build_etag(request, version):
+    """由版本戳和请求路径（含查询参数）生成 ETag"""
+    raw = f'{version}|{request.get_full_path()}'
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def _last_modified_timestamp(last_modified):
+    if last_modified is None:
+        return None
+    return int(last_modified.timestamp())
+
+
+def conditional_response(request, handler, version=None, last_modified=None):
+    """
+    执行条件请求判断
+    version: 版本戳（任意可转为字符串的值）
+    last_modified: datetime，资源最后修改时间
+    """
+    if request.method not in ('GET', 'HEAD') or (version is None and last_modified is None):
+        return handler()
+
+    if version is None:
+        version = last_modified.isoformat()
+
+    etag = quote_etag(build_etag(request, version))
+    timestamp = _last_modified_timestamp(last_modified)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    response = handler()
+    if 200 <= response.status_code < 300:
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def conditional_get(version_func=None, last_modified_func=None):
+    """
+    函数视图的条件请求装饰器
+    version_func / last_modified_func 接收 request，返回版本戳 / 最后修改时间
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            version = version_func(request) if version_func else None
+            last_modified = last_modified_func(request) if last_modified_func else None
+            return conditional_response(
+                request,
+                lambda: view_func(request, *args, **kwargs),
+                version=version,
+                last_modified=last_modified
+            )
+
+        return wrapper
+
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    视图集条件请求混入类
+    子类通过 conditional_actions 指定需要支持的操作，并实现 get_conditional_version
+    或 get_conditional_last_modified；只包装视图实际定义的操作，不会给视图新增 list / retrieve。
+    版本戳来自默认缓存（apps.core.caching），多进程部署需使用共享缓存，否则各 worker 的 ETag 不一致。
+    retrieve 先执行 get_object()（归属过滤和对象权限校验）再判断条件请求，无权访问的对象不会返回 304；
+    取到的对象在本次请求内复用，视图不会重复查询
+    """
+    conditional_actions = ('list', 'retrieve')
+    # 判断条件请求前需要先校验对象权限的操作
+    object_actions = ('retrieve',)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for action_name in cls.conditional_actions:
+            handler = getattr(cls, action_name, None)
+            if handler is None or getattr(handler, 'conditional', False):
+                continue
+            setattr(cls, action_name, cls._wrap_action(action_name, handler))
+
+    @staticmethod
+    def _wrap_action(action_name, handler):
+        @wraps(handler)
+        def action(self, request, *args, **kwargs):
+            if action_name in self.object_actions:
+                self._conditional_object = self.get_object()
+            return conditional_response(
+                request,
+                lambda: handler(self, request, *args, **kwargs),
+                version=self.get_conditional_version(request, action_name),
+                last_modified=self.get_conditional_last_modified(request, action_name)
+            )
+
+        action.conditional = True
+        return action
+
+    def get_object(self):
+        obj = getattr(self, '_conditional_object', None)
+        return obj if obj is not None else super().get_object()
+
+    def get_conditional_version(self, request, action_name):
+        return None
+
+    def get_conditional_last_modified(self, request, action_name):
+        return None
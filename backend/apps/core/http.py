@@ -0,0 +1,20 @@
+"""
+HTTP 响应工具
+"""
+from django.http import HttpResponse
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def precompressed_response(request, content, gzip_content=None, content_type='application/json'):
+    """返回预先序列化（及预压缩）的内容，客户端支持 gzip 时直接发送压缩版本"""
+    if gzip_content is not None and accepts_gzip(request):
+        response = HttpResponse(gzip_content, content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(content, content_type=content_type)
+
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.schema import build_stamp, generate_schema, write_schema_artifact
+
+
+class Command(BaseCommand):
+    help = '预生成 OpenAPI Schema 文件（部署构建阶段执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='输出路径（JSON 文件，YAML 和构建标识写在同目录），默认为 API_SCHEMA_PATH')
+        parser.add_argument('--no-gzip', action='store_true', help='不生成 .gz 预压缩文件')
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.API_SCHEMA_PATH
+        artifact = write_schema_artifact(output, generate_schema(), compress=not options['no_gzip'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema 已生成: {output} (版本 {artifact.version}, 构建 {build_stamp()}, {len(artifact.content)} 字节)'
+        ))
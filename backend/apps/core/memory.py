@@ -0,0 +1,151 @@
+"""
+内存分配跟踪（基于 tracemalloc）
+统计按进程进行，每个 worker 各自记录
+"""
+import itertools
+import threading
+import tracemalloc
+from collections import OrderedDict
+
+from django.utils import timezone
+
+_IGNORED_FILES = (
+    tracemalloc.__file__,
+    '<frozen importlib._bootstrap>',
+    '<frozen importlib._bootstrap_external>',
+    '<unknown>',
+)
+
+
+def _format_stat(stat):
+    frame = stat.traceback[0]
+    return {
+        'file': frame.filename,
+        'line': frame.lineno,
+        'size_kb': round(stat.size / 1024, 1),
+        'count': stat.count,
+    }
+
+
+def _format_diff(stat):
+    frame = stat.traceback[0]
+    return {
+        'file': frame.filename,
+        'line': frame.lineno,
+        'size_kb': round(stat.size / 1024, 1),
+        'size_diff_kb': round(stat.size_diff / 1024, 1),
+        'count_diff': stat.count_diff,
+    }
+
+
+class AllocationTracker:
+    """进程内存分配跟踪器"""
+
+    def __init__(self, frames=10, max_snapshots=10, top_limit=10):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self.top_limit = top_limit
+        self._snapshots = OrderedDict()
+        self._snapshot_ids = itertools.count(1)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+            self._endpoints.clear()
+
+    def take_raw_snapshot(self):
+        """获取过滤掉 tracemalloc 自身后的快照（不保存）"""
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces([
+            tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES
+        ])
+
+    def take_snapshot(self, label=''):
+        """保存一个快照，超过上限时丢弃最早的快照"""
+        snapshot = self.take_raw_snapshot()
+        with self._lock:
+            snapshot_id = next(self._snapshot_ids)
+            self._snapshots[snapshot_id] = {
+                'snapshot': snapshot,
+                'label': label,
+                'created_at': timezone.now(),
+            }
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def list_snapshots(self):
+        with self._lock:
+            return [
+                {'id': snapshot_id, 'label': item['label'], 'created_at': item['created_at']}
+                for snapshot_id, item in self._snapshots.items()
+            ]
+
+    def diff(self, base_id, target_id=None, limit=20, key_type='lineno'):
+        """对比两个快照；未指定 target 时与当前内存状态对比"""
+        with self._lock:
+            base = self._snapshots.get(base_id)
+            target = self._snapshots.get(target_id) if target_id else None
+
+        if base is None or (target_id and target is None):
+            raise KeyError('快照不存在')
+
+        target_snapshot = target['snapshot'] if target else self.take_raw_snapshot()
+        stats = target_snapshot.compare_to(base['snapshot'], key_type)
+        return [_format_diff(stat) for stat in stats[:limit]]
+
+    def top(self, limit=20, key_type='lineno'):
+        """当前内存占用最多的分配位置"""
+        stats = self.take_raw_snapshot().statistics(key_type)
+        return [_format_stat(stat) for stat in stats[:limit]]
+
+    def record_request(self, endpoint, size_diff, peak, before=None):
+        """
+        记录一次请求的内存变化
+        before 为请求前的快照（抽样请求才有），用于计算该接口的分配热点
+        """
+        top_sites = None
+        if before is not None:
+            after = self.take_raw_snapshot()
+            top_sites = [
+                _format_diff(stat)
+                for stat in after.compare_to(before, 'lineno')[:self.top_limit]
+            ]
+
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'endpoint': endpoint,
+                'requests': 0,
+                'total_size_diff_kb': 0.0,
+                'max_peak_kb': 0.0,
+                'top_sites': [],
+            })
+            stats['requests'] += 1
+            stats['total_size_diff_kb'] = round(stats['total_size_diff_kb'] + size_diff / 1024, 1)
+            stats['max_peak_kb'] = max(stats['max_peak_kb'], round(peak / 1024, 1))
+            if top_sites is not None:
+                stats['top_sites'] = top_sites
+                stats['sampled_at'] = timezone.now()
+
+    def endpoint_stats(self):
+        with self._lock:
+            stats = [dict(item) for item in self._endpoints.values()]
+        return sorted(stats, key=lambda item: item['max_peak_kb'], reverse=True)
+
+    def traced_memory(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return {'current_kb': round(current / 1024, 1), 'peak_kb': round(peak / 1024, 1)}
+
+
+tracker = AllocationTracker()
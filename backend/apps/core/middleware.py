@@ -1,6 +1,11 @@
 """
-自定义中间件：对 API 请求禁用 CSRF 验证
+自定义中间件：对 API 请求禁用 CSRF 验证、内存分配跟踪
 """
+import random
+import tracemalloc
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 
 
 class DisableCSRFMiddleware:
@@ -19,3 +24,47 @@ class DisableCSRFMiddleware:
 
         response = self.get_response(request)
         return response
+
+
+class AllocationTrackingMiddleware:
+    """
+    按接口统计内存分配（需开启 MEMORY_PROFILING_ENABLED）
+    每个请求记录内存增量和峰值，按 MEMORY_PROFILING_SAMPLE_RATE 抽样计算分配热点
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MEMORY_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+
+        from .memory import tracker
+
+        self.get_response = get_response
+        self.tracker = tracker
+        self.sample_rate = getattr(settings, 'MEMORY_PROFILING_SAMPLE_RATE', 0.0)
+        self.tracker.frames = getattr(settings, 'MEMORY_PROFILING_FRAMES', self.tracker.frames)
+        self.tracker.start()
+
+    def __call__(self, request):
+        if not tracemalloc.is_tracing():
+            return self.get_response(request)
+
+        before = None
+        if self.sample_rate and random.random() < self.sample_rate:
+            before = self.tracker.take_raw_snapshot()
+
+        tracemalloc.reset_peak()
+        start_size, _ = tracemalloc.get_traced_memory()
+
+        response = self.get_response(request)
+
+        end_size, peak = tracemalloc.get_traced_memory()
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else request.path
+        self.tracker.record_request(
+            f'{request.method} /{route}',
+            end_size - start_size,
+            max(peak - start_size, 0),
+            before=before
+        )
+
+        return response
@@ -0,0 +1,168 @@
+"""
+OpenAPI Schema 缓存
+优先读取构建阶段生成的 Schema 文件（JSON / YAML），不存在或构建标识不一致时在进程内生成一次并缓存。
+Schema 文件旁写入构建标识（API_SCHEMA_BUILD，未配置时为后端源码的哈希），代码更新后旧文件不会继续下发
+"""
+import gzip
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from drf_spectacular.renderers import (
+    OpenApiJsonRenderer, OpenApiJsonRenderer2, OpenApiYamlRenderer, OpenApiYamlRenderer2
+)
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from .conditional import conditional_response
+from .http import accepts_gzip, precompressed_response
+
+# 格式 -> (文件后缀, Content-Type)
+SCHEMA_FORMATS = {
+    'json': ('.json', OpenApiJsonRenderer.media_type),
+    'yaml': ('.yaml', OpenApiYamlRenderer.media_type),
+}
+
+_artifacts = {}
+_artifact_lock = threading.Lock()
+
+
+class SchemaArtifact:
+    """已渲染的 Schema 及其压缩版本"""
+
+    def __init__(self, content, gzip_content=None, schema_format='json'):
+        self.content = content
+        self.gzip_content = gzip_content if gzip_content is not None else gzip.compress(content, 9)
+        self.format = schema_format
+        self.version = hashlib.sha256(content).hexdigest()[:16]
+
+    def as_response(self, request):
+        response = precompressed_response(
+            request,
+            self.content,
+            self.gzip_content if accepts_gzip(request) else None,
+            content_type=SCHEMA_FORMATS[self.format][1]
+        )
+        response['X-Schema-Version'] = self.version
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+# 参与计算构建标识的源码目录（相对 BASE_DIR）
+SOURCE_DIRS = ('apps', 'zdrink_core')
+
+
+def build_stamp():
+    """当前代码的构建标识：优先使用 API_SCHEMA_BUILD，未配置时使用源码哈希"""
+    return str(settings.API_SCHEMA_BUILD or source_stamp())
+
+
+@lru_cache(maxsize=None)
+def source_stamp():
+    """后端 Python 源码和 API 文档配置的哈希（每个进程计算一次）"""
+    digest = hashlib.sha256(repr(sorted(settings.SPECTACULAR_SETTINGS.items())).encode('utf-8'))
+    base_dir = Path(settings.BASE_DIR)
+    for directory in SOURCE_DIRS:
+        for path in sorted((base_dir / directory).rglob('*.py')):
+            digest.update(path.relative_to(base_dir).as_posix().encode('utf-8'))
+            digest.update(path.read_bytes())
+    return f'src-{digest.hexdigest()[:16]}'
+
+
+def schema_paths(path):
+    """各格式的 Schema 文件路径和构建标识文件路径"""
+    path = Path(path)
+    files = {schema_format: path.with_suffix(suffix) for schema_format, (suffix, _) in SCHEMA_FORMATS.items()}
+    return files, path.with_suffix('.build')
+
+
+def generate_schema():
+    """生成 Schema 内容，返回 {格式: 字节串}"""
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return render_schema(schema)
+
+
+def render_schema(schema):
+    return {
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+    }
+
+
+def write_schema_artifact(path, contents, compress=True, stamp=None):
+    """写入各格式的 Schema 文件和构建标识，可同时写入 .gz 预压缩版本"""
+    files, stamp_path = schema_paths(path)
+    stamp_path.parent.mkdir(parents=True, exist_ok=True)
+
+    for schema_format, content in contents.items():
+        files[schema_format].write_bytes(content)
+        if compress:
+            Path(f'{files[schema_format]}.gz').write_bytes(gzip.compress(content, 9))
+
+    stamp_path.write_text(build_stamp() if stamp is None else stamp)
+    return SchemaArtifact(contents['json'])
+
+
+def load_schema_artifact(path, schema_format='json', stamp=None):
+    """读取预生成的 Schema 文件，不存在或构建标识不一致时返回 None"""
+    files, stamp_path = schema_paths(path)
+    stamp = build_stamp() if stamp is None else stamp
+    if not stamp_path.exists() or stamp_path.read_text().strip() != stamp:
+        return None
+
+    file_path = files[schema_format]
+    if not file_path.exists():
+        # 只有 JSON 文件时由 JSON 转换为其他格式
+        json_path = files['json']
+        if schema_format == 'json' or not json_path.exists():
+            return None
+        content = render_schema(json.loads(json_path.read_bytes()))[schema_format]
+        return SchemaArtifact(content, schema_format=schema_format)
+
+    gzip_path = Path(f'{file_path}.gz')
+    gzip_content = gzip_path.read_bytes() if gzip_path.exists() else None
+    return SchemaArtifact(file_path.read_bytes(), gzip_content, schema_format)
+
+
+def get_schema_artifact(schema_format='json'):
+    """获取当前进程缓存的 Schema（按构建标识和格式缓存）"""
+    key = (build_stamp(), schema_format)
+    artifact = _artifacts.get(key)
+
+    if artifact is None:
+        with _artifact_lock:
+            artifact = _artifacts.get(key)
+            if artifact is None:
+                artifact = load_schema_artifact(settings.API_SCHEMA_PATH, schema_format, key[0])
+                if artifact is None:
+                    artifact = SchemaArtifact(generate_schema()[schema_format], schema_format=schema_format)
+                _artifacts[key] = artifact
+
+    return artifact
+
+
+class CachedSchemaView(APIView):
+    """
+    返回缓存的 OpenAPI Schema，支持 ETag 和 gzip
+    格式协商与 SpectacularAPIView 一致：?format=json|yaml 或 Accept 头，默认 JSON
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    renderer_classes = [OpenApiJsonRenderer, OpenApiJsonRenderer2, OpenApiYamlRenderer, OpenApiYamlRenderer2]
+    schema = None
+
+    def get(self, request):
+        schema_format = request.accepted_renderer.format
+        artifact = get_schema_artifact(schema_format)
+        return conditional_response(
+            request,
+            lambda: artifact.as_response(request),
+            version=f'{artifact.version}:{schema_format}'
+        )
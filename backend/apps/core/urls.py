@@ -1,3 +1,10 @@
+from django.urls import path
+
+from .api import memory_overview, memory_top, memory_snapshot, memory_diff
+
 urlpatterns = [
-    # 后续添加具体路由
-]
\ No newline at end of file
+    path('debug/memory/', memory_overview, name='memory-overview'),
+    path('debug/memory/top/', memory_top, name='memory-top'),
+    path('debug/memory/snapshots/', memory_snapshot, name='memory-snapshot'),
+    path('debug/memory/diff/', memory_diff, name='memory-diff'),
+]
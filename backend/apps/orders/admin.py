@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 
-from apps.core.admin_utils import TenantAdminMixin
+from apps.core.admin_utils import TenantAdminMixin, LargeTableAdminMixin
 from .models import Cart, CartItem, Order, OrderItem, OrderStatusLog, OrderPayment
 
 
@@ -17,6 +17,11 @@ class CartAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_filter = ['created_at']
     inlines = [CartItemInline]
     readonly_fields = ['total_price', 'total_quantity']
+    list_select_related = ['user']
+
+    def get_queryset(self, request):
+        # total_price / total_quantity 需要遍历商品项及其属性选项
+        return super().get_queryset(request).prefetch_related('items__attribute_options')
 
 
 class OrderItemInline(admin.TabularInline):
@@ -32,7 +37,7 @@ class OrderStatusLogInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(TenantAdminMixin, admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, TenantAdminMixin, admin.ModelAdmin):
     list_display = [
         'order_number', 'customer_name', 'customer_phone', 'status',
         'order_type', 'total_amount', 'created_at', 'order_actions'  # 修改这里
@@ -78,6 +83,7 @@ class OrderPaymentAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_filter = ['payment_method', 'payment_status', 'created_at']
     search_fields = ['order__order_number', 'transaction_id']
     readonly_fields = ['created_at', 'updated_at']
+    list_select_related = ['order']
 
 
 admin.site.register(CartItem)
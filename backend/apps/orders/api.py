@@ -1,7 +1,7 @@
 from datetime import timedelta
 
 from django.db import transaction
-from django.db.models import Count, Sum
+from django.db.models import Count, Max, Sum
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, filters
@@ -9,7 +9,9 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from apps.core.conditional import ConditionalGetMixin
 from .models import Cart, CartItem, Order, OrderItem, OrderStatusLog
+from .services import OrderService
 from .serializers import (
     CartSerializer, CartItemSerializer, AddToCartSerializer,
     OrderListSerializer, OrderDetailSerializer, CreateOrderSerializer,
@@ -117,13 +119,24 @@ class CartItemViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, ModelViewSet):
     """订单视图集"""
     permission_classes = [IsShopOwnerOrStaff]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['order_number', 'customer_name', 'customer_phone']
     ordering_fields = ['created_at', 'total_amount', 'status']
     filterset_fields = ['status', 'order_type', 'payment_status']
+    conditional_actions = ('retrieve',)
+
+    def get_conditional_last_modified(self, request, action_name):
+        # 订单、状态日志和支付记录的最后变更时间
+        stamps = self.get_queryset().filter(pk=self.kwargs.get('pk')).aggregate(
+            order_updated=Max('updated_at'),
+            log_created=Max('status_logs__created_at'),
+            payment_updated=Max('order_payments__updated_at')
+        )
+        values = [value for value in stamps.values() if value is not None]
+        return max(values) if values else None
 
     def get_queryset(self):
         # 基础查询集
@@ -241,32 +254,16 @@ class OrderViewSet(ModelViewSet):
         """取消订单"""
         order = self.get_object()
 
-        if order.status not in ['pending', 'paid', 'confirmed']:
+        order = OrderService(request.tenant, request.user).cancel(
+            order,
+            notes=request.data.get('notes', '用户取消订单')
+        )
+        if order is None:
             return Response(
                 {'error': '当前状态无法取消订单'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        with transaction.atomic():
-            old_status = order.status
-            order.status = 'cancelled'
-            order.save()
-
-            # 恢复库存
-            for item in order.items.all():
-                if item.sku:
-                    item.sku.stock_quantity += item.quantity
-                    item.sku.save()
-
-            # 记录状态变更
-            OrderStatusLog.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status='cancelled',
-                notes=request.data.get('notes', '用户取消订单'),
-                created_by=request.user
-            )
-
         return Response(OrderDetailSerializer(order).data)
 
     @action(detail=False, methods=['get'])
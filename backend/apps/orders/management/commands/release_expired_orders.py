@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.orders.services import OrderService
+
+
+class Command(BaseCommand):
+    help = '取消超时未支付的订单并归还库存（定时执行，多租户下配合 all_tenants_command 使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help='单次最多处理的订单数')
+
+    def handle(self, *args, **options):
+        shop = getattr(connection, 'tenant', None)
+        if shop is None or not hasattr(shop, 'orders'):
+            raise CommandError('请通过 tenant_command / all_tenants_command 在店铺租户下执行')
+
+        released = OrderService(shop).release_expired(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'已取消 {released} 个超时未支付订单'))
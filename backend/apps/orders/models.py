@@ -102,6 +102,7 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=50, blank=True, verbose_name='支付方式')
     payment_status = models.BooleanField(default=False, verbose_name='支付状态')
     paid_at = models.DateTimeField(null=True, blank=True, verbose_name='支付时间')
+    stock_reserved_until = models.DateTimeField(null=True, blank=True, verbose_name='库存保留截止时间')
 
     # 客户信息
     customer_name = models.CharField(max_length=100, verbose_name='客户姓名')
@@ -129,6 +130,14 @@ class Order(models.Model):
         verbose_name = '订单'
         verbose_name_plural = '订单'
         ordering = ['-created_at']
+        indexes = [
+            # 超时未支付订单扫描
+            models.Index(
+                fields=['stock_reserved_until'],
+                name='orders_reservation_idx',
+                condition=models.Q(status='pending', payment_status=False)
+            ),
+        ]
 
     def __str__(self):
         return self.order_number
@@ -3,13 +3,18 @@ from decimal import Decimal
 from django.db import transaction
 from rest_framework import serializers
 
+from apps.products.images import SrcsetField, thumbnail_url
+from apps.products.ingredients import InsufficientIngredientError
 from apps.products.models import Product, ProductSKU
+from apps.products.services import InsufficientStockError
 from .models import Cart, CartItem, Order, OrderItem, OrderStatusLog, OrderPayment
+from .services import OrderService
 
 
 class CartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_image = serializers.CharField(source='product.main_image.url', read_only=True)
+    product_image_srcset = SrcsetField(source='product.main_image_variants')
     sku_info = serializers.SerializerMethodField()
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
@@ -44,8 +49,11 @@ class CartItemSerializer(serializers.ModelSerializer):
         sku = data.get('sku')
         quantity = data.get('quantity', 1)
 
+        if product.status == 'out_of_stock':
+            raise serializers.ValidationError("商品已售罄")
+
         # 验证 SKU 属于该商品
-        if sku and sku.product != product:
+        if sku and sku.product_id != product.pk:
             raise serializers.ValidationError("SKU 不属于该商品")
     
         # 验证库存
@@ -82,6 +90,31 @@ class AddToCartSerializer(serializers.Serializer):
         default=list
     )
     customization = serializers.CharField(required=False, allow_blank=True)
+    # 也可以只传选中的规格值ID，由规格组合键定位 SKU
+    specification_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        write_only=True
+    )
+
+    def validate(self, data):
+        status = Product.objects.filter(pk=data['product_id']).values_list('status', flat=True).first()
+        if status is None:
+            raise serializers.ValidationError('商品不存在')
+        if status == 'out_of_stock':
+            raise serializers.ValidationError('商品已售罄')
+
+        specification_ids = data.pop('specification_ids', None)
+        if specification_ids and not data.get('sku_id'):
+            sku_id = ProductSKU.objects.filter(
+                product_id=data['product_id'],
+                spec_key=ProductSKU.spec_key_for(specification_ids),
+                is_active=True
+            ).values_list('id', flat=True).first()
+            if sku_id is None:
+                raise serializers.ValidationError('没有对应的规格组合')
+            data['sku_id'] = sku_id
+        return data
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -237,6 +270,9 @@ class CreateOrderSerializer(serializers.ModelSerializer):
 
             print(f'[DEBUG] Order totals calculated - subtotal: {order.subtotal}, total: {order.total_amount}')
 
+            # 扣减库存（所有订单商品一次处理）
+            self._reserve_stock(order, request)
+
             # 创建初始状态日志
             OrderStatusLog.objects.create(
                 order=order,
@@ -255,7 +291,7 @@ class CreateOrderSerializer(serializers.ModelSerializer):
                 product=cart_item.product,
                 sku=cart_item.sku,
                 product_name=cart_item.product.name,
-                product_image=cart_item.product.main_image.url if cart_item.product.main_image else '',
+                product_image=thumbnail_url(cart_item.product.main_image, cart_item.product.main_image_variants),
                 specifications=self._get_specifications_data(cart_item.sku),
                 unit_price=cart_item.unit_price,
                 quantity=cart_item.quantity,
@@ -264,11 +300,6 @@ class CreateOrderSerializer(serializers.ModelSerializer):
                 customization=cart_item.customization
             )
 
-            # 更新库存
-            if cart_item.sku:
-                cart_item.sku.stock_quantity -= cart_item.quantity
-                cart_item.sku.save()
-
         # 清空购物车
         cart.items.all().delete()
 
@@ -287,7 +318,7 @@ class CreateOrderSerializer(serializers.ModelSerializer):
                 product=product,
                 sku=sku,
                 product_name=product.name,
-                product_image=product.main_image.url if product.main_image else '',
+                product_image=thumbnail_url(product.main_image, product.main_image_variants),
                 specifications=self._get_specifications_data(sku),
                 unit_price=unit_price,
                 quantity=item_data['quantity'],
@@ -296,10 +327,16 @@ class CreateOrderSerializer(serializers.ModelSerializer):
                 customization=item_data.get('customization', '')
             )
 
-            # 更新库存
-            if sku:
-                sku.stock_quantity -= item_data['quantity']
-                sku.save()
+    def _reserve_stock(self, order, request):
+        """条件更新扣减库存，任一商品库存不足时整单回滚"""
+        user = request.user if request.user.is_authenticated else None
+        try:
+            OrderService(order.shop, user=user).reserve_stock(order)
+        except InsufficientStockError as exc:
+            product_name = order.items.filter(sku_id=exc.sku_id).values_list('product_name', flat=True).first()
+            raise serializers.ValidationError(f'{product_name or "商品"}库存不足')
+        except InsufficientIngredientError as exc:
+            raise serializers.ValidationError(f'原料{exc.name}不足，部分饮品暂时无法制作')
 
     def _get_specifications_data(self, sku):
         if not sku:
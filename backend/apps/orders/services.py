@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.products.ingredients import IngredientService
+from apps.products.services import InventoryService
+from .models import Order, OrderStatusLog
+
+
+class OrderService:
+    """订单库存处理：下单扣减、取消归还、超时未支付释放"""
+    CANCELLABLE_STATUSES = ('pending', 'paid', 'confirmed')
+
+    def __init__(self, shop, user=None):
+        self.shop = shop
+        self.user = user
+        self.inventory = InventoryService(shop, user)
+        self.ingredients = IngredientService(shop, user)
+
+    @staticmethod
+    def _stock_items(order):
+        return order.items.filter(sku__isnull=False).values_list('sku_id', 'quantity')
+
+    @staticmethod
+    def _recipe_items(order):
+        return order.items.values_list('sku_id', 'product_id', 'attribute_selections', 'quantity')
+
+    def reserve_stock(self, order):
+        """
+        按订单商品扣减库存和配方原料（库存不足时抛出 InsufficientStockError，
+        原料不足时抛出 InsufficientIngredientError）
+        未支付订单记录库存保留截止时间，超时后自动取消
+        """
+        hot_mark = len(self.inventory.hot_changes)
+        self.inventory.reserve(self._stock_items(order), reference_id=order.order_number)
+        try:
+            self.ingredients.reserve(self._recipe_items(order), reference_id=order.order_number)
+        except Exception:
+            # 库存扣减随事务回滚，热点 SKU 的缓存计数器需要手动归还
+            self.inventory.revert_hot_changes(hot_mark)
+            raise
+
+        if not order.payment_status:
+            order.stock_reserved_until = timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+            Order.objects.filter(pk=order.pk).update(stock_reserved_until=order.stock_reserved_until)
+
+    def cancel(self, order, notes='用户取消订单', statuses=CANCELLABLE_STATUSES):
+        """
+        取消订单并归还库存
+        锁定订单行后再判断状态，重复取消或与超时释放并发时只归还一次；状态不允许时返回 None
+        """
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            if order.status not in statuses:
+                return None
+
+            old_status = order.status
+            order.status = 'cancelled'
+            order.stock_reserved_until = None
+            order.save()
+
+            self.inventory.release(
+                self._stock_items(order),
+                reference_id=order.order_number,
+                notes='订单取消恢复库存'
+            )
+            self.ingredients.release(order.order_number)
+
+            OrderStatusLog.objects.create(
+                order=order,
+                old_status=old_status,
+                new_status='cancelled',
+                notes=notes,
+                created_by=self.user
+            )
+
+        return order
+
+    def release_expired(self, now=None, limit=500):
+        """取消保留时间已到的未支付订单，返回取消数量"""
+        now = now or timezone.now()
+        expired_ids = list(
+            Order.objects.filter(
+                shop=self.shop,
+                status='pending',
+                payment_status=False,
+                stock_reserved_until__lte=now
+            ).values_list('pk', flat=True)[:limit]
+        )
+
+        released = 0
+        for order_id in expired_ids:
+            with transaction.atomic():
+                order = Order.objects.select_for_update().get(pk=order_id)
+                # 加锁后重新确认，期间可能已支付
+                if order.payment_status or not order.stock_reserved_until or order.stock_reserved_until > now:
+                    continue
+                if self.cancel(order, notes='超时未支付，自动取消', statuses=('pending',)):
+                    released += 1
+        return released
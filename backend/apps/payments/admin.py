@@ -8,6 +8,7 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ['name', 'code', 'shop', 'is_active', 'sort_order']
     list_filter = ['code', 'is_active', 'shop']
     search_fields = ['name', 'code']
+    list_select_related = ['shop']
 
 @admin.register(PaymentTransaction)
 class PaymentTransactionAdmin(admin.ModelAdmin):
@@ -15,19 +16,23 @@ class PaymentTransactionAdmin(admin.ModelAdmin):
     list_filter = ['status', 'payment_method', 'created_at']
     search_fields = ['transaction_no', 'order__order_number']
     readonly_fields = ['transaction_no', 'created_at', 'updated_at']
+    list_select_related = ['order', 'payment_method__shop']
 
 @admin.register(RefundRequest)
 class RefundRequestAdmin(admin.ModelAdmin):
     list_display = ['refund_no', 'transaction', 'refund_amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['refund_no', 'transaction__transaction_no']
+    list_select_related = ['transaction']
 
 @admin.register(WechatPayConfig)
 class WechatPayConfigAdmin(admin.ModelAdmin):
     list_display = ['shop', 'app_id', 'mch_id', 'is_active']
     list_filter = ['is_active']
+    list_select_related = ['shop']
 
 @admin.register(AlipayConfig)
 class AlipayConfigAdmin(admin.ModelAdmin):
     list_display = ['shop', 'app_id', 'is_active']
-    list_filter = ['is_active']
\ No newline at end of file
+    list_filter = ['is_active']
+    list_select_related = ['shop']
\ No newline at end of file
@@ -55,22 +55,11 @@ class POSViewSet(ModelViewSet):
 
         if serializer.is_valid():
             barcode = serializer.validated_data['barcode']
-            barcode_service = BarcodeService(request.tenant)
-
-            # 先尝试扫描商品
-            product_info = barcode_service.scan_product(barcode)
-            if product_info:
-                return Response({
-                    'type': 'product',
-                    'data': product_info
-                })
-
-            # 尝试扫描会员卡
-            member_info = barcode_service.scan_member_card(barcode)
-            if member_info:
+            scan_type, data = BarcodeService(request.tenant).resolve(barcode)
+            if scan_type:
                 return Response({
-                    'type': 'member',
-                    'data': member_info
+                    'type': scan_type,
+                    'data': data
                 })
 
             return Response(
@@ -230,6 +219,9 @@ def pos_dashboard(request):
         total_quantity=Sum('quantity')
     ).order_by('-total_quantity')[:10]
 
+    # 收银台打开时预热条码映射
+    BarcodeService(request.tenant).warm()
+
     dashboard_data = {
         'today_stats': {
             'total_orders': today_orders.count(),
@@ -309,6 +301,9 @@ def start_cashier_shift(request):
 
         # 保存班次信息到数据库或缓存
 
+        # 开班时预热条码映射
+        BarcodeService(request.tenant).warm()
+
         return Response({
             'message': '班次开始成功',
             'shift_data': shift_data
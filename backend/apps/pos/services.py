@@ -1,3 +1,4 @@
+import time
 import uuid
 from decimal import Decimal
 
@@ -14,6 +15,8 @@ class POSService:
     def create_quick_order(self, order_data, user=None):
         """创建快速订单（收银台用）"""
         from apps.orders.models import Order, OrderItem
+        from apps.orders.services import OrderService
+        from apps.products.images import thumbnail_url
         from apps.products.models import Product, ProductSKU
 
         with transaction.atomic():
@@ -66,7 +69,7 @@ class POSService:
                         product=product,
                         sku=sku if sku_id else None,
                         product_name=product.name,
-                        product_image=product.main_image.url if product.main_image else '',
+                        product_image=thumbnail_url(product.main_image, product.main_image_variants),
                         specifications=specifications,
                         unit_price=unit_price,
                         quantity=quantity,
@@ -75,14 +78,12 @@ class POSService:
                         customization=item_data.get('customization', '')
                     )
 
-                    # 更新库存
-                    if sku_id:
-                        sku.stock_quantity = max(0, sku.stock_quantity - quantity)
-                        sku.save()
-
                 except (Product.DoesNotExist, ProductSKU.DoesNotExist):
                     continue
 
+            # 扣减库存和配方原料（库存 / 原料不足时抛出异常，整单回滚）
+            OrderService(self.shop, user=user).reserve_stock(order)
+
             # 更新订单金额
             order.subtotal = subtotal
             order.total_amount = subtotal
@@ -203,49 +204,31 @@ class BarcodeService:
         self.shop = shop
 
     def scan_product(self, barcode):
-        """扫描条码获取商品信息"""
-        from apps.products.models import Product, ProductSKU
+        """扫描条码获取商品信息（进程内条码映射，见 apps.products.barcodes）"""
+        from apps.products.barcodes import BarcodeIndexService
 
-        # 先搜索SKU条码
-        sku = ProductSKU.objects.filter(
-            product__shop=self.shop,
-            barcode=barcode
-        ).first()
+        return BarcodeIndexService(self.shop).lookup(barcode)
 
-        if sku:
-            return {
-                'type': 'sku',
-                'id': sku.id,
-                'product_id': sku.product.id,
-                'name': sku.product.name,
-                'price': sku.price,
-                'stock_quantity': sku.stock_quantity,
-                'specifications': [
-                    {
-                        'name': spec.specification.display_name,
-                        'value': spec.display_value
-                    } for spec in sku.specifications.all()
-                ]
-            }
+    def warm(self):
+        """预热条码映射，开班和打开工作台时调用，避免第一次扫码时构建"""
+        from apps.products.barcodes import BarcodeIndexService
 
-        # 搜索商品条码
-        product = Product.objects.filter(
-            shop=self.shop,
-            barcode=barcode
-        ).first()
+        return BarcodeIndexService(self.shop).warm()
 
-        if product:
-            return {
-                'type': 'product',
-                'id': product.id,
-                'product_id': product.id,
-                'name': product.name,
-                'price': product.base_price,
-                'stock_quantity': 'N/A',  # 商品本身没有库存，SKU才有
-                'specifications': []
-            }
+    def resolve(self, code):
+        """
+        统一扫码入口：先查商品条码，再查会员卡
+        返回 (类型, 数据)，未找到时返回 (None, None)
+        """
+        product_info = self.scan_product(code)
+        if product_info:
+            return 'product', product_info
 
-        return None
+        member_info = self.scan_member_card(code.strip())
+        if member_info:
+            return 'member', member_info
+
+        return None, None
 
     def scan_member_card(self, card_number):
         """扫描会员卡"""
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from apps.core.admin_utils import LargeTableAdminMixin
 from .models import Printer, PrintTemplate, PrintTask, PrintLog
 
 
@@ -8,6 +9,7 @@ class PrinterAdmin(admin.ModelAdmin):
     list_display = ['name', 'printer_type', 'brand', 'shop', 'is_online', 'is_active']
     list_filter = ['printer_type', 'brand', 'is_online', 'is_active', 'shop']
     search_fields = ['name', 'device_no']
+    list_select_related = ['shop']
 
     actions = ['test_connection']
 
@@ -30,6 +32,7 @@ class PrintTemplateAdmin(admin.ModelAdmin):
     list_display = ['name', 'template_type', 'shop', 'is_default', 'is_active']
     list_filter = ['template_type', 'is_default', 'is_active', 'shop']
     search_fields = ['name']
+    list_select_related = ['shop']
 
 
 @admin.register(PrintTask)
@@ -38,11 +41,14 @@ class PrintTaskAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     search_fields = ['task_id', 'printer__name']
     readonly_fields = ['created_at', 'updated_at']
+    list_select_related = ['printer__shop']
 
 
 @admin.register(PrintLog)
-class PrintLogAdmin(admin.ModelAdmin):
+class PrintLogAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['printer', 'content_type', 'reference_id', 'is_success', 'created_at']
     list_filter = ['content_type', 'is_success', 'created_at']
     search_fields = ['printer__name', 'reference_id']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+    list_select_related = ['printer__shop']
+    raw_id_fields = ['printer', 'task']
\ No newline at end of file
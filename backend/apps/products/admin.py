@@ -1,24 +1,21 @@
 from django.contrib import admin
 
-from apps.core.admin_utils import TenantAdminMixin
+from apps.core.admin_utils import TenantAdminMixin, LargeTableAdminMixin
 from .models import (
     Category, Product, Specification, SpecificationValue,
     ProductSKU, ProductAttribute, ProductAttributeOption,
-    InventoryLog, ProductImage
+    InventoryLog, ProductImage, StockAlert, StockSnapshot, ProductBarcode,
+    Ingredient, RecipeItem, IngredientLog
 )
 
 
 @admin.register(Category)
 class CategoryAdmin(TenantAdminMixin, admin.ModelAdmin):
-    list_display = ('name', 'parent', 'sort_order', 'is_active', 'products_count')
+    list_display = ('name', 'parent', 'depth', 'sort_order', 'is_active', 'children_count', 'products_count')
     list_filter = ('is_active', 'shop')
     search_fields = ('name',)
     ordering = ('sort_order', 'name')
-
-    def products_count(self, obj):
-        return obj.products.count()
-
-    products_count.short_description = '商品数量'
+    list_select_related = ('parent',)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -35,6 +32,7 @@ class ProductAttributeOptionInline(admin.TabularInline):
 class ProductAttributeAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'product', 'attribute_type', 'is_required', 'sort_order')
     list_filter = ('attribute_type', 'is_required')
+    list_select_related = ('product',)
     inlines = [ProductAttributeOptionInline]
 
 
@@ -51,6 +49,7 @@ class ProductAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_filter = ('status', 'is_featured', 'category', 'shop')
     search_fields = ('name', 'description')
     ordering = ('-created_at',)
+    list_select_related = ('category',)
     inlines = [ProductSKUInline, ProductImageInline]
 
     fieldsets = (
@@ -66,12 +65,33 @@ class ProductAdmin(TenantAdminMixin, admin.ModelAdmin):
     )
 
 
+class ProductBarcodeInline(admin.TabularInline):
+    model = ProductBarcode
+    fk_name = 'sku'
+    extra = 1
+    fields = ('barcode',)
+
+
+class RecipeItemInline(admin.TabularInline):
+    model = RecipeItem
+    fk_name = 'sku'
+    extra = 1
+    fields = ('ingredient', 'quantity')
+    raw_id_fields = ('ingredient',)
+
+
 @admin.register(ProductSKU)
 class ProductSKUAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_display = ('sku_code', 'product', 'price', 'stock_quantity', 'is_in_stock', 'is_low_stock')
     list_filter = ('is_active', 'product__shop')
-    search_fields = ('sku_code', 'product__name')
+    search_fields = ('sku_code', 'product__name', 'barcodes__barcode')
     filter_horizontal = ('specifications',)
+    list_select_related = ('product',)
+    inlines = [ProductBarcodeInline, RecipeItemInline]
+
+    def get_queryset(self, request):
+        # SKU 的 __str__ 会读取规格值
+        return super().get_queryset(request).prefetch_related('specifications__specification')
 
     def is_in_stock(self, obj):
         return obj.is_in_stock
@@ -91,6 +111,7 @@ class SpecificationAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'display_name', 'shop', 'sort_order')
     list_filter = ('shop',)
     search_fields = ('name', 'display_name')
+    list_select_related = ('shop',)
 
 
 @admin.register(SpecificationValue)
@@ -98,14 +119,65 @@ class SpecificationValueAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_display = ('specification', 'value', 'display_value', 'sort_order')
     list_filter = ('specification',)
     search_fields = ('value', 'display_value')
+    list_select_related = ('specification',)
 
 
 @admin.register(InventoryLog)
-class InventoryLogAdmin(TenantAdminMixin, admin.ModelAdmin):
+class InventoryLogAdmin(LargeTableAdminMixin, TenantAdminMixin, admin.ModelAdmin):
     list_display = ('sku', 'action', 'quantity_change', 'current_quantity', 'created_at')
     list_filter = ('action', 'created_at')
     search_fields = ('sku__product__name', 'reference_id')
     readonly_fields = ('created_at',)
+    list_select_related = ('sku__product',)
+    raw_id_fields = ('sku', 'created_by')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('sku__specifications__specification')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(LargeTableAdminMixin, TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('sku', 'stock_quantity', 'threshold', 'created_at', 'notified_at', 'resolved_at')
+    list_filter = ('created_at',)
+    search_fields = ('sku__product__name', 'sku__sku_code')
+    list_select_related = ('sku__product',)
+    raw_id_fields = ('sku',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(LargeTableAdminMixin, TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('sku', 'date', 'stock_quantity')
+    list_filter = ('date',)
+    search_fields = ('sku__product__name', 'sku__sku_code')
+    list_select_related = ('sku__product',)
+    raw_id_fields = ('sku',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'unit', 'stock_quantity', 'low_stock_threshold', 'is_active')
+    list_filter = ('is_active', 'unit')
+    search_fields = ('name',)
+    # 库存通过调整接口变更（写流水）
+    readonly_fields = ('stock_quantity',)
+
+
+@admin.register(IngredientLog)
+class IngredientLogAdmin(LargeTableAdminMixin, TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('ingredient', 'action', 'quantity_change', 'current_quantity', 'reference_id', 'created_at')
+    list_filter = ('action', 'created_at')
+    search_fields = ('ingredient__name', 'reference_id')
+    list_select_related = ('ingredient',)
+    raw_id_fields = ('ingredient', 'created_by')
 
     def has_add_permission(self, request):
         return False
@@ -0,0 +1,121 @@
+"""
+低库存预警
+库存写入路径（订单扣减 / 取消归还、手动调整、批量设置、热点库存同步）在持有行锁的事务中
+拿到变更前后的库存，据此判断是否跨过阈值：向下跨过时新建一条预警（同一 SKU 同时只有一条未解除的预警），
+回升到阈值以上时解除。每次跨越只产生一次预警，不需要周期性扫描全部 SKU。
+通知由 send_stock_alerts 汇总发送，STOCK_ALERT_DEBOUNCE_SECONDS 内最多发送一次。
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.core.caching import bump_version, get_version
+from .models import StockAlert
+
+logger = logging.getLogger(__name__)
+
+# 低库存列表版本号（低库存接口的 ETag）
+STOCK_ALERT_SCOPE = 'stock_alerts'
+
+
+def get_stock_alert_version(schema_name=None):
+    return get_version(STOCK_ALERT_SCOPE, schema_name)
+
+
+def bump_stock_alert_version(schema_name=None):
+    bump_version(STOCK_ALERT_SCOPE, schema_name)
+
+
+def record_stock_changes(changes):
+    """
+    检测阈值跨越，需在更新库存的事务中调用
+    changes: [(sku_id, 变更前库存, 变更后库存, 预警阈值)]；返回新产生预警的 SKU ID
+    变更前或变更后处于阈值以下（预警产生、解除，或低库存列表中的库存数量变化）时递增低库存列表版本号
+    """
+    if any(before <= threshold or after <= threshold for _, before, after, threshold in changes):
+        bump_stock_alert_version()
+
+    raised = [
+        (sku_id, after, threshold)
+        for sku_id, before, after, threshold in changes
+        if before > threshold >= after
+    ]
+    recovered = [
+        sku_id for sku_id, before, after, threshold in changes
+        if before <= threshold < after
+    ]
+
+    if recovered:
+        StockAlert.objects.filter(sku_id__in=recovered, resolved_at__isnull=True).update(
+            resolved_at=timezone.now()
+        )
+    if not raised:
+        return []
+
+    StockAlert.objects.bulk_create(
+        [
+            StockAlert(sku_id=sku_id, stock_quantity=after, threshold=threshold)
+            for sku_id, after, threshold in raised
+        ],
+        ignore_conflicts=True
+    )
+
+    return [sku_id for sku_id, _, _ in raised]
+
+
+class StockAlertNotifier:
+    """低库存预警通知（邮件发送给店铺邮箱和店主、店长）"""
+
+    def __init__(self, shop, debounce_seconds=None):
+        self.shop = shop
+        self.debounce = timedelta(seconds=(
+            settings.STOCK_ALERT_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        ))
+
+    def recipients(self):
+        from apps.shops.models import ShopStaff
+
+        emails = set(ShopStaff.objects.filter(
+            shop=self.shop, is_active=True, role__in=['owner', 'manager']
+        ).exclude(user__email='').values_list('user__email', flat=True))
+        if self.shop.email:
+            emails.add(self.shop.email)
+        return sorted(emails)
+
+    def send_pending(self, now=None):
+        """发送待通知的预警，距离上次通知不足防抖间隔时跳过；返回通知的预警数量"""
+        now = now or timezone.now()
+        last_sent = StockAlert.objects.aggregate(last=Max('notified_at'))['last']
+        if last_sent and now - last_sent < self.debounce:
+            return 0
+
+        alerts = list(StockAlert.objects.filter(
+            notified_at__isnull=True, resolved_at__isnull=True
+        ).select_related('sku__product').order_by('created_at'))
+        if not alerts:
+            return 0
+
+        recipients = self.recipients()
+        if recipients:
+            lines = [
+                f'{alert.sku.product.name}（{alert.sku.sku_code}）：剩余 {alert.stock_quantity}，预警阈值 {alert.threshold}'
+                for alert in alerts
+            ]
+            try:
+                send_mail(
+                    f'【{self.shop.name}】{len(alerts)} 个商品库存不足',
+                    '\n'.join(lines),
+                    None,
+                    recipients
+                )
+            except Exception:
+                # 未标记为已通知，下次重试
+                logger.exception('低库存预警通知发送失败: %s', self.shop.schema_name)
+                return 0
+
+        StockAlert.objects.filter(pk__in=[alert.pk for alert in alerts]).update(notified_at=now)
+        return len(alerts)
@@ -1,31 +1,110 @@
-import csv
-
-from django.db import transaction, models
-from django.db.models import Prefetch
-from django.http import HttpResponse
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import DecimalField, Exists, Max, Min, OuterRef, Subquery
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, status, filters, viewsets
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from apps.core.admin_utils import is_shop_owner_or_manager
+from apps.core.caching import get_catalog_version
+from apps.core.conditional import ConditionalGetMixin, conditional_get
+from apps.core.http import accepts_gzip, precompressed_response
+from apps.shops.models import Shop
 from .models import (
-    Category, Product, Specification, ProductSKU, InventoryLog
+    Category, Product, Specification, ProductSKU, InventoryLog, ProductBarcode, Ingredient, RecipeItem
 )
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
     ProductCreateSerializer, SpecificationSerializer, ProductSKUSerializer, InventoryLogSerializer,
-    StockAdjustmentSerializer, BulkStockUpdateSerializer, ProductExportSerializer
+    StockAdjustmentSerializer, BulkStockUpdateSerializer, ProductBarcodeSerializer,
+    IngredientSerializer, RecipeItemSerializer, IngredientLogSerializer, IngredientAdjustmentSerializer
+)
+from .alerts import get_stock_alert_version
+from .autocomplete import AutocompleteService
+from .changes import CatalogChangeFeed
+from .cloning import CatalogCloner
+from .exports import stream_csv, xlsx_response
+from .hotstock import HotStockService, HotStockUnavailable
+from .imports import ProductImporter, read_rows
+from .ingredients import IngredientService, InsufficientIngredientError, get_ingredient_version
+from .search import ProductSearchFilter, search_products
+from .services import InventoryService, MenuSnapshotService, ProductDetailCache
+from .stockhistory import StockHistoryService, day_end
+
+
+# 商品列表序列化器需要的字段
+PRODUCT_LIST_FIELDS = (
+    'id', 'name', 'category', 'category__name', 'base_price', 'main_image', 'main_image_variants',
+    'status', 'is_featured', 'sort_order', 'created_at'
 )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def catalog_version(request):
+    """当前租户的商品目录版本号（用于 ETag）"""
+    return get_catalog_version(request.tenant.schema_name)
+
+
+def stock_alert_version(request):
+    """低库存列表的 ETag 版本戳"""
+    schema_name = request.tenant.schema_name
+    return f'{get_catalog_version(schema_name)}:{get_stock_alert_version(schema_name)}'
+
+
+def category_tree_path(shop, category_id):
+    """分类的物化路径（用于子树筛选），分类不存在时返回 None"""
+    if not str(category_id).isdigit():
+        raise ValidationError({'category_tree': '分类ID无效'})
+    return Category.objects.filter(shop=shop, pk=category_id).values_list('path', flat=True).first()
+
+
+def filter_category_tree(queryset, shop, category_id):
+    """筛选分类子树（含自身及所有子孙分类）下的商品"""
+    path = category_tree_path(shop, category_id)
+    if not path:
+        return queryset.none()
+    return queryset.filter(category__path__startswith=path)
+
+
+def _active_sku_price(aggregate):
+    return Subquery(
+        ProductSKU.objects.filter(product=OuterRef('pk'), is_active=True).order_by().values(
+            'product'
+        ).annotate(value=aggregate('price')).values('value')[:1],
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+def annotate_price_range(queryset):
+    """
+    为商品列表标注价格区间和多规格标记（ProductListSerializer 的 min_price / max_price / has_variants）
+    使用相关子查询，不引入 GROUP BY，可以和搜索排序等注解组合
+    """
+    return queryset.annotate(
+        min_price=_active_sku_price(Min),
+        max_price=_active_sku_price(Max),
+        has_variants=Exists(ProductSKU.objects.filter(product=OuterRef('pk'), is_active=True))
+    )
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    trust_token_claims = True
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name']
     ordering_fields = ['sort_order', 'name', 'created_at']
+    conditional_actions = ('list',)
+
+    def get_conditional_version(self, request, action_name):
+        return catalog_version(request)
 
     def get_queryset(self):
         return Category.objects.filter(shop=self.request.tenant)
@@ -37,25 +116,33 @@ class CategoryViewSet(viewsets.ModelViewSet):
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()  # 添加这一行
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    trust_token_claims = True
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
     ordering_fields = ['sort_order', 'name', 'base_price', 'created_at']
     filterset_fields = ['category', 'status', 'is_featured']
 
     def get_queryset(self):
-        queryset = Product.objects.filter(shop=self.request.tenant).select_related(
-            'category', 'created_by'
-        ).prefetch_related(
-            'skus', 'attributes', 'product_images'
-        )
+        queryset = Product.objects.filter(shop=self.request.tenant)
+
+        category_tree = self.request.query_params.get('category_tree')
+        if category_tree:
+            queryset = filter_category_tree(queryset, self.request.tenant, category_tree)
+
+        # 导出使用聚合注解逐行读取，不需要预取
+        if self.action == 'export':
+            return queryset
 
-        # 根据action优化查询
+        # 根据action优化查询：列表只取序列化需要的列，价格区间由子查询计算
         if self.action == 'list':
-            return queryset.only(
-                'id', 'name', 'category', 'base_price', 'main_image',
-                'status', 'is_featured', 'sort_order', 'created_at'
+            return annotate_price_range(
+                queryset.select_related('category').only(*PRODUCT_LIST_FIELDS)
             )
-        return queryset
+        return queryset.select_related(
+            'category', 'created_by'
+        ).prefetch_related(
+            'skus__barcodes', 'attributes', 'product_images'
+        )
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -67,67 +154,111 @@ class ProductViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(shop=self.request.tenant, created_by=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """商品详情（读缓存，库存由短时覆盖层提供）"""
+        # 归属、筛选参数（如 category_tree）和对象权限每次都校验，只查询主键；序列化结果走缓存
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        product = get_object_or_404(queryset.only('pk'), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, product)
+
+        data = ProductDetailCache(request.tenant.schema_name).get(
+            product.pk, lambda: self.get_queryset().get(pk=product.pk), request=request
+        )
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def export(self, request):
-        """导出商品数据"""
-        products = self.get_queryset()
-        serializer = ProductExportSerializer(products, many=True)
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="products_export.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['ID', '商品名称', '分类', '基础价格', '状态', 'SKU数量', '总库存', '创建时间'])
-
-        for product in serializer.data:
-            writer.writerow([
-                product['id'],
-                product['name'],
-                product['category_name'],
-                product['base_price'],
-                product['status'],
-                product['sku_count'],
-                product['total_stock'],
-                product['created_at'],
-            ])
-
-        return response
+        """
+        导出商品数据（流式输出，支持筛选参数）
+        file_format: csv（默认）或 xlsx
+        """
+        products = self.filter_queryset(self.get_queryset())
+
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format == 'xlsx':
+            return xlsx_response(products)
+        if file_format != 'csv':
+            return Response({'error': '不支持的导出格式'}, status=status.HTTP_400_BAD_REQUEST)
+        return stream_csv(products)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_catalog(self, request):
+        """
+        批量导入商品（CSV / XLSX，每行一个 SKU）
+        dry_run=true 时只校验，返回逐行错误报告
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': '请上传导入文件'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = 'xlsx' if upload.name.lower().endswith('.xlsx') else 'csv'
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+
+        importer = ProductImporter(request.tenant, user=request.user, dry_run=dry_run)
+        return Response(importer.run(read_rows(upload, file_format)))
 
     @action(detail=True, methods=['post'])
     def duplicate(self, request, pk=None):
-        """复制商品"""
+        """复制商品（SKU、规格组合、属性、图集按层级批量写入，SKU 编码重新生成，库存为 0）"""
         product = self.get_object()
+        copy = CatalogCloner(request.tenant, user=request.user).duplicate(product)
 
-        # 复制商品基本信息
-        product.pk = None
-        product.name = f"{product.name} (副本)"
-        product.status = 'draft'
-        product.save()
-
-        # 复制SKU
-        for sku in product.skus.all():
-            sku.pk = None
-            sku.product = product
-            sku.save()
-
-        # 复制属性
-        for attribute in product.attributes.all():
-            attribute.pk = None
-            attribute.product = product
-            attribute.save()
-
-        serializer = ProductDetailSerializer(product)
+        serializer = ProductDetailSerializer(self.get_queryset().get(pk=copy.pk))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='copy-to-shops')
+    def copy_to_shops(self, request):
+        """
+        复制商品目录到其他店铺
+        参数: shop_ids，以及 product_ids / category_id 二选一（都不传时复制整个上架菜单）
+        需要是来源店铺和目标店铺的店主或店长
+        """
+        if not is_shop_owner_or_manager(request.user, request.tenant):
+            return Response({'error': '只有店主或店长可以复制商品目录'}, status=status.HTTP_403_FORBIDDEN)
+
+        shop_ids = request.data.get('shop_ids') or []
+        targets = list(Shop.objects.filter(pk__in=shop_ids).exclude(pk=request.tenant.pk))
+        if not targets:
+            return Response({'error': '请选择目标店铺'}, status=status.HTTP_400_BAD_REQUEST)
+        forbidden = [shop.pk for shop in targets if not is_shop_owner_or_manager(request.user, shop)]
+        if forbidden:
+            return Response(
+                {'error': '没有目标店铺的管理权限', 'shop_ids': forbidden},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
-class SpecificationViewSet(viewsets.ModelViewSet):
+        product_ids = request.data.get('product_ids')
+        category_id = request.data.get('category_id')
+        if category_id and not Category.objects.filter(shop=request.tenant, pk=category_id).exists():
+            return Response({'error': '分类不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+        results = {}
+        for shop in targets:
+            cloner = CatalogCloner(request.tenant, shop, user=request.user)
+            if product_ids:
+                products = cloner.copy_products(product_ids)
+            elif category_id:
+                products = cloner.copy_category(category_id)
+            else:
+                products = cloner.copy_menu()
+            results[shop.pk] = len(products)
+
+        return Response({'copied': results})
+
+
+class SpecificationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Specification.objects.all()
     serializer_class = SpecificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    trust_token_claims = True
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'display_name']
     ordering_fields = ['sort_order', 'name']
 
+    def get_conditional_version(self, request, action_name):
+        return catalog_version(request)
+
     def get_queryset(self):
         return Specification.objects.filter(shop=self.request.tenant).prefetch_related('values')
 
@@ -135,10 +266,84 @@ class SpecificationViewSet(viewsets.ModelViewSet):
         serializer.save(shop=self.request.tenant)
 
 
+class ProductBarcodeViewSet(viewsets.ModelViewSet):
+    """商品条码（一个 SKU 可以有多个条码），变更后收银台条码映射自动失效"""
+    queryset = ProductBarcode.objects.all()
+    serializer_class = ProductBarcodeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['product', 'sku']
+    search_fields = ['barcode', 'product__name']
+
+    def get_queryset(self):
+        return ProductBarcode.objects.filter(product__shop=self.request.tenant)
+
+
+class IngredientViewSet(viewsets.ModelViewSet):
+    """原料（库存通过 adjust 调整或随订单按配方扣减）"""
+    queryset = Ingredient.objects.all()
+    serializer_class = IngredientSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['is_active', 'unit']
+    search_fields = ['name']
+
+    def get_queryset(self):
+        return Ingredient.objects.filter(shop=self.request.tenant)
+
+    def perform_create(self, serializer):
+        serializer.save(shop=self.request.tenant)
+
+    @action(detail=True, methods=['post'])
+    def adjust(self, request, pk=None):
+        """入库、报损、盘点调整（写原料流水）"""
+        ingredient = self.get_object()
+        serializer = IngredientAdjustmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            current_stock = IngredientService(request.tenant, request.user).adjust(
+                ingredient.pk,
+                serializer.validated_data['quantity_change'],
+                serializer.validated_data['action'],
+                serializer.validated_data.get('notes', '')
+            )
+        except InsufficientIngredientError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': '原料库存调整成功', 'current_stock': current_stock})
+
+    @action(detail=True, methods=['get'])
+    def logs(self, request, pk=None):
+        """原料流水"""
+        logs = self.get_object().logs.select_related('ingredient', 'created_by')
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(logs, request)
+        return paginator.get_paginated_response(IngredientLogSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """配置了配方的 SKU / 属性选项按当前原料库存还能制作的份数"""
+        return Response(IngredientService(request.tenant).availability())
+
+
+class RecipeItemViewSet(viewsets.ModelViewSet):
+    """配方用量（SKU 或属性选项 -> 原料）"""
+    queryset = RecipeItem.objects.all()
+    serializer_class = RecipeItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['ingredient', 'sku', 'attribute_option', 'sku__product']
+
+    def get_queryset(self):
+        return RecipeItem.objects.filter(ingredient__shop=self.request.tenant).select_related('ingredient')
+
+
 class ProductSKUViewSet(viewsets.ModelViewSet):
     queryset = ProductSKU.objects.all()
     serializer_class = ProductSKUSerializer
     permission_classes = [permissions.IsAuthenticated]
+    trust_token_claims = True
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['product', 'is_active']
     search_fields = ['sku_code', 'product__name']
@@ -146,12 +351,15 @@ class ProductSKUViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return ProductSKU.objects.filter(product__shop=self.request.tenant).select_related(
             'product'
-        ).prefetch_related('specifications')
+        ).prefetch_related('specifications', 'barcodes')
 
     @action(detail=True, methods=['post'])
     def adjust_stock(self, request, pk=None):
         """调整库存"""
         sku = self.get_object()
+        if sku.is_hot_stock:
+            return Response({'error': '热点库存模式下不能手动调整库存'}, status=status.HTTP_400_BAD_REQUEST)
+
         serializer = StockAdjustmentSerializer(data=request.data)
 
         if serializer.is_valid():
@@ -159,29 +367,37 @@ class ProductSKUViewSet(viewsets.ModelViewSet):
             quantity = serializer.validated_data['quantity']
             notes = serializer.validated_data.get('notes', '')
 
-            with transaction.atomic():
-                if adjustment_type == 'increase':
-                    sku.stock_quantity += quantity
-                    action_type = 'adjustment'
-                else:
-                    sku.stock_quantity = max(0, sku.stock_quantity - quantity)
-                    action_type = 'adjustment'
+            # 条件更新库存并写日志，跨过低库存阈值时产生预警
+            current_stock = InventoryService(request.tenant, request.user).adjust(
+                sku.pk, quantity if adjustment_type == 'increase' else -quantity, notes
+            )
+
+            return Response({'message': '库存调整成功', 'current_stock': current_stock})
 
-                sku.save()
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-                # 记录库存日志
-                InventoryLog.objects.create(
-                    sku=sku,
-                    action=action_type,
-                    quantity_change=quantity if adjustment_type == 'increase' else -quantity,
-                    current_quantity=sku.stock_quantity,
-                    notes=notes,
-                    created_by=request.user
-                )
+    @action(detail=True, methods=['post'])
+    def hot_stock(self, request, pk=None):
+        """
+        开启 / 关闭热点库存模式（秒杀）
+        开启后扣减走缓存计数器，由 sync_hot_stock 定期写回数据库
+        """
+        sku = self.get_object()
+        service = HotStockService(request.tenant.schema_name)
 
-            return Response({'message': '库存调整成功', 'current_stock': sku.stock_quantity})
+        if str(request.data.get('enabled', '')).lower() in ('1', 'true'):
+            try:
+                sku = service.enable(sku)
+            except HotStockUnavailable as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            sku = service.disable(sku)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'is_hot_stock': sku.is_hot_stock,
+            'stock_quantity': sku.stock_quantity,
+            'available': service.available(sku.pk) if sku.is_hot_stock else sku.stock_quantity,
+        })
 
 
 class InventoryLogView(generics.ListAPIView):
@@ -204,45 +420,9 @@ def bulk_stock_update(request):
     serializer = BulkStockUpdateSerializer(data=request.data)
 
     if serializer.is_valid():
-        updates = serializer.validated_data['updates']
-        results = []
-
-        with transaction.atomic():
-            for update in updates:
-                try:
-                    sku = ProductSKU.objects.get(
-                        id=update['sku_id'],
-                        product__shop=request.tenant
-                    )
-
-                    old_stock = sku.stock_quantity
-                    sku.stock_quantity = update['stock_quantity']
-                    sku.save()
-
-                    # 记录库存变更
-                    if old_stock != update['stock_quantity']:
-                        InventoryLog.objects.create(
-                            sku=sku,
-                            action='adjustment',
-                            quantity_change=update['stock_quantity'] - old_stock,
-                            current_quantity=update['stock_quantity'],
-                            notes=update.get('notes', '批量更新'),
-                            created_by=request.user
-                        )
-
-                    results.append({
-                        'sku_id': update['sku_id'],
-                        'success': True,
-                        'current_stock': sku.stock_quantity
-                    })
-
-                except ProductSKU.DoesNotExist:
-                    results.append({
-                        'sku_id': update['sku_id'],
-                        'success': False,
-                        'error': 'SKU不存在'
-                    })
-
+        results = InventoryService(request.tenant, request.user).bulk_set_stock(
+            serializer.validated_data['updates']
+        )
         return Response({'results': results})
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -250,40 +430,260 @@ def bulk_stock_update(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_get(stock_alert_version)
 def low_stock_alert(request):
-    """低库存预警"""
+    """
+    低库存预警
+    条件与部分索引 product_skus_low_stock_idx 一致；ETag 由目录版本号（阈值等 SKU 编辑）和
+    低库存列表版本号（阈值以下的库存变化）组成，轮询时未变化返回 304
+    """
     low_stock_skus = ProductSKU.objects.filter(
         product__shop=request.tenant,
         stock_quantity__lte=models.F('low_stock_threshold'),
         stock_quantity__gt=0
-    ).select_related('product')
+    ).select_related('product').prefetch_related('specifications')
 
     serializer = ProductSKUSerializer(low_stock_skus, many=True)
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def stock_history(request):
+    """
+    历史库存（盘点、审计报表）
+    at: 时间点（ISO 8601）；或 date: YYYY-MM-DD，表示当天收盘库存
+    可按 sku_ids（逗号分隔）、product、category_tree 筛选；由最近的每日快照加日志回放重建
+    热点库存模式的 SKU（is_hot_stock）售出时只扣缓存计数器，由 sync_hot_stock 写回时才写入日志，
+    日志时间为写回时间：这些 SKU 的历史库存滞后于实际售出，最多滞后一个同步周期
+    """
+    if request.GET.get('date'):
+        day = parse_date(request.GET['date'])
+        if day is None:
+            return Response({'error': 'date 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+        at = day_end(day)
+    else:
+        at = parse_datetime(request.GET.get('at', ''))
+        if at is None:
+            return Response({'error': '请提供有效的 at 或 date 参数'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+    if at > timezone.now():
+        return Response({'error': '不能查询未来的库存'}, status=status.HTTP_400_BAD_REQUEST)
+
+    skus = ProductSKU.objects.filter(product__shop=request.tenant)
+    raw_ids = [value.strip() for value in request.GET.get('sku_ids', '').split(',') if value.strip()]
+    if raw_ids:
+        if not all(value.isdigit() for value in raw_ids):
+            return Response({'error': 'sku_ids 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+        skus = skus.filter(pk__in=raw_ids)
+    if request.GET.get('product'):
+        if not request.GET['product'].isdigit():
+            return Response({'error': 'product 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+        skus = skus.filter(product_id=request.GET['product'])
+    if request.GET.get('category_tree'):
+        path = category_tree_path(request.tenant, request.GET['category_tree'])
+        skus = skus.filter(product__category__path__startswith=path) if path else skus.none()
+
+    stock = StockHistoryService(request.tenant).stock_at(at, skus.values('id'))
+    rows = skus.filter(pk__in=list(stock)).order_by('product_id', 'id').values_list(
+        'id', 'sku_code', 'product_id', 'product__name', 'stock_quantity', 'is_hot_stock'
+    )
+    return Response({
+        'at': at,
+        'results': [
+            {
+                'sku_id': sku_id,
+                'sku_code': sku_code,
+                'product_id': product_id,
+                'product_name': product_name,
+                'stock_quantity': stock[sku_id],
+                'current_stock': current_stock,
+                'is_hot_stock': is_hot_stock,
+            }
+            for sku_id, sku_code, product_id, product_name, current_stock, is_hot_stock in rows
+        ],
+    })
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(catalog_version)
 def public_products(request):
-    """公开商品列表（供小程序/H5使用）"""
+    """
+    公开商品列表（供小程序/H5使用）
+    category_id 筛选单个分类，category_tree 筛选分类及其全部子孙分类
+    """
+    search = request.GET.get('search')
+    category_id = request.GET.get('category_id')
+    category_tree = request.GET.get('category_tree')
+    if not search:
+        # 无搜索条件时直接使用菜单快照
+        snapshot = MenuSnapshotService(request.tenant).get_snapshot()
+        if not category_id and not category_tree:
+            return precompressed_response(
+                request, snapshot.products_content, snapshot.products_gzip_content
+            )
+
+        if category_tree:
+            path = category_tree_path(request.tenant, category_tree)
+            category_ids = {
+                str(category['id']) for category in snapshot.document['categories']
+                if path and category.get('path', '').startswith(path)
+            }
+        else:
+            category_ids = {category_id}
+
+        products = [
+            product for product in snapshot.document['products']
+            if str(product['category']) in category_ids
+        ]
+        return Response(products)
+
     products = Product.objects.filter(
         shop=request.tenant,
-        status='active'
-    ).select_related('category').prefetch_related(
-        Prefetch('skus', queryset=ProductSKU.objects.filter(is_active=True))
-    ).only(
-        'id', 'name', 'category', 'base_price', 'main_image',
-        'description', 'preparation_time'
-    )
+        status__in=Product.MENU_STATUSES
+    ).select_related('category').only(*PRODUCT_LIST_FIELDS)
 
     # 过滤条件
-    category_id = request.GET.get('category_id')
     if category_id:
         products = products.filter(category_id=category_id)
+    if category_tree:
+        products = filter_category_tree(products, request.tenant, category_tree)
 
-    search = request.GET.get('search')
-    if search:
-        products = products.filter(name__icontains=search)
+    products = annotate_price_range(search_products(products, search))
 
     serializer = ProductListSerializer(products, many=True)
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def public_search(request):
+    """商品搜索（全文索引 + 名称三元组相似度，按相关度排序并分页）"""
+    text = request.GET.get('q', '').strip()
+    if not text:
+        return Response({'error': '请输入搜索关键词'}, status=status.HTTP_400_BAD_REQUEST)
+
+    products = Product.objects.filter(
+        shop=request.tenant,
+        status__in=Product.MENU_STATUSES
+    ).select_related('category').only(*PRODUCT_LIST_FIELDS)
+
+    category_id = request.GET.get('category_id')
+    if category_id:
+        products = products.filter(category_id=category_id)
+
+    products = annotate_price_range(search_products(products, text))
+
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(products, request)
+    serializer = ProductListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def public_resolve_sku(request, product_id):
+    """
+    按选中的规格值定位 SKU
+    spec_ids: 逗号分隔的规格值ID（顺序无关），按规格组合键走索引查询
+    """
+    raw_ids = [value for value in request.GET.get('spec_ids', '').split(',') if value.strip()]
+    if not all(value.strip().isdigit() for value in raw_ids):
+        return Response({'error': 'spec_ids 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+
+    sku = ProductSKU.objects.filter(
+        product_id=product_id,
+        product__shop=request.tenant,
+        product__status__in=Product.MENU_STATUSES,
+        spec_key=ProductSKU.spec_key_for(raw_ids),
+        is_active=True
+    ).only('id', 'sku_code', 'price', 'stock_quantity', 'is_hot_stock').first()
+    if sku is None:
+        return Response({'error': '没有对应的规格组合'}, status=status.HTTP_404_NOT_FOUND)
+
+    stock_quantity = sku.stock_quantity
+    if sku.is_hot_stock:
+        # 热点 SKU 的实时库存在缓存计数器中
+        available = HotStockService(request.tenant.schema_name).available(sku.pk)
+        if available is not None:
+            stock_quantity = available
+
+    return Response({
+        'id': sku.id,
+        'sku_code': sku.sku_code,
+        'price': str(sku.price),
+        'stock_quantity': stock_quantity,
+        'is_in_stock': stock_quantity > 0,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def public_autocomplete(request):
+    """搜索框自动补全（支持名称、拼音和拼音首字母前缀，使用进程内索引）"""
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return Response({'error': 'limit 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'error': 'limit 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(limit, 50)
+
+    result = AutocompleteService(request.tenant).search(request.GET.get('q', ''), limit)
+    return Response(result)
+
+
+def ingredient_version(request):
+    return get_ingredient_version(request.tenant.schema_name)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(ingredient_version)
+def public_menu_availability(request):
+    """
+    原料不足、暂时无法制作的 SKU 和属性选项（如加料），配合菜单快照使用
+    只在有配方跨过可制作 / 不可制作时变化，轮询时未变化返回 304
+    """
+    portions = IngredientService(request.tenant).availability()
+    return Response({
+        'unavailable_skus': sorted(sku_id for sku_id, count in portions['skus'].items() if not count),
+        'unavailable_options': sorted(
+            option_id for option_id, count in portions['options'].items() if not count
+        ),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(catalog_version)
+def public_menu(request):
+    """公开菜单快照（分类、商品、SKU、属性），按目录版本号返回 ETag"""
+    snapshot = MenuSnapshotService(request.tenant).get_snapshot()
+    response = precompressed_response(request, snapshot.content, snapshot.gzip_content)
+    response['X-Menu-Version'] = snapshot.version
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def public_catalog_changes(request):
+    """
+    目录增量同步：since 之后变化的分类、商品、SKU、属性选项（当前状态）及删除标记
+    不带 since 或返回 reset 时，客户端重新加载 /public/menu/，再从菜单的 change_seq 继续；
+    has_more 为 true 时立即用 next 继续拉取。客户端支持 gzip 时返回压缩内容
+    """
+    try:
+        since = int(request.GET['since']) if request.GET.get('since', '') != '' else None
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return Response({'error': 'since / limit 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+    if (since is not None and since < 0) or (limit is not None and limit < 1):
+        return Response({'error': 'since / limit 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+
+    feed = CatalogChangeFeed(request.tenant)
+    content, gzip_content = feed.render(feed.read(since, limit), accepts_gzip(request))
+    response = precompressed_response(request, content, gzip_content)
+    return response
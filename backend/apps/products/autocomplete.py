@@ -0,0 +1,175 @@
+"""
+商品 / 分类名称自动补全
+名称保存时预先计算拼音（按音节空格分隔）和首字母，
+每个租户在进程内维护一个按键排序的数组，前缀查询使用二分查找。
+索引随商品目录版本号失效，版本变化后下次查询时重建。
+"""
+import re
+import threading
+from bisect import bisect_left
+
+from pypinyin import Style, lazy_pinyin
+
+from apps.core.caching import get_catalog_version
+
+_CJK_CHAR = r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'
+_UNIT_RE = re.compile(rf'{_CJK_CHAR}|[0-9a-z]+')
+_CJK_RE = re.compile(_CJK_CHAR)
+_QUERY_STRIP_RE = re.compile(r"[\s'’]+")
+
+# 每个名称最多从多少个音节处开始建立后缀键（“nc”可以匹配“珍珠奶茶”）
+MAX_SUFFIXES = 8
+
+
+def _units(name):
+    """名称切分为单元：每个汉字一个单元，连续字母数字为一个单元"""
+    return _UNIT_RE.findall((name or '').lower())
+
+
+def name_to_pinyin(name):
+    """
+    计算名称的拼音和首字母
+    返回 (pinyin, initials)，例如 '珍珠奶茶' -> ('zhen zhu nai cha', 'zznc')
+    """
+    syllables = []
+    for unit in _units(name):
+        if _CJK_RE.fullmatch(unit):
+            syllables.append(lazy_pinyin(unit, style=Style.NORMAL)[0])
+        else:
+            syllables.append(unit)
+    return ' '.join(syllables), ''.join(syllable[0] for syllable in syllables)
+
+
+def normalize_query(text):
+    return _QUERY_STRIP_RE.sub('', (text or '').lower())
+
+
+def _index_keys(name, pinyin, initials):
+    """
+    名称、拼音、首字母从每个音节开始的后缀
+    返回 {键: 起始音节位置}，位置越小越靠近名称开头
+    """
+    units = _units(name)
+    syllables = pinyin.split()
+    keys = {}
+
+    for start in range(min(len(syllables), MAX_SUFFIXES)):
+        keys.setdefault(''.join(syllables[start:]), start)
+        keys.setdefault(initials[start:], start)
+    for start in range(min(len(units), MAX_SUFFIXES)):
+        keys.setdefault(''.join(units[start:]), start)
+    keys.pop('', None)
+    return keys
+
+
+class AutocompleteIndex:
+    """单个租户的前缀索引（排序数组 + 二分查找）"""
+
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries
+        rows = sorted(
+            (key, position, start)
+            for position, entry in enumerate(entries)
+            for key, start in _index_keys(entry['name'], entry.pop('pinyin'), entry.pop('initials')).items()
+        )
+        self.keys = [row[0] for row in rows]
+        self.positions = [row[1] for row in rows]
+        self.starts = [row[2] for row in rows]
+
+    def search(self, prefix, limit=10):
+        """
+        前缀查询
+        返回 {'categories': [...], 'products': [...]}，从名称开头匹配的结果排在前面
+        """
+        matches = {}
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix):
+            position = self.positions[index]
+            matches[position] = min(matches.get(position, MAX_SUFFIXES), self.starts[index])
+            index += 1
+
+        ranked = sorted(
+            matches,
+            key=lambda position: (matches[position], self.entries[position]['sort_order'])
+        )
+        result = {'categories': [], 'products': []}
+        for position in ranked:
+            entry = self.entries[position]
+            bucket = result['categories'] if entry['type'] == 'category' else result['products']
+            if len(bucket) < limit:
+                bucket.append({key: value for key, value in entry.items() if key not in ('type', 'sort_order')})
+        return result
+
+
+class AutocompleteService:
+    """进程内的租户自动补全索引缓存"""
+    _indexes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, shop):
+        self.shop = shop
+        self.schema_name = shop.schema_name
+
+    def get_index(self):
+        version = get_catalog_version(self.schema_name)
+        index = self._indexes.get(self.schema_name)
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            index = self._indexes.get(self.schema_name)
+            if index is None or index.version != version:
+                index = AutocompleteIndex(version, self._load_entries())
+                self._indexes[self.schema_name] = index
+        return index
+
+    def search(self, text, limit=10):
+        prefix = normalize_query(text)
+        if not prefix:
+            return {'categories': [], 'products': []}
+        return self.get_index().search(prefix, limit)
+
+    def _load_entries(self):
+        from .models import Category, Product
+
+        entries = [
+            {
+                'type': 'category',
+                'id': category_id,
+                'name': name,
+                'pinyin': pinyin,
+                'initials': initials,
+                'sort_order': sort_order,
+            }
+            for category_id, name, pinyin, initials, sort_order in Category.objects.filter(
+                shop=self.shop, is_active=True
+            ).values_list('id', 'name', 'pinyin', 'pinyin_initials', 'sort_order')
+        ]
+        entries.extend(
+            {
+                'type': 'product',
+                'id': product_id,
+                'name': name,
+                'category_id': category_id,
+                'price': str(price),
+                'pinyin': pinyin,
+                'initials': initials,
+                'sort_order': sort_order,
+            }
+            for product_id, name, category_id, price, pinyin, initials, sort_order in Product.objects.filter(
+                shop=self.shop, status__in=Product.MENU_STATUSES
+            ).values_list('id', 'name', 'category_id', 'base_price', 'pinyin', 'pinyin_initials', 'sort_order')
+        )
+        return entries
+
+
+def reindex_pinyin(queryset):
+    """批量重建名称拼音（历史数据回填）"""
+    objects = []
+    for obj in queryset.only('id', 'name'):
+        obj.pinyin, obj.pinyin_initials = name_to_pinyin(obj.name)
+        objects.append(obj)
+
+    queryset.model.objects.bulk_update(objects, ['pinyin', 'pinyin_initials'], batch_size=500)
+    return len(objects)
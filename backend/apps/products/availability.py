@@ -0,0 +1,77 @@
+"""
+商品可售状态
+上架商品的所有启用 SKU 库存都为 0（或配方原料不足、无法制作）时自动改为缺货，补货后自动恢复上架。
+在库存写入路径（订单扣减 / 归还、手动调整、批量设置、热点库存同步、SKU 编辑）中按受影响的商品增量计算；
+库存写入路径只在某个 SKU 跨过 0（有货 <-> 售罄）时调用，其余销售不锁商品行，
+状态变化随菜单快照下发，客户端可以直接展示售罄，不必等加购或下单失败。
+草稿、下架商品和没有启用 SKU 的商品不参与。
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from apps.core.caching import bump_catalog_version, current_schema_name
+from .changes import record_changes
+from .models import Product, ProductSKU, RecipeItem
+
+# 参与自动切换的状态
+AUTO_STATUSES = ('active', 'out_of_stock')
+
+
+def sync_availability(product_ids, schema_name=None):
+    """
+    按启用 SKU 的库存刷新商品状态，返回 {商品ID: 新状态}
+    先按商品ID顺序锁定商品行，再用新的查询读取库存：并发事务各自卖完不同 SKU 时，
+    后获得锁的事务能读到先提交的库存，不会两边都认为还有货
+    """
+    product_ids = sorted({product_id for product_id in product_ids if product_id})
+    if not product_ids:
+        return {}
+
+    schema_name = schema_name or current_schema_name()
+    with transaction.atomic():
+        current = dict(
+            Product.objects.select_for_update().filter(
+                pk__in=product_ids, status__in=AUTO_STATUSES
+            ).order_by('pk').values_list('id', 'status')
+        )
+        if not current:
+            return {}
+
+        # 配方中任一启用的原料不足一份用量时 SKU 无法制作（见 apps.products.ingredients）
+        shortage = RecipeItem.objects.filter(
+            sku=OuterRef('pk'), ingredient__is_active=True, ingredient__stock_quantity__lt=F('quantity')
+        )
+        in_stock = dict(
+            ProductSKU.objects.filter(product_id__in=list(current), is_active=True).values(
+                'product_id'
+            ).annotate(
+                in_stock=Count('id', filter=Q(stock_quantity__gt=0) & ~Q(Exists(shortage)))
+            ).values_list('product_id', 'in_stock')
+        )
+
+        changes = {}
+        for product_id, status in current.items():
+            if product_id not in in_stock:
+                continue
+            target = 'active' if in_stock[product_id] else 'out_of_stock'
+            if target != status:
+                changes[product_id] = target
+        if not changes:
+            return {}
+
+        now = timezone.now()
+        for status in AUTO_STATUSES:
+            ids = [product_id for product_id, target in changes.items() if target == status]
+            if ids:
+                Product.objects.filter(pk__in=ids).update(status=status, updated_at=now)
+
+        # 条件更新不触发信号，手动刷新菜单和详情缓存
+        from .services import MenuSnapshotService, ProductDetailCache
+
+        MenuSnapshotService.invalidate_products(changes, schema_name)
+        ProductDetailCache.invalidate_products(changes, schema_name)
+        record_changes('product', changes)
+        bump_catalog_version(schema_name)
+
+    return changes
@@ -0,0 +1,130 @@
+"""
+收银台条码索引
+每个进程为每个租户维护一份 条码 -> 商品 / SKU 的内存映射（名称、价格、规格），
+以独立的条码版本号失效（商品、SKU、规格、条码变化时递增；库存变化不递增），
+扫码时只需读取版本号、查字典，再按主键读取一次实时库存。
+"""
+import threading
+
+from apps.core.caching import bump_version, get_version
+
+BARCODE_SCOPE = 'barcodes'
+
+
+def get_barcode_version(schema_name=None):
+    return get_version(BARCODE_SCOPE, schema_name)
+
+
+def bump_barcode_version(schema_name=None):
+    bump_version(BARCODE_SCOPE, schema_name)
+
+
+class BarcodeIndex:
+    """不可变的条码映射"""
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+
+    def get(self, barcode):
+        return self.items.get(barcode)
+
+
+class BarcodeIndexService:
+    """进程内的租户条码映射缓存"""
+    _indexes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, shop):
+        self.shop = shop
+        self.schema_name = shop.schema_name
+
+    def get_index(self):
+        version = get_barcode_version(self.schema_name)
+        index = self._indexes.get(self.schema_name)
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            index = self._indexes.get(self.schema_name)
+            if index is None or index.version != version:
+                index = BarcodeIndex(version, self._load_items())
+                self._indexes[self.schema_name] = index
+        return index
+
+    def warm(self):
+        """预热（收银台开班、打开工作台时调用），返回条码数量"""
+        return len(self.get_index().items)
+
+    def lookup(self, barcode):
+        """
+        条码 -> 商品信息；SKU 条码附带实时库存（热点 SKU 读取缓存计数器）
+        未找到时返回 None
+        """
+        from .hotstock import HotStockService
+        from .models import ProductSKU
+
+        item = self.get_index().get(barcode.strip())
+        if item is None:
+            return None
+
+        item = dict(item)
+        if item['type'] == 'sku':
+            stock = ProductSKU.objects.filter(pk=item['id']).values_list(
+                'stock_quantity', 'is_hot_stock'
+            ).first()
+            if stock is None:
+                # SKU 已删除但版本号尚未递增（事务未提交）
+                return None
+            stock_quantity, is_hot = stock
+            if is_hot:
+                available = HotStockService(self.schema_name).available(item['id'])
+                if available is not None:
+                    stock_quantity = available
+            item['stock_quantity'] = stock_quantity
+        return item
+
+    def _load_items(self):
+        from .models import ProductBarcode, ProductSKU
+
+        rows = list(ProductBarcode.objects.filter(product__shop=self.shop).values_list(
+            'barcode', 'product_id', 'product__name', 'product__base_price',
+            'sku_id', 'sku__price', 'sku__is_active'
+        ))
+
+        specifications = {}
+        sku_ids = {row[4] for row in rows if row[4]}
+        if sku_ids:
+            for sku_id, name, value in ProductSKU.specifications.through.objects.filter(
+                productsku_id__in=sku_ids
+            ).order_by('specificationvalue__specification__sort_order').values_list(
+                'productsku_id',
+                'specificationvalue__specification__display_name',
+                'specificationvalue__display_value'
+            ):
+                specifications.setdefault(sku_id, []).append({'name': name, 'value': value})
+
+        items = {}
+        for barcode, product_id, name, base_price, sku_id, sku_price, sku_active in rows:
+            if sku_id:
+                if not sku_active:
+                    continue
+                items[barcode] = {
+                    'type': 'sku',
+                    'id': sku_id,
+                    'product_id': product_id,
+                    'name': name,
+                    'price': str(sku_price),
+                    'specifications': specifications.get(sku_id, []),
+                }
+            else:
+                items[barcode] = {
+                    'type': 'product',
+                    'id': product_id,
+                    'product_id': product_id,
+                    'name': name,
+                    'price': str(base_price),
+                    'stock_quantity': 'N/A',  # 商品本身没有库存，SKU才有
+                    'specifications': [],
+                }
+        return items
@@ -0,0 +1,214 @@
+"""
+商品目录增量同步
+分类、商品、SKU、属性选项变化时（信号和批量写入路径）在同一事务中写入变更日志，随业务数据一起提交或回滚。
+日志序号由租户 schema 内的序列生成，分配顺序与提交顺序可能不同：写入方持有共享咨询锁直到事务结束，
+读取方尝试获取排他锁（不等待），成功时读出最大序号作为新的水位并发布到缓存：此时序号不大于水位的写入事务都已结束；
+有写入事务未结束时直接使用上次发布的水位。之后只读取水位以内的日志，客户端读到序号 N 后不会再出现更小的序号。
+读取方从不等待写入方（长事务只推迟水位前进），写入方之间互不阻塞。
+
+客户端先加载完整菜单（/public/menu/，其中 change_seq 为快照对应的序号），从 since=change_seq 开始用上次的 next 轮询，
+只拿到期间变化对象的当前状态；已删除或已不在菜单中的对象作为删除标记下发。
+库存只同步有货 / 售罄状态，库存数量的普通增减不产生变更。
+"""
+import gzip
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from apps.core.caching import current_schema_name
+from .models import CatalogChange, Category, Product, ProductAttributeOption, ProductSKU
+
+# 变更日志中的对象类型 -> 响应中的分组名称
+ENTITY_GROUPS = {
+    'category': 'categories',
+    'product': 'products',
+    'sku': 'skus',
+    'attribute_option': 'attribute_options',
+}
+
+# 小于该大小的响应不压缩
+GZIP_MIN_SIZE = 512
+
+
+def _lock_sql(function):
+    # 锁键为当前 schema 中变更日志表的 OID，各租户互不影响
+    return f'SELECT {function}(%s::regclass::oid::bigint)'
+
+
+def record_changes(entity, object_ids):
+    """记录目录对象变化（新增、修改、删除），在当前事务中写入变更日志"""
+    object_ids = sorted({object_id for object_id in object_ids if object_id})
+    if not object_ids:
+        return
+
+    with transaction.atomic():
+        # 共享锁持有到最外层事务结束，读取方据此等待已分配序号的事务结束
+        with connection.cursor() as cursor:
+            cursor.execute(_lock_sql('pg_advisory_xact_lock_shared'), [CatalogChange._meta.db_table])
+        CatalogChange.objects.bulk_create([
+            CatalogChange(entity=entity, object_id=object_id) for object_id in object_ids
+        ])
+
+
+def _watermark_key(schema_name):
+    return f'catalog_changes:{schema_name}:watermark'
+
+
+def change_watermark(schema_name=None):
+    """
+    当前可安全读取的最大序号（没有日志时为 0，暂时无法确定时为 None）
+    不大于该序号的日志都已提交或回滚，不会再出现。
+    使用会话级锁并立即释放，不受外层事务影响；获取失败时返回上次发布的水位，不等待写入事务
+    """
+    key = _watermark_key(schema_name or current_schema_name())
+    table = CatalogChange._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(_lock_sql('pg_try_advisory_lock'), [table])
+        acquired = cursor.fetchone()[0]
+        if acquired:
+            try:
+                latest = CatalogChange.objects.aggregate(latest=Max('seq'))['latest'] or 0
+            finally:
+                cursor.execute(_lock_sql('pg_advisory_unlock'), [table])
+
+    published = cache.get(key)
+    if acquired:
+        if published is None or latest > published:
+            cache.set(key, latest, None)
+        return max(latest, published or 0)
+    # 缓存中没有已发布的水位时返回 None（暂时无法确定）
+    return published
+
+
+def record_stock_flips(changes):
+    """
+    库存写入路径调用：只记录有货 / 售罄状态发生变化的 SKU，返回这些 SKU 的ID
+    changes: [(sku_id, 变更前库存, 变更后库存)]
+    """
+    flipped = [sku_id for sku_id, before, after in changes if (before > 0) != (after > 0)]
+    record_changes('sku', flipped)
+    return flipped
+
+
+class CatalogChangeFeed:
+    """租户目录变更流"""
+    default_limit = 500
+    max_limit = 2000
+
+    def __init__(self, shop):
+        self.shop = shop
+
+    def read(self, since=None, limit=None):
+        """
+        读取 since 之后的变更，同一对象只下发一次当前状态
+        since 为空、早于已清理的日志或超过最新序号时返回 reset，客户端重新加载完整菜单后从 next 继续
+        """
+        limit = min(limit or self.default_limit, self.max_limit)
+        latest = change_watermark()
+        if latest is None:
+            # 有写入事务未结束且没有已发布的水位（如缓存被清空），本次不推进
+            if since is None:
+                return {'reset': True, 'next': 0}
+            return self._empty(since)
+
+        first = CatalogChange.objects.aggregate(first=Min('seq'))['first']
+        if since is None or since > latest or (first is not None and since < first - 1):
+            return {'reset': True, 'next': latest}
+
+        rows = list(
+            CatalogChange.objects.filter(seq__gt=since, seq__lte=latest).order_by('seq').values_list(
+                'seq', 'entity', 'object_id'
+            )[:limit]
+        )
+        changed = {entity: set() for entity in ENTITY_GROUPS}
+        for _, entity, object_id in rows:
+            changed[entity].add(object_id)
+
+        upserts = {
+            'categories': self._categories(changed['category']),
+            'products': self._products(changed['product']),
+            'skus': self._skus(changed['sku']),
+            'attribute_options': self._attribute_options(changed['attribute_option']),
+        }
+        deletes = {
+            group: sorted(changed[entity] - {item['id'] for item in upserts[group]})
+            for entity, group in ENTITY_GROUPS.items()
+        }
+
+        # 整体下发的商品已包含其 SKU 和属性选项
+        covered = {fragment['id'] for fragment in upserts['products']}
+        for group in ('skus', 'attribute_options'):
+            upserts[group] = [item for item in upserts[group] if item['product'] not in covered]
+
+        return {
+            'reset': False,
+            'since': since,
+            'next': rows[-1][0] if rows else since,
+            'has_more': len(rows) == limit,
+            'upserts': upserts,
+            'deletes': deletes,
+        }
+
+    @staticmethod
+    def _empty(since):
+        return {
+            'reset': False,
+            'since': since,
+            'next': since,
+            'has_more': False,
+            'upserts': {group: [] for group in ENTITY_GROUPS.values()},
+            'deletes': {group: [] for group in ENTITY_GROUPS.values()},
+        }
+
+    def render(self, document, accept_gzip=False):
+        """序列化为 JSON，客户端支持 gzip 且内容较大时同时返回压缩版本"""
+        from .services import _dumps
+
+        content = _dumps(document)
+        gzip_content = gzip.compress(content, 6) if accept_gzip and len(content) >= GZIP_MIN_SIZE else None
+        return content, gzip_content
+
+    def _categories(self, ids):
+        from .serializers import MenuCategorySerializer
+
+        if not ids:
+            return []
+        categories = Category.objects.filter(pk__in=ids, shop=self.shop, is_active=True)
+        return MenuCategorySerializer(categories, many=True).data
+
+    def _products(self, ids):
+        from .services import MenuSnapshotService
+
+        if not ids:
+            return []
+        product_ids = list(Product.objects.filter(
+            pk__in=ids, shop=self.shop, status__in=Product.MENU_STATUSES
+        ).order_by('pk').values_list('id', flat=True))
+        fragments = MenuSnapshotService(self.shop).get_fragments(product_ids)
+        return [fragments[product_id] for product_id in product_ids if product_id in fragments]
+
+    def _skus(self, ids):
+        from .serializers import SyncSKUSerializer
+
+        if not ids:
+            return []
+        skus = ProductSKU.objects.filter(
+            pk__in=ids,
+            is_active=True,
+            product__shop=self.shop,
+            product__status__in=Product.MENU_STATUSES
+        ).prefetch_related('specifications__specification')
+        return SyncSKUSerializer(skus, many=True).data
+
+    def _attribute_options(self, ids):
+        from .serializers import SyncAttributeOptionSerializer
+
+        if not ids:
+            return []
+        options = ProductAttributeOption.objects.filter(
+            pk__in=ids,
+            attribute__product__shop=self.shop,
+            attribute__product__status__in=Product.MENU_STATUSES
+        ).select_related('attribute')
+        return SyncAttributeOptionSerializer(options, many=True).data
@@ -0,0 +1,282 @@
+"""
+商品深度复制
+先在来源租户中把商品图（SKU、规格组合、属性、属性选项、图集）读成普通数据，
+再在目标租户中按层级 bulk_create 写入。同一店铺内复制时 SKU 编码重新生成；
+跨店铺复制时保留原编码（冲突时重新生成），规格和分类按名称映射到目标店铺，缺失的自动创建。
+"""
+import uuid
+
+from django.db import transaction
+from django_tenants.utils import tenant_context
+
+from apps.core.caching import bump_catalog_version
+from .autocomplete import name_to_pinyin
+from .availability import sync_availability
+from .changes import record_changes
+from .models import (
+    Category, Product, ProductSKU, ProductAttribute, ProductAttributeOption,
+    ProductImage, Specification, SpecificationValue
+)
+from .search import build_search_text
+
+_PRODUCT_FIELDS = (
+    'name', 'description', 'base_price', 'cost_price', 'main_image', 'main_image_variants', 'images', 'status',
+    'is_featured', 'sort_order', 'allow_customization', 'preparation_time'
+)
+_SKU_FIELDS = (
+    'sku_code', 'price', 'cost_price', 'low_stock_threshold', 'image', 'image_variants', 'is_active'
+)
+_ATTRIBUTE_FIELDS = ('name', 'attribute_type', 'is_required', 'sort_order')
+_OPTION_FIELDS = ('value', 'additional_price', 'sort_order')
+_IMAGE_FIELDS = ('image', 'image_variants', 'alt_text', 'sort_order')
+
+
+def _copy_fields(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+class CatalogCloner:
+    """
+    商品目录复制器
+    复制出的 SKU 库存为 0，避免凭空产生库存
+    """
+
+    def __init__(self, source_shop, target_shop=None, user=None):
+        self.source_shop = source_shop
+        self.target_shop = target_shop or source_shop
+        self.user = user
+
+    @property
+    def same_shop(self):
+        return self.source_shop.pk == self.target_shop.pk
+
+    # 读取
+
+    def _load(self, products):
+        """读取商品图为普通数据（在来源租户中执行）"""
+        products = products.select_related('category').prefetch_related(
+            'skus__specifications__specification',
+            'attributes__options',
+            'product_images',
+        )
+        return [
+            {
+                'fields': _copy_fields(product, _PRODUCT_FIELDS),
+                'category': product.category.name if product.category_id else '',
+                'skus': [
+                    {
+                        'fields': _copy_fields(sku, _SKU_FIELDS),
+                        'specifications': [
+                            (value.specification.name, value.specification.display_name, value.value, value.display_value)
+                            for value in sku.specifications.all()
+                        ],
+                    }
+                    for sku in product.skus.all()
+                ],
+                'attributes': [
+                    {
+                        'fields': _copy_fields(attribute, _ATTRIBUTE_FIELDS),
+                        'options': [_copy_fields(option, _OPTION_FIELDS) for option in attribute.options.all()],
+                    }
+                    for attribute in product.attributes.all()
+                ],
+                'images': [_copy_fields(image, _IMAGE_FIELDS) for image in product.product_images.all()],
+            }
+            for product in products
+        ]
+
+    def _load_categories(self, category):
+        """读取分类子树（父级在前）"""
+        return [
+            {
+                'name': item.name,
+                'parent': item.parent.name if item.parent_id and item.pk != category.pk else None,
+                'fields': _copy_fields(item, ('description', 'image', 'image_variants', 'sort_order', 'is_active')),
+            }
+            for item in Category.objects.filter(
+                shop=self.source_shop, path__startswith=category.path
+            ).select_related('parent').order_by('depth', 'sort_order')
+        ]
+
+    # 对外接口
+
+    def duplicate(self, product, name_suffix=' (副本)'):
+        """店铺内复制单个商品，副本为草稿状态"""
+        graphs = self._load(Product.objects.filter(pk=product.pk))
+        for graph in graphs:
+            graph['fields']['name'] = f"{graph['fields']['name']}{name_suffix}"[:200]
+            graph['fields']['status'] = 'draft'
+        return self._write(graphs)[0]
+
+    def copy_products(self, product_ids):
+        with tenant_context(self.source_shop):
+            graphs = self._load(Product.objects.filter(shop=self.source_shop, pk__in=product_ids))
+        with tenant_context(self.target_shop):
+            return self._write(graphs)
+
+    def copy_category(self, category_id):
+        """复制分类子树及其下全部商品到目标店铺"""
+        with tenant_context(self.source_shop):
+            category = Category.objects.get(shop=self.source_shop, pk=category_id)
+            categories = self._load_categories(category)
+            graphs = self._load(Product.objects.filter(
+                shop=self.source_shop, category__path__startswith=category.path
+            ))
+        with tenant_context(self.target_shop):
+            with transaction.atomic():
+                self._ensure_categories(categories)
+                return self._write(graphs)
+
+    def copy_menu(self):
+        """复制整个菜单（全部分类和上架商品）到目标店铺"""
+        with tenant_context(self.source_shop):
+            categories = []
+            for root in Category.objects.filter(shop=self.source_shop, parent__isnull=True):
+                categories.extend(self._load_categories(root))
+            graphs = self._load(Product.objects.filter(shop=self.source_shop, status__in=Product.MENU_STATUSES))
+        with tenant_context(self.target_shop):
+            with transaction.atomic():
+                self._ensure_categories(categories)
+                return self._write(graphs)
+
+    # 写入（在目标租户中执行）
+
+    def _ensure_categories(self, categories):
+        """按名称创建缺失的分类，分类数量少，逐个保存以维护路径和拼音"""
+        existing = {category.name: category for category in Category.objects.filter(shop=self.target_shop)}
+        for item in categories:
+            if item['name'] in existing:
+                continue
+            category = Category(
+                shop=self.target_shop,
+                name=item['name'],
+                parent=existing.get(item['parent']) if item['parent'] else None,
+                **item['fields']
+            )
+            category.save()
+            existing[category.name] = category
+
+    def _resolve_specifications(self, graphs):
+        """规格值映射到目标店铺：(规格名, 规格值) -> 规格值ID"""
+        needed = {
+            spec for graph in graphs for sku in graph['skus'] for spec in sku['specifications']
+        }
+        if not needed:
+            return {}
+
+        specifications = dict(Specification.objects.filter(shop=self.target_shop).values_list('name', 'id'))
+        missing = {(name, display_name) for name, display_name, _, _ in needed if name not in specifications}
+        if missing:
+            created = Specification.objects.bulk_create([
+                Specification(shop=self.target_shop, name=name, display_name=display_name)
+                for name, display_name in dict(missing).items()
+            ])
+            specifications.update((spec.name, spec.pk) for spec in created)
+
+        values = {
+            (specification_id, value): value_id
+            for specification_id, value, value_id in SpecificationValue.objects.filter(
+                specification__shop=self.target_shop
+            ).values_list('specification_id', 'value', 'id')
+        }
+        missing_values = {
+            (specifications[name], value): display_value
+            for name, _, value, display_value in needed
+            if (specifications[name], value) not in values
+        }
+        if missing_values:
+            created = SpecificationValue.objects.bulk_create([
+                SpecificationValue(specification_id=specification_id, value=value, display_value=display_value)
+                for (specification_id, value), display_value in missing_values.items()
+            ])
+            values.update(((value.specification_id, value.value), value.pk) for value in created)
+
+        return {
+            (name, value): values[(specifications[name], value)]
+            for name, _, value, _ in needed
+        }
+
+    def _sku_codes(self, graphs):
+        """生成 SKU 编码：同店复制加统一后缀；跨店复制保留原编码，冲突时加后缀"""
+        codes = [sku['fields']['sku_code'] for graph in graphs for sku in graph['skus']]
+        taken = set(ProductSKU.objects.filter(sku_code__in=codes).values_list('sku_code', flat=True))
+        suffix = f'-{uuid.uuid4().hex[:6].upper()}'
+
+        mapping = {}
+        for code in codes:
+            if not self.same_shop and code not in taken and code not in mapping.values():
+                mapping[code] = code
+            else:
+                mapping[code] = f'{code[:100 - len(suffix)]}{suffix}'
+        return mapping
+
+    @transaction.atomic
+    def _write(self, graphs):
+        if not graphs:
+            return []
+
+        categories = dict(Category.objects.filter(shop=self.target_shop).values_list('name', 'id'))
+        spec_values = self._resolve_specifications(graphs)
+        sku_codes = self._sku_codes(graphs)
+
+        # 商品（bulk_create 不经过 save()，搜索文本和拼音在这里计算）
+        products = []
+        for graph in graphs:
+            fields = graph['fields']
+            pinyin, pinyin_initials = name_to_pinyin(fields['name'])
+            products.append(Product(
+                shop=self.target_shop,
+                created_by=self.user,
+                category_id=categories.get(graph['category']),
+                search_text=build_search_text(fields['name'], fields['description'], graph['category']),
+                pinyin=pinyin,
+                pinyin_initials=pinyin_initials,
+                **fields
+            ))
+        Product.objects.bulk_create(products)
+
+        # SKU 及规格组合
+        skus, sku_specs = [], []
+        for product, graph in zip(products, graphs):
+            for item in graph['skus']:
+                fields = dict(item['fields'], sku_code=sku_codes[item['fields']['sku_code']])
+                spec_key = ProductSKU.spec_key_for(
+                    spec_values[(name, value)] for name, _, value, _ in item['specifications']
+                )
+                skus.append(ProductSKU(product=product, stock_quantity=0, spec_key=spec_key, **fields))
+                sku_specs.append(item['specifications'])
+        ProductSKU.objects.bulk_create(skus)
+
+        through = ProductSKU.specifications.through
+        through.objects.bulk_create([
+            through(productsku_id=sku.pk, specificationvalue_id=spec_values[(name, value)])
+            for sku, specifications in zip(skus, sku_specs)
+            for name, _, value, _ in specifications
+        ], ignore_conflicts=True)
+
+        # 属性及选项
+        attributes, attribute_options = [], []
+        for product, graph in zip(products, graphs):
+            for item in graph['attributes']:
+                attributes.append(ProductAttribute(product=product, **item['fields']))
+                attribute_options.append(item['options'])
+        ProductAttribute.objects.bulk_create(attributes)
+        ProductAttributeOption.objects.bulk_create([
+            ProductAttributeOption(attribute=attribute, **option)
+            for attribute, options in zip(attributes, attribute_options)
+            for option in options
+        ])
+
+        # 图集
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, **image)
+            for product, graph in zip(products, graphs)
+            for image in graph['images']
+        ])
+
+        Category.refresh_counts({product.category_id for product in products})
+        # 复制出的 SKU 库存为 0，有 SKU 的上架商品会转为缺货
+        sync_availability([product.pk for product in products], self.target_shop.schema_name)
+        record_changes('product', [product.pk for product in products])
+        bump_catalog_version(self.target_shop.schema_name)
+        return products
@@ -0,0 +1,94 @@
+"""
+商品导出
+使用服务端游标分块读取（iterator(chunk_size)），SKU 数量和总库存由聚合注解计算，
+CSV 边查询边输出；XLSX 使用 openpyxl 只写模式，内存占用与行数无关
+"""
+import csv
+import tempfile
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import serializers
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADERS = ['ID', '商品名称', '分类', '基础价格', '状态', 'SKU数量', '总库存', '创建时间']
+
+_EXPORT_FIELDS = (
+    'id', 'name', 'category__name', 'base_price', 'status',
+    'sku_count', 'total_stock', 'created_at'
+)
+
+_datetime_field = serializers.DateTimeField()
+
+
+class _Echo:
+    """csv.writer 的伪文件对象，write 直接返回写入内容"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    """逐行产出导出数据（服务端游标分块读取）"""
+    # 聚合查询不会使用 Meta.ordering，未指定排序时显式排序
+    if not queryset.query.order_by:
+        queryset = queryset.order_by('sort_order', 'name', 'id')
+
+    rows = queryset.annotate(
+        sku_count=Count('skus'),
+        total_stock=Coalesce(Sum('skus__stock_quantity'), 0)
+    ).values_list(*_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    for product_id, name, category_name, base_price, status, sku_count, total_stock, created_at in rows:
+        yield [
+            product_id,
+            name,
+            category_name or '',
+            base_price,
+            status,
+            sku_count,
+            total_stock,
+            _datetime_field.to_representation(created_at),
+        ]
+
+
+def stream_csv(queryset, filename='products_export.csv'):
+    """流式 CSV 响应（带 BOM，Excel 可直接打开）"""
+    writer = csv.writer(_Echo())
+
+    def content():
+        yield '\ufeff'
+        yield writer.writerow(EXPORT_HEADERS)
+        for row in export_rows(queryset):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(queryset, filename='products_export.xlsx'):
+    """
+    XLSX 响应
+    XLSX 是 zip 格式，需要写完才能发送；只写模式逐行落盘，写完后以文件流返回
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('商品')
+    sheet.append(EXPORT_HEADERS)
+    for row in export_rows(queryset):
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
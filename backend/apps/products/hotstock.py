@@ -0,0 +1,172 @@
+"""
+热点 SKU 库存计数器（秒杀）
+开启后 SKU 库存镜像到共享缓存计数器（需配置 REDIS_URL，进程内缓存下拒绝开启），
+扣减使用原子 DECR，不锁数据库行；售出数量累计在待同步计数中，
+由 sync_hot_stock 定期批量写回 ProductSKU.stock_quantity 和 InventoryLog。
+写回时锁定 SKU 行，同一 SKU 的多个写回串行执行，不会重复计入。
+关闭热点模式时先删除库存计数器，之后才提交的售出（事务提交回调）发现计数器已删除，立即自行写回，不会丢失。
+计数器扣减在外层事务回滚时不会自动恢复（只会少卖，不会超卖），关闭热点模式后以数据库库存为准。
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.core.caching import cache_is_shared, current_schema_name
+from .alerts import record_stock_changes
+from .changes import record_stock_flips
+from .models import InventoryLog, ProductSKU
+
+
+class HotStockUnavailable(Exception):
+    """当前缓存不支持热点库存模式"""
+
+
+class HotStockService:
+    """热点库存计数器"""
+
+    def __init__(self, schema_name=None):
+        self.schema_name = schema_name or current_schema_name()
+
+    def _stock_key(self, sku_id):
+        return f'hot:{self.schema_name}:{sku_id}:stock'
+
+    def _pending_key(self, sku_id):
+        return f'hot:{self.schema_name}:{sku_id}:pending'
+
+    def enable(self, sku):
+        """开启热点模式：以当前数据库库存初始化计数器（计数器必须在各 worker 间共享）"""
+        if not cache_is_shared():
+            raise HotStockUnavailable('热点库存模式需要共享缓存（配置 REDIS_URL）')
+
+        with transaction.atomic():
+            sku = ProductSKU.objects.select_for_update().get(pk=sku.pk)
+            if sku.is_hot_stock:
+                return sku
+
+            cache.set(self._stock_key(sku.pk), sku.stock_quantity, None)
+            # 保留上次关闭后尚未写回的数量
+            cache.add(self._pending_key(sku.pk), 0, None)
+            sku.is_hot_stock = True
+            ProductSKU.objects.filter(pk=sku.pk).update(is_hot_stock=True)
+        return sku
+
+    def disable(self, sku):
+        """
+        关闭热点模式：先停止计数器扣减，再把待同步数量写回数据库
+        待同步计数不删除：删除后才到达的售出由 record 自行写回
+        """
+        ProductSKU.objects.filter(pk=sku.pk).update(is_hot_stock=False)
+        cache.delete(self._stock_key(sku.pk))
+        self.flush([sku.pk])
+        sku.refresh_from_db()
+        return sku
+
+    def available(self, sku_id):
+        return cache.get(self._stock_key(sku_id))
+
+    def take(self, sku_id, quantity):
+        """
+        原子扣减计数器
+        返回 True 成功，False 库存不足；计数器不存在（缓存被清空）时返回 None，调用方应改走数据库
+        """
+        try:
+            remaining = cache.decr(self._stock_key(sku_id), quantity)
+        except ValueError:
+            return None
+
+        if remaining < 0:
+            cache.incr(self._stock_key(sku_id), quantity)
+            return False
+        return True
+
+    def give_back(self, sku_id, quantity):
+        try:
+            cache.incr(self._stock_key(sku_id), quantity)
+        except ValueError:
+            pass
+
+    def record(self, sku_id, sold):
+        """
+        累计待写回数据库的售出数量（归还时为负数）
+        热点模式已关闭（库存计数器已删除）时立即写回，否则这部分售出不会再被同步
+        """
+        self._add_pending(sku_id, sold)
+        if cache.get(self._stock_key(sku_id)) is None:
+            self.flush([sku_id])
+
+    def _add_pending(self, sku_id, sold):
+        key = self._pending_key(sku_id)
+        if not cache.add(key, sold, None):
+            cache.incr(key, sold)
+
+    def flush(self, sku_ids=None):
+        """
+        把待同步的售出数量批量写回数据库（每个 SKU 一条日志）
+        先按 SKU ID 顺序锁定 SKU 行再读取待同步数量，并发写回同一 SKU 时串行执行；
+        写回失败时待同步数量会加回，下次重试
+        """
+        from .services import refresh_stock_caches
+
+        if sku_ids is None:
+            sku_ids = list(ProductSKU.objects.filter(is_hot_stock=True).values_list('id', flat=True))
+        if not sku_ids:
+            return {}
+
+        deltas = {}
+        try:
+            with transaction.atomic():
+                locked = ProductSKU.objects.select_for_update().filter(
+                    pk__in=list(sku_ids)
+                ).order_by('pk').values_list('id', flat=True)
+                for sku_id in locked:
+                    sold = cache.get(self._pending_key(sku_id)) or 0
+                    if sold:
+                        # 只减去读取到的数量，期间新增的售出数量保留到下次
+                        cache.decr(self._pending_key(sku_id), sold)
+                        deltas[sku_id] = sold
+                if not deltas:
+                    return {}
+
+                now = timezone.now()
+                for sku_id, sold in deltas.items():
+                    ProductSKU.objects.filter(pk=sku_id).update(
+                        stock_quantity=F('stock_quantity') - sold,
+                        updated_at=now
+                    )
+
+                current = {
+                    sku_id: (stock_quantity, product_id, threshold)
+                    for sku_id, stock_quantity, product_id, threshold in ProductSKU.objects.filter(
+                        pk__in=list(deltas)
+                    ).values_list('id', 'stock_quantity', 'product_id', 'low_stock_threshold')
+                }
+                InventoryLog.objects.bulk_create([
+                    InventoryLog(
+                        sku_id=sku_id,
+                        action='sale' if sold > 0 else 'return',
+                        quantity_change=-sold,
+                        current_quantity=current[sku_id][0],
+                        notes='热点库存同步'
+                    )
+                    for sku_id, sold in deltas.items()
+                ])
+                record_stock_changes([
+                    (sku_id, current[sku_id][0] + sold, current[sku_id][0], current[sku_id][2])
+                    for sku_id, sold in deltas.items()
+                ])
+                flipped = record_stock_flips([
+                    (sku_id, current[sku_id][0] + sold, current[sku_id][0])
+                    for sku_id, sold in deltas.items()
+                ])
+                refresh_stock_caches(
+                    {sku_id: product_id for sku_id, (_, product_id, _) in current.items()},
+                    flipped,
+                    self.schema_name
+                )
+        except Exception:
+            for sku_id, sold in deltas.items():
+                self._add_pending(sku_id, sold)
+            raise
+
+        return deltas
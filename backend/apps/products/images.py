@@ -0,0 +1,211 @@
+"""
+商品图片缩略图
+原图按 IMAGE_VARIANT_WIDTHS 缩放并编码为 WebP（解码和编码是 CPU 密集操作，在进程池中执行），
+缩略图与原图存放在同一目录（foo.jpg -> foo_320w.webp），文件名记录在模型的 *_variants 字段，
+序列化器据此输出 srcset，不需要访问存储。缩略图尚未生成时 srcset 为空，客户端使用原图。
+上传请求只清空旧缩略图，不渲染；由 generate_image_variants 定期（如每分钟）补齐，
+进程池只在该命令的进程中创建，Web worker 不占用额外的 CPU 进程。
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from rest_framework import serializers
+
+from .changes import record_changes
+from .models import Category, Product, ProductImage, ProductSKU
+
+logger = logging.getLogger(__name__)
+
+# 模型 -> (图片字段, 缩略图字段)
+IMAGE_FIELDS = {
+    Category: ('image', 'image_variants'),
+    Product: ('main_image', 'main_image_variants'),
+    ProductSKU: ('image', 'image_variants'),
+    ProductImage: ('image', 'image_variants'),
+}
+
+# 订单、购物车中的商品图片使用的缩略图宽度
+THUMBNAIL_WIDTH = 320
+
+# 参与增量同步的模型（图集不在菜单中）
+SYNC_ENTITIES = {Category: 'category', Product: 'product', ProductSKU: 'sku'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS)
+        return _pool
+
+
+def render_variants(data, widths, quality):
+    """
+    在子进程中执行：把原图数据渲染为各宽度的 WebP，返回 [(宽度, 数据)]
+    不放大原图，原图比最大宽度小时额外输出一份原尺寸 WebP
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+
+        targets = [width for width in widths if width < image.width]
+        if image.width <= max(widths):
+            targets.append(image.width)
+
+        # 从大到小逐级缩放，每一级以上一级为源图，减少重采样的像素量
+        rendered = []
+        source = image
+        for width in sorted(set(targets), reverse=True):
+            if width != source.width:
+                height = max(1, round(source.height * width / source.width))
+                source = source.resize((width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            source.save(output, 'WEBP', quality=quality, method=4)
+            rendered.append((width, output.getvalue()))
+        return rendered
+
+
+def variant_name(name, width):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.webp'
+
+
+def variants_match(name, variants):
+    """缩略图是否由当前原图生成（原图被替换后需要重新生成）"""
+    root, _ = os.path.splitext(name)
+    return bool(variants) and all(value.startswith(f'{root}_') for value in variants.values())
+
+
+def _read(field_file):
+    field_file.open('rb')
+    try:
+        return field_file.read()
+    finally:
+        field_file.close()
+
+
+def _submit(field_file):
+    return _get_pool().submit(
+        render_variants,
+        _read(field_file),
+        tuple(settings.IMAGE_VARIANT_WIDTHS),
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+
+def _store(name, rendered):
+    """把渲染结果写入存储，返回 {宽度: 文件名}"""
+    variants = {}
+    for width, data in rendered:
+        target = variant_name(name, width)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        variants[str(width)] = default_storage.save(target, ContentFile(data))
+    return variants
+
+
+def backfill_variants(model, batch_size=50, force=False):
+    """
+    批量补齐缩略图（当前租户）
+    每批同时提交到进程池并行渲染，渲染结果批量写回；返回 (成功数, 失败数)
+    """
+    image_field, variants_field = IMAGE_FIELDS[model]
+    queryset = model.objects.exclude(Q(**{image_field: ''}) | Q(**{f'{image_field}__isnull': True}))
+    if not force:
+        queryset = queryset.filter(**{variants_field: {}})
+
+    done = failed = 0
+    last_pk = 0
+    while True:
+        # 按主键分页，写回后的行不会影响下一页的偏移
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').only('pk', image_field)[:batch_size])
+        if not batch:
+            return done, failed
+        last_pk = batch[-1].pk
+
+        futures = []
+        for instance in batch:
+            try:
+                futures.append((instance, _submit(getattr(instance, image_field))))
+            except OSError:
+                logger.exception('读取图片失败: %s #%s', model.__name__, instance.pk)
+                failed += 1
+
+        updated = []
+        for instance, future in futures:
+            try:
+                setattr(instance, variants_field, _store(getattr(instance, image_field).name, future.result()))
+            except Exception:
+                logger.exception('生成图片缩略图失败: %s #%s', model.__name__, instance.pk)
+                failed += 1
+                continue
+            updated.append(instance)
+
+        model.objects.bulk_update(updated, [variants_field])
+        if model in SYNC_ENTITIES:
+            record_changes(SYNC_ENTITIES[model], [instance.pk for instance in updated])
+        done += len(updated)
+
+
+def srcset_urls(variants, request=None):
+    """{宽度: URL}，按宽度升序"""
+    urls = {}
+    for width, name in sorted(variants.items(), key=lambda item: int(item[0])):
+        url = default_storage.url(name)
+        urls[width] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+# 缓存的详情中保存相对 URL 的图片字段：(字段, srcset 字段)
+DETAIL_IMAGE_FIELDS = (('main_image', 'main_image_srcset'), ('image', 'image_srcset'), ('image', 'srcset'))
+
+
+def _absolute_url(url, request):
+    return request.build_absolute_uri(url) if isinstance(url, str) and url.startswith('/') else url
+
+
+def absolute_image_urls(data, request):
+    """
+    把缓存中的相对图片 URL 转为绝对 URL（原地修改，与传入 request 序列化的结果一致）
+    覆盖商品主图、分类、SKU 和商品图片
+    """
+    for entry in [data, data.get('category') or {}, *data.get('skus', []), *data.get('images', [])]:
+        for image_field, srcset_field in DETAIL_IMAGE_FIELDS:
+            if entry.get(image_field):
+                entry[image_field] = _absolute_url(entry[image_field], request)
+            if entry.get(srcset_field):
+                entry[srcset_field] = {
+                    width: _absolute_url(url, request) for width, url in entry[srcset_field].items()
+                }
+    return data
+
+
+def thumbnail_url(field_file, variants, width=THUMBNAIL_WIDTH):
+    """不小于指定宽度的最小缩略图 URL；没有缩略图时返回原图 URL"""
+    if not field_file:
+        return ''
+    widths = sorted(int(key) for key in variants)
+    if not widths:
+        return field_file.url
+    chosen = next((value for value in widths if value >= width), widths[-1])
+    return default_storage.url(variants[str(chosen)])
+
+
+class SrcsetField(serializers.ReadOnlyField):
+    """缩略图 srcset：{宽度: URL}"""
+
+    def to_representation(self, value):
+        return srcset_urls(value or {}, self.context.get('request'))
@@ -0,0 +1,347 @@
+"""
+商品目录批量导入
+每行一个 SKU（SKU 编码为空的行只创建商品），同名商品合并为一个商品。
+文件逐行读取并校验，分类、规格通过内存映射解析，按批次在单个事务中 bulk_create 写入，
+最后返回逐行错误报告。
+"""
+import csv
+import io
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from apps.core.caching import bump_catalog_version
+from .autocomplete import name_to_pinyin
+from .availability import sync_availability
+from .changes import record_changes
+from .models import Category, Product, ProductSKU, Specification, SpecificationValue
+from .search import build_search_text
+from .services import MenuSnapshotService, ProductDetailCache
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# 表头（中文表头映射为字段名，英文字段名也可以直接使用）
+IMPORT_COLUMNS = {
+    '商品名称': 'name',
+    '分类': 'category',
+    '基础价格': 'base_price',
+    '状态': 'status',
+    '商品描述': 'description',
+    '主图': 'main_image',
+    'SKU编码': 'sku_code',
+    '销售价格': 'price',
+    '成本价': 'cost_price',
+    '库存数量': 'stock_quantity',
+    '低库存阈值': 'low_stock_threshold',
+    '规格': 'specifications',
+}
+
+_STATUS_VALUES = {
+    **{value: value for value, _ in Product.STATUS_CHOICES},
+    **{label: value for value, label in Product.STATUS_CHOICES},
+}
+
+# 规格格式：尺寸:大杯;温度:冰
+_SPEC_SEPARATOR_RE = re.compile(r'[;；]')
+_SPEC_PAIR_RE = re.compile(r'[:：]')
+
+
+def read_rows(uploaded_file, file_format='csv'):
+    """逐行读取导入文件，产出 (行号, {字段: 值})"""
+    if file_format == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    else:
+        rows = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig'))
+
+    header = next(rows, None)
+    if not header:
+        return
+
+    keys = [IMPORT_COLUMNS.get(str(cell).strip(), str(cell).strip()) if cell is not None else '' for cell in header]
+    for line, row in enumerate(rows, start=2):
+        values = {key: '' if value is None else str(value).strip() for key, value in zip(keys, row) if key}
+        if any(values.values()):
+            yield line, values
+
+
+def _decimal(value, label, errors, required=False):
+    if not value:
+        if required:
+            errors.append(f'{label}不能为空')
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        errors.append(f'{label}格式错误')
+        return None
+    if number < 0:
+        errors.append(f'{label}不能为负数')
+        return None
+    return number.quantize(Decimal('0.01'))
+
+
+def _integer(value, label, errors, default):
+    if not value:
+        return default
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or number != number.to_integral_value():
+        errors.append(f'{label}必须为整数')
+        return default
+    return int(number)
+
+
+class ProductImporter:
+    """
+    商品目录导入器
+    校验失败的行不会写入并记录在错误报告中；批次写入失败时整个批次回滚，
+    该批次所有行记为失败。dry_run 只校验不写入。
+    """
+
+    def __init__(self, shop, user=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+        self.shop = shop
+        self.user = user
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+
+        self.total_rows = 0
+        self.created_products = 0
+        self.created_skus = 0
+        self.failed_rows = 0
+        self.errors = []
+
+        self._categories = dict(Category.objects.filter(shop=shop).values_list('name', 'id'))
+        self._products = dict(Product.objects.filter(shop=shop).values_list('name', 'id'))
+        self._specifications = dict(Specification.objects.filter(shop=shop).values_list('name', 'id'))
+        self._spec_values = {
+            (specification_id, value): value_id
+            for specification_id, value, value_id in SpecificationValue.objects.filter(
+                specification__shop=shop
+            ).values_list('specification_id', 'value', 'id')
+        }
+        self._sku_codes = set(ProductSKU.objects.values_list('sku_code', flat=True))
+
+        self._touched_products = set()
+        self._touched_categories = set()
+
+    def run(self, rows):
+        batch = []
+        for line, values in rows:
+            self.total_rows += 1
+            row = self._validate(line, values)
+            if row is None:
+                continue
+
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+        if batch:
+            self._flush(batch)
+        if not self.dry_run:
+            self._finish()
+        return self.report()
+
+    def report(self):
+        return {
+            'total_rows': self.total_rows,
+            'created_products': self.created_products,
+            'created_skus': self.created_skus,
+            'failed_rows': self.failed_rows,
+            'dry_run': self.dry_run,
+            'errors': self.errors,
+        }
+
+    def _add_error(self, line, messages):
+        self.failed_rows += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'errors': messages})
+
+    def _validate(self, line, values):
+        errors = []
+        name = values.get('name', '')
+        if not name:
+            errors.append('商品名称不能为空')
+        elif len(name) > 200:
+            errors.append('商品名称不能超过200个字符')
+
+        status = values.get('status', '')
+        if status and status not in _STATUS_VALUES:
+            errors.append(f'状态无效: {status}')
+
+        sku_code = values.get('sku_code', '')
+        price = _decimal(values.get('price', ''), '销售价格', errors, required=bool(sku_code))
+        base_price = _decimal(values.get('base_price', ''), '基础价格', errors)
+        if base_price is None:
+            base_price = price
+        if base_price is None and name not in self._products:
+            errors.append('新商品需要填写基础价格或销售价格')
+
+        if sku_code and sku_code in self._sku_codes:
+            errors.append(f'SKU编码已存在: {sku_code}')
+
+        specifications = []
+        for pair in filter(None, _SPEC_SEPARATOR_RE.split(values.get('specifications', ''))):
+            parts = _SPEC_PAIR_RE.split(pair, maxsplit=1)
+            if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+                errors.append(f'规格格式错误: {pair}（应为 规格:规格值）')
+                continue
+            specifications.append((parts[0].strip(), parts[1].strip()))
+
+        row = {
+            'line': line,
+            'name': name,
+            'category': values.get('category', ''),
+            'description': values.get('description', ''),
+            'main_image': values.get('main_image', ''),
+            'status': _STATUS_VALUES.get(status, 'draft'),
+            'base_price': base_price,
+            'sku_code': sku_code,
+            'price': price,
+            'cost_price': _decimal(values.get('cost_price', ''), '成本价', errors),
+            'stock_quantity': _integer(values.get('stock_quantity', ''), '库存数量', errors, 0),
+            'low_stock_threshold': _integer(values.get('low_stock_threshold', ''), '低库存阈值', errors, 5),
+            'specifications': specifications,
+        }
+
+        if errors:
+            self._add_error(line, errors)
+            return None
+
+        if sku_code:
+            self._sku_codes.add(sku_code)
+        return row
+
+    def _flush(self, batch):
+        if self.dry_run:
+            return
+
+        maps = (dict(self._categories), dict(self._products), dict(self._specifications), dict(self._spec_values))
+        try:
+            with transaction.atomic():
+                created_products, created_skus = self._write_batch(batch)
+        except DatabaseError as exc:
+            # 批次已回滚，恢复映射，避免后续批次引用不存在的记录
+            self._categories, self._products, self._specifications, self._spec_values = maps
+            for row in batch:
+                self._add_error(row['line'], [f'批次写入失败: {exc}'])
+            return
+
+        self.created_products += created_products
+        self.created_skus += created_skus
+
+    def _write_batch(self, batch):
+        self._create_categories(batch)
+        self._create_specifications(batch)
+
+        new_products = {}
+        for row in batch:
+            if row['name'] not in self._products and row['name'] not in new_products:
+                new_products[row['name']] = self._build_product(row)
+        Product.objects.bulk_create(new_products.values(), batch_size=self.batch_size)
+        for name, product in new_products.items():
+            self._products[name] = product.pk
+            self._touched_categories.add(product.category_id)
+
+        rows_with_sku = [row for row in batch if row['sku_code']]
+        skus = [
+            ProductSKU(
+                product_id=self._products[row['name']],
+                sku_code=row['sku_code'],
+                price=row['price'],
+                cost_price=row['cost_price'],
+                stock_quantity=row['stock_quantity'],
+                low_stock_threshold=row['low_stock_threshold'],
+                spec_key=ProductSKU.spec_key_for(
+                    self._spec_values[(self._specifications[spec_name], value)]
+                    for spec_name, value in row['specifications']
+                ),
+            )
+            for row in rows_with_sku
+        ]
+        ProductSKU.objects.bulk_create(skus, batch_size=self.batch_size)
+
+        through = ProductSKU.specifications.through
+        through.objects.bulk_create(
+            [
+                through(productsku_id=sku.pk, specificationvalue_id=self._spec_values[
+                    (self._specifications[spec_name], value)
+                ])
+                for sku, row in zip(skus, rows_with_sku)
+                for spec_name, value in row['specifications']
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True
+        )
+
+        self._touched_products.update(self._products[row['name']] for row in batch)
+        return len(new_products), len(skus)
+
+    def _build_product(self, row):
+        category_id = self._categories.get(row['category']) if row['category'] else None
+        pinyin, pinyin_initials = name_to_pinyin(row['name'])
+        # bulk_create 不经过 Product.save()，搜索文本和拼音在这里计算
+        return Product(
+            shop=self.shop,
+            created_by=self.user,
+            name=row['name'],
+            description=row['description'],
+            category_id=category_id,
+            base_price=row['base_price'],
+            main_image=row['main_image'],
+            status=row['status'],
+            search_text=build_search_text(row['name'], row['description'], row['category']),
+            pinyin=pinyin,
+            pinyin_initials=pinyin_initials,
+        )
+
+    def _create_categories(self, batch):
+        """分类数量少，逐个保存以维护路径和拼音"""
+        for name in dict.fromkeys(row['category'] for row in batch):
+            if name and name not in self._categories:
+                category = Category(shop=self.shop, name=name)
+                category.save()
+                self._categories[name] = category.pk
+
+    def _create_specifications(self, batch):
+        spec_names = {spec_name for row in batch for spec_name, _ in row['specifications']}
+        missing = [name for name in spec_names if name not in self._specifications]
+        if missing:
+            created = Specification.objects.bulk_create([
+                Specification(shop=self.shop, name=name, display_name=name) for name in missing
+            ])
+            self._specifications.update((spec.name, spec.pk) for spec in created)
+
+        pairs = {
+            (self._specifications[spec_name], value)
+            for row in batch for spec_name, value in row['specifications']
+        }
+        missing_values = [pair for pair in pairs if pair not in self._spec_values]
+        if missing_values:
+            created = SpecificationValue.objects.bulk_create([
+                SpecificationValue(specification_id=specification_id, value=value, display_value=value)
+                for specification_id, value in missing_values
+            ])
+            self._spec_values.update(
+                ((value.specification_id, value.value), value.pk) for value in created
+            )
+
+    def _finish(self):
+        """批量写入不触发信号，导入结束后统一刷新计数和菜单缓存"""
+        if not self._touched_products:
+            return
+
+        Category.refresh_counts(self._touched_categories)
+        sync_availability(self._touched_products, self.shop.schema_name)
+        MenuSnapshotService.invalidate_products(self._touched_products, self.shop.schema_name)
+        ProductDetailCache.invalidate_products(self._touched_products, self.shop.schema_name)
+        record_changes('product', self._touched_products)
+        bump_catalog_version(self.shop.schema_name)
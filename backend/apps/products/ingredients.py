@@ -0,0 +1,211 @@
+"""
+原料库存（配方 / 物料清单）
+SKU 和属性选项（如加珍珠）配置每份的原料用量。下单时整单一次计算原料需求：
+一次查询读取订单涉及的全部配方行，在内存中按 数量 x 用量 汇总到原料，
+再按原料ID顺序加锁、一条 UPDATE ... FROM (VALUES ...) 写入并批量写流水。
+原料不足时抛出 InsufficientIngredientError，随订单事务整体回滚；取消订单时按该订单的扣减流水归还。
+原料库存变化使某些 SKU / 选项变为无法制作（或恢复可制作）时，刷新商品可售状态并递增原料版本号，
+菜单据此展示哪些饮品还能做。停用的原料不扣减，也不影响可售状态。
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from apps.core.caching import bump_version, get_version
+from .availability import sync_availability
+from .models import Ingredient, IngredientLog, ProductAttributeOption, RecipeItem
+
+INGREDIENT_SCOPE = 'ingredients'
+
+
+def get_ingredient_version(schema_name=None):
+    return get_version(INGREDIENT_SCOPE, schema_name)
+
+
+def bump_ingredient_version(schema_name=None):
+    bump_version(INGREDIENT_SCOPE, schema_name)
+
+
+class InsufficientIngredientError(Exception):
+    """原料不足"""
+
+    def __init__(self, ingredient_id, name, requested, available):
+        self.ingredient_id = ingredient_id
+        self.name = name
+        self.requested = requested
+        self.available = available
+        super().__init__(f'原料 {name} 不足（需要 {requested}，剩余 {available}）')
+
+
+class IngredientService:
+    """原料扣减、归还、调整和可制作份数"""
+
+    def __init__(self, shop, user=None):
+        self.shop = shop
+        self.user = user
+
+    def requirements(self, items):
+        """
+        汇总原料需求
+        items: [(sku_id, product_id, attribute_selections, quantity)]，attribute_selections 为
+        {属性名称: 选项值或选项值列表}（与订单项一致）；返回 {原料ID: 总用量}
+        """
+        items = [item for item in items if item[3]]
+
+        # 属性选项按 (商品, 属性名称, 选项值) 解析，只读取配置了配方的选项
+        options = {}
+        product_ids = {product_id for _, product_id, selections, _ in items if selections}
+        if product_ids:
+            options = {
+                (product_id, name, value): option_id
+                for option_id, product_id, name, value in ProductAttributeOption.objects.filter(
+                    attribute__product_id__in=product_ids, recipe_items__isnull=False
+                ).distinct().values_list('id', 'attribute__product_id', 'attribute__name', 'value')
+            }
+
+        lines = []
+        for sku_id, product_id, selections, quantity in items:
+            option_ids = []
+            for name, values in (selections or {}).items():
+                for value in values if isinstance(values, list) else [values]:
+                    option_id = options.get((product_id, name, str(value)))
+                    if option_id:
+                        option_ids.append(option_id)
+            lines.append((sku_id, option_ids, quantity))
+
+        sku_ids = {sku_id for sku_id, _, _ in lines if sku_id}
+        option_ids = {option_id for _, ids, _ in lines for option_id in ids}
+        if not sku_ids and not option_ids:
+            return {}
+
+        recipes = defaultdict(list)
+        for sku_id, option_id, ingredient_id, amount in RecipeItem.objects.filter(
+            Q(sku_id__in=sku_ids) | Q(attribute_option_id__in=option_ids),
+            ingredient__shop=self.shop,
+            ingredient__is_active=True
+        ).values_list('sku_id', 'attribute_option_id', 'ingredient_id', 'quantity'):
+            recipes[('sku', sku_id) if sku_id else ('option', option_id)].append((ingredient_id, amount))
+
+        totals = defaultdict(Decimal)
+        for sku_id, option_ids, quantity in lines:
+            for key in [('sku', sku_id), *(('option', option_id) for option_id in option_ids)]:
+                for ingredient_id, amount in recipes.get(key, ()):
+                    totals[ingredient_id] += amount * quantity
+        return dict(totals)
+
+    def reserve(self, items, reference_id='', notes='订单扣减原料'):
+        """按订单项扣减原料（任一原料不足时抛出 InsufficientIngredientError）"""
+        return self._apply(self.requirements(items), -1, 'sale', reference_id, notes)
+
+    def release(self, reference_id, notes='订单取消恢复原料'):
+        """
+        按单据的扣减流水归还原料（扣减合计减去已归还合计）
+        不按当前配方重新计算：下单后配方调整、原料停用都不影响归还的数量
+        """
+        totals = IngredientLog.objects.filter(
+            reference_id=reference_id, action__in=('sale', 'return'), ingredient__shop=self.shop
+        ).order_by().values('ingredient_id').annotate(total=Sum('quantity_change')).values_list(
+            'ingredient_id', 'total'
+        )
+        return self._apply(
+            {ingredient_id: -total for ingredient_id, total in totals if total < 0}, 1, 'return', reference_id, notes
+        )
+
+    def adjust(self, ingredient_id, quantity_change, action='adjustment', notes=''):
+        """手动调整（入库、报损、盘点），返回调整后的库存"""
+        direction = 1 if quantity_change > 0 else -1
+        return self._apply({ingredient_id: abs(quantity_change)}, direction, action, '', notes)[ingredient_id]
+
+    def _apply(self, requirements, direction, action, reference_id, notes):
+        requirements = {ingredient_id: amount for ingredient_id, amount in requirements.items() if amount}
+        if not requirements:
+            return {}
+
+        with transaction.atomic():
+            current = {
+                ingredient_id: (name, stock_quantity)
+                for ingredient_id, name, stock_quantity in Ingredient.objects.select_for_update().filter(
+                    pk__in=list(requirements), shop=self.shop
+                ).order_by('pk').values_list('id', 'name', 'stock_quantity')
+            }
+
+            stock = {}
+            for ingredient_id, amount in sorted(requirements.items()):
+                if ingredient_id not in current:
+                    raise Ingredient.DoesNotExist(f'原料 {ingredient_id} 不存在')
+                name, stock_quantity = current[ingredient_id]
+                if direction < 0 and stock_quantity < amount:
+                    raise InsufficientIngredientError(ingredient_id, name, amount, stock_quantity)
+                stock[ingredient_id] = stock_quantity + direction * amount
+
+            # 行锁已持有，直接写入计算后的库存
+            self._update_stock(stock)
+            IngredientLog.objects.bulk_create([
+                IngredientLog(
+                    ingredient_id=ingredient_id,
+                    action=action,
+                    quantity_change=direction * amount,
+                    current_quantity=stock[ingredient_id],
+                    reference_id=reference_id,
+                    notes=notes,
+                    created_by=self.user
+                )
+                for ingredient_id, amount in requirements.items()
+            ])
+            self._refresh_availability({
+                ingredient_id: (current[ingredient_id][1], stock[ingredient_id]) for ingredient_id in stock
+            })
+
+        return stock
+
+    @staticmethod
+    def _update_stock(stock_by_ingredient):
+        """UPDATE ... FROM (VALUES ...) 一条语句更新多个原料的库存"""
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        values = ', '.join(['(%s, %s::numeric)'] * len(stock_by_ingredient))
+        params = [item for pair in stock_by_ingredient.items() for item in pair]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS i SET stock_quantity = v.stock_quantity, updated_at = %s '
+                f'FROM (VALUES {values}) AS v(id, stock_quantity) WHERE i.id = v.id',
+                [timezone.now(), *params]
+            )
+
+    def _refresh_availability(self, changes):
+        """
+        changes: {原料ID: (变更前库存, 变更后库存)}
+        只有库存跨过某个配方用量（可制作 <-> 不可制作）时才刷新商品状态和原料版本号
+        """
+        recipes = RecipeItem.objects.filter(ingredient_id__in=list(changes)).values_list(
+            'ingredient_id', 'quantity', 'sku__product_id'
+        )
+        product_ids = set()
+        crossed = False
+        for ingredient_id, amount, product_id in recipes:
+            before, after = changes[ingredient_id]
+            if (before >= amount) != (after >= amount):
+                crossed = True
+                if product_id:
+                    product_ids.add(product_id)
+
+        if crossed:
+            sync_availability(product_ids, self.shop.schema_name)
+            bump_ingredient_version(self.shop.schema_name)
+
+    def availability(self):
+        """
+        当前原料库存下的可制作份数：{'skus': {SKU ID: 份数}, 'options': {选项ID: 份数}}
+        只包含配置了配方的 SKU / 选项，份数为各原料 库存 // 用量 的最小值
+        """
+        portions = {'skus': {}, 'options': {}}
+        for sku_id, option_id, amount, stock_quantity in RecipeItem.objects.filter(
+            ingredient__shop=self.shop, ingredient__is_active=True
+        ).values_list('sku_id', 'attribute_option_id', 'quantity', 'ingredient__stock_quantity'):
+            group, key = ('skus', sku_id) if sku_id else ('options', option_id)
+            count = max(int(stock_quantity // amount), 0)
+            portions[group][key] = min(portions[group].get(key, count), count)
+        return portions
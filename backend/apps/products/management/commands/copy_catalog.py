@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.products.cloning import CatalogCloner
+from apps.shops.models import Shop
+
+
+class Command(BaseCommand):
+    help = '把当前租户的商品目录复制到其他店铺（配合 tenant_command 使用，适合向大量门店推送菜单）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help='目标店铺 schema_name')
+        parser.add_argument('--all', action='store_true', help='复制到除当前店铺外的所有店铺')
+        parser.add_argument('--category', type=int, help='只复制指定分类（含子分类）')
+        parser.add_argument('--products', help='只复制指定商品，逗号分隔的商品ID')
+
+    def handle(self, *args, **options):
+        source = getattr(connection, 'tenant', None)
+        if source is None or not hasattr(source, 'products'):
+            raise CommandError('请通过 tenant_command 在来源店铺租户下执行')
+
+        targets = Shop.objects.exclude(pk=source.pk).exclude(schema_name='public')
+        if not options['all']:
+            if not options['targets']:
+                raise CommandError('请指定目标店铺或使用 --all')
+            targets = targets.filter(schema_name__in=options['targets'])
+
+        product_ids = [int(pk) for pk in options['products'].split(',')] if options['products'] else None
+
+        for shop in targets.order_by('pk'):
+            cloner = CatalogCloner(source, shop)
+            if product_ids:
+                products = cloner.copy_products(product_ids)
+            elif options['category']:
+                products = cloner.copy_category(options['category'])
+            else:
+                products = cloner.copy_menu()
+            self.stdout.write(f'{shop.schema_name}: 复制 {len(products)} 个商品')
+
+        self.stdout.write(self.style.SUCCESS('复制完成'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.caching import bump_catalog_version
+from apps.products.images import IMAGE_FIELDS, backfill_variants
+from apps.products.services import MenuSnapshotService, ProductDetailCache
+
+
+class Command(BaseCommand):
+    help = '批量生成当前租户图片的 WebP 缩略图（上传后由该命令补齐，建议定期执行；多租户下配合 tenant_command / all_tenants_command 使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='每批并行渲染的图片数量')
+        parser.add_argument('--force', action='store_true', help='重新生成已有缩略图的图片')
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in IMAGE_FIELDS:
+            done, failed = backfill_variants(model, batch_size=options['batch_size'], force=options['force'])
+            total += done
+            message = f'{model._meta.verbose_name}: 生成 {done} 张'
+            if failed:
+                self.stdout.write(self.style.WARNING(f'{message}，失败 {failed} 张（详见日志）'))
+            else:
+                self.stdout.write(message)
+
+        if total:
+            # 批量写回不触发信号，统一丢弃菜单缓存
+            MenuSnapshotService.invalidate_all()
+            ProductDetailCache.invalidate_all()
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'完成，共生成 {total} 张图片的缩略图'))
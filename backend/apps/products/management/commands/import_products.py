@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.products.imports import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = '从 CSV / XLSX 批量导入当前租户的商品（配合 tenant_command 使用，适合大批量初始化）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='导入文件路径')
+        parser.add_argument('--dry-run', action='store_true', help='只校验，不写入')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每个事务写入的行数')
+
+    def handle(self, *args, **options):
+        shop = getattr(connection, 'tenant', None)
+        if shop is None or not hasattr(shop, 'products'):
+            raise CommandError('请通过 tenant_command 在店铺租户下执行')
+
+        path = options['path']
+        file_format = 'xlsx' if path.lower().endswith('.xlsx') else 'csv'
+        importer = ProductImporter(shop, dry_run=options['dry_run'], batch_size=options['batch_size'])
+
+        with open(path, 'rb') as upload:
+            report = importer.run(read_rows(upload, file_format))
+
+        errors = report.pop('errors')
+        self.stdout.write(json.dumps(report, ensure_ascii=False))
+        for error in errors:
+            self.stdout.write(self.style.WARNING(f"第 {error['row']} 行: {'；'.join(error['errors'])}"))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.products.models import CatalogChange
+
+
+class Command(BaseCommand):
+    help = '清理当前租户过期的目录变更日志（多租户下配合 tenant_command / all_tenants_command 使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='保留最近多少天的变更')
+
+    def handle(self, *args, **options):
+        # 保留最新一条，增量同步据此判断客户端的序号是否早于已清理的日志
+        latest = CatalogChange.objects.aggregate(latest=Max('seq'))['latest']
+        if latest is None:
+            self.stdout.write('没有变更日志')
+            return
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = CatalogChange.objects.filter(created_at__lt=cutoff, seq__lt=latest).delete()
+        self.stdout.write(self.style.SUCCESS(f'已清理 {deleted} 条目录变更'))
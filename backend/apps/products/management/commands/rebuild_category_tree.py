@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.products.changes import record_changes
+from apps.products.models import Category
+
+
+class Command(BaseCommand):
+    help = '重建当前租户分类的物化路径和冗余计数（多租户下配合 tenant_command / all_tenants_command 使用）'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        categories = list(Category.objects.order_by('pk').only('id', 'parent_id', 'path', 'depth'))
+        by_parent = {}
+        for category in categories:
+            by_parent.setdefault(category.parent_id, []).append(category)
+
+        # 自顶向下计算路径
+        changed = []
+        stack = [(category, '/') for category in by_parent.get(None, [])]
+        while stack:
+            category, parent_path = stack.pop()
+            path = f'{parent_path}{category.pk}/'
+            if (category.path, category.depth) != (path, path.count('/') - 2):
+                category.path, category.depth = path, path.count('/') - 2
+                changed.append(category)
+            stack.extend((child, path) for child in by_parent.get(category.pk, []))
+
+        Category.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        record_changes('category', [category.pk for category in changed])
+        Category.refresh_counts([category.pk for category in categories])
+        self.stdout.write(self.style.SUCCESS(f'已更新 {len(changed)} 个分类路径，{len(categories)} 个分类计数'))
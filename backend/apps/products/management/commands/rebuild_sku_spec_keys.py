@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.caching import bump_catalog_version
+from apps.products.changes import record_changes
+from apps.products.models import ProductSKU
+from apps.products.services import MenuSnapshotService, ProductDetailCache
+
+
+class Command(BaseCommand):
+    help = '重建当前租户 SKU 的规格组合键（多租户下配合 tenant_command / all_tenants_command 使用）'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        sku_ids = list(ProductSKU.objects.values_list('id', flat=True))
+        ProductSKU.refresh_spec_keys(sku_ids)
+
+        # 批量更新不触发信号，统一丢弃菜单缓存
+        MenuSnapshotService.invalidate_all()
+        ProductDetailCache.invalidate_all()
+        record_changes('sku', sku_ids)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'已重建 {len(sku_ids)} 个 SKU 的规格组合键'))
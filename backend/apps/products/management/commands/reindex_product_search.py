@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.autocomplete import reindex_pinyin
+from apps.products.models import Category, Product
+from apps.products.search import reindex_products
+
+
+class Command(BaseCommand):
+    help = '重建当前租户的商品搜索文本和名称拼音（多租户下配合 tenant_command / all_tenants_command 使用）'
+
+    def handle(self, *args, **options):
+        count = reindex_products(Product.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 个商品的搜索文本'))
+
+        count = reindex_pinyin(Product.objects.all()) + reindex_pinyin(Category.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 个商品 / 分类的拼音'))
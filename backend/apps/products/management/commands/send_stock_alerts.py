@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.products.alerts import StockAlertNotifier
+
+
+class Command(BaseCommand):
+    help = '汇总发送当前租户的低库存预警通知（配合 tenant_command 常驻运行，防抖间隔见 STOCK_ALERT_DEBOUNCE_SECONDS）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30.0, help='检查间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='只检查一次')
+
+    def handle(self, *args, **options):
+        shop = getattr(connection, 'tenant', None)
+        if shop is None or not hasattr(shop, 'products'):
+            raise CommandError('请通过 tenant_command 在店铺租户下执行')
+
+        notifier = StockAlertNotifier(shop)
+        while True:
+            count = notifier.send_pending()
+            if count:
+                self.stdout.write(f'已通知 {count} 条低库存预警')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.products.stockhistory import StockHistoryService
+
+
+class Command(BaseCommand):
+    help = '补齐当前租户截至昨天的每日收盘库存快照（每天凌晨配合 all_tenants_command 执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=date.fromisoformat, help='快照截止日期（YYYY-MM-DD），默认昨天')
+
+    def handle(self, *args, **options):
+        shop = getattr(connection, 'tenant', None)
+        if shop is None or not hasattr(shop, 'products'):
+            raise CommandError('请通过 tenant_command / all_tenants_command 在店铺租户下执行')
+
+        days = StockHistoryService(shop).take_snapshots(options['until'])
+        if not days:
+            self.stdout.write('快照已是最新')
+            return
+        self.stdout.write(self.style.SUCCESS(f'已生成 {days[0]} 至 {days[-1]} 共 {len(days)} 天的库存快照'))
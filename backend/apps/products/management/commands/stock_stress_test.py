@@ -0,0 +1,88 @@
+import threading
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from apps.products.models import InventoryLog, Product, ProductSKU
+from apps.products.services import InsufficientStockError, InventoryService
+
+
+class Command(BaseCommand):
+    help = '库存扣减并发压力测试：多个线程同时抢购同一 SKU，校验不超卖（会创建并删除临时商品）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=50, help='初始库存')
+        parser.add_argument('--workers', type=int, default=20, help='并发线程数')
+        parser.add_argument('--attempts', type=int, default=10, help='每个线程的下单次数')
+        parser.add_argument('--quantity', type=int, default=1, help='每次扣减数量')
+
+    def handle(self, *args, **options):
+        shop = getattr(connection, 'tenant', None)
+        if shop is None or not hasattr(shop, 'products'):
+            raise CommandError('请通过 tenant_command 在店铺租户下执行')
+
+        product = Product.objects.create(
+            shop=shop, name=f'压测商品-{uuid.uuid4().hex[:8]}', base_price=Decimal('1.00'), status='draft'
+        )
+        sku = ProductSKU.objects.create(
+            product=product,
+            sku_code=f'STRESS-{uuid.uuid4().hex[:12]}',
+            price=Decimal('1.00'),
+            stock_quantity=options['stock']
+        )
+
+        counters = {'success': 0, 'rejected': 0, 'errors': []}
+        lock = threading.Lock()
+
+        def worker():
+            connection.set_tenant(shop)
+            service = InventoryService(shop)
+            try:
+                for _ in range(options['attempts']):
+                    try:
+                        service.reserve([(sku.pk, options['quantity'])], reference_id='stress-test')
+                        outcome = 'success'
+                    except InsufficientStockError:
+                        outcome = 'rejected'
+                    with lock:
+                        counters[outcome] += 1
+            except Exception as exc:
+                with lock:
+                    counters['errors'].append(repr(exc))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            sku.refresh_from_db()
+            logs = InventoryLog.objects.filter(sku=sku, action='sale').count()
+            expected_success = min(
+                options['stock'] // options['quantity'],
+                options['workers'] * options['attempts']
+            )
+            expected_stock = options['stock'] - expected_success * options['quantity']
+
+            self.stdout.write(
+                f"成功 {counters['success']}，库存不足 {counters['rejected']}，"
+                f"剩余库存 {sku.stock_quantity}，销售日志 {logs}"
+            )
+            for error in counters['errors']:
+                self.stdout.write(self.style.ERROR(error))
+
+            if (
+                counters['errors']
+                or counters['success'] != expected_success
+                or sku.stock_quantity != expected_stock
+                or logs != counters['success']
+            ):
+                raise CommandError('库存扣减结果与预期不一致')
+            self.stdout.write(self.style.SUCCESS('未发生超卖'))
+        finally:
+            product.delete()
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.products.hotstock import HotStockService
+
+
+class Command(BaseCommand):
+    help = '把热点 SKU 缓存计数器中的售出数量批量写回数据库（配合 tenant_command 常驻运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0, help='同步间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='只同步一次')
+
+    def handle(self, *args, **options):
+        service = HotStockService(connection.schema_name)
+
+        while True:
+            deltas = service.flush()
+            if deltas:
+                self.stdout.write(f'已同步 {len(deltas)} 个 SKU，共 {sum(deltas.values())} 件')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
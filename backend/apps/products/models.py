@@ -1,8 +1,13 @@
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Substr
 
 User = get_user_model()
 
@@ -20,9 +25,21 @@ class Category(models.Model):
         verbose_name='父级分类'
     )
     image = models.ImageField(upload_to='categories/', blank=True, null=True, verbose_name='分类图片')
+    # 缩略图 {宽度: 文件名}，见 apps.products.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='分类图片缩略图')
     sort_order = models.IntegerField(default=0, verbose_name='排序')
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
 
+    # 拼音（自动补全，见 apps.products.autocomplete）
+    pinyin = models.CharField(max_length=500, blank=True, editable=False, verbose_name='拼音')
+    pinyin_initials = models.CharField(max_length=100, blank=True, editable=False, verbose_name='拼音首字母')
+
+    # 树结构（物化路径，如 /1/5/12/）和冗余计数，保存时维护
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True, verbose_name='路径')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='层级')
+    children_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='子分类数量')
+    products_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='商品数量')
+
     # 多租户关联
     shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='categories')
 
@@ -35,10 +52,75 @@ class Category(models.Model):
         verbose_name_plural = '商品分类'
         ordering = ['sort_order', 'name']
         unique_together = ['shop', 'name']
+        indexes = [
+            # 子树查询使用 path LIKE '/1/5/%'
+            models.Index(fields=['path'], name='product_cat_path_like_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def is_descendant_of(self, other):
+        """是否为 other 的子孙分类（含自身）"""
+        return bool(other.path) and self.path.startswith(other.path)
+
+    def _moves_under_itself(self):
+        return bool(self.pk and self.parent_id) and (
+            self.parent_id == self.pk or self.parent.is_descendant_of(self)
+        )
+
+    def clean(self):
+        if self._moves_under_itself():
+            raise ValidationError({'parent': '不能将分类移动到自身或其子分类下'})
+
+    def save(self, *args, **kwargs):
+        from .autocomplete import name_to_pinyin
+
+        if self._moves_under_itself():
+            raise ValueError('不能将分类移动到自身或其子分类下')
+
+        self.pinyin, self.pinyin_initials = name_to_pinyin(self.name)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'pinyin', 'pinyin_initials'}
+        super().save(*args, **kwargs)
+        self._sync_path()
+
+    def _sync_path(self):
+        """维护物化路径；父级变化时整体移动子树"""
+        parent_path = self.parent.path if self.parent_id else '/'
+        path = f'{parent_path}{self.pk}/'
+        if path == self.path:
+            return
+
+        old_path, old_depth = self.path, self.depth
+        self.path = path
+        self.depth = path.count('/') - 2
+        Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (self.depth - old_depth)
+            )
+
+    @classmethod
+    def refresh_counts(cls, category_ids):
+        """重新统计分类的子分类数量和商品数量"""
+        category_ids = {category_id for category_id in category_ids if category_id}
+        if not category_ids:
+            return
+
+        children = cls.objects.filter(parent=OuterRef('pk')).order_by().values('parent').annotate(
+            total=Count('pk')
+        ).values('total')[:1]
+        products = Product.objects.filter(category=OuterRef('pk')).order_by().values('category').annotate(
+            total=Count('pk')
+        ).values('total')[:1]
+        cls.objects.filter(pk__in=category_ids).update(
+            children_count=Coalesce(Subquery(children), 0),
+            products_count=Coalesce(Subquery(products), 0)
+        )
+
 
 class Product(models.Model):
     """商品"""
@@ -48,6 +130,8 @@ class Product(models.Model):
         ('inactive', '下架'),
         ('out_of_stock', '缺货'),
     )
+    # 顾客端菜单展示的状态（缺货商品展示为售罄），缺货状态由库存自动维护，见 apps.products.availability
+    MENU_STATUSES = ('active', 'out_of_stock')
 
     name = models.CharField(max_length=200, verbose_name='商品名称')
     description = models.TextField(blank=True, verbose_name='商品描述')
@@ -77,6 +161,7 @@ class Product(models.Model):
 
     # 图片
     main_image = models.ImageField(upload_to='products/main/', verbose_name='主图')
+    main_image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='主图缩略图')
     images = models.JSONField(default=list, blank=True, verbose_name='商品图集')
 
     # 状态和属性
@@ -88,6 +173,11 @@ class Product(models.Model):
     allow_customization = models.BooleanField(default=False, verbose_name='允许定制')
     preparation_time = models.IntegerField(default=10, verbose_name='准备时间(分钟)')
 
+    # 搜索（名称、分类名、描述预先分词，见 apps.products.search）
+    search_text = models.TextField(blank=True, editable=False, verbose_name='搜索文本')
+    pinyin = models.CharField(max_length=1000, blank=True, editable=False, verbose_name='拼音')
+    pinyin_initials = models.CharField(max_length=200, blank=True, editable=False, verbose_name='拼音首字母')
+
     # 多租户关联
     shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='products')
 
@@ -100,10 +190,30 @@ class Product(models.Model):
         verbose_name = '商品'
         verbose_name_plural = '商品'
         ordering = ['sort_order', 'name']
+        indexes = [
+            # 全文索引（表达式需与 apps.products.search.search_vector 一致）
+            GinIndex(SearchVector('search_text', config='simple'), name='products_search_idx'),
+            # 名称三元组索引（需要 pg_trgm 扩展）
+            GinIndex(fields=['name'], name='products_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        from .autocomplete import name_to_pinyin
+        from .search import build_search_text
+
+        self.search_text = build_search_text(
+            self.name,
+            self.description,
+            self.category.name if self.category_id else ''
+        )
+        self.pinyin, self.pinyin_initials = name_to_pinyin(self.name)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'search_text', 'pinyin', 'pinyin_initials'}
+        super().save(*args, **kwargs)
+
 
 class Specification(models.Model):
     """规格名称（如：尺寸、颜色、温度等）"""
@@ -182,12 +292,17 @@ class ProductSKU(models.Model):
 
     # 规格组合（存储规格值的ID）
     specifications = models.ManyToManyField(SpecificationValue, blank=True, verbose_name='规格组合')
+    # 规格组合键：排序后的规格值ID以 - 连接（如 3-7-12），由 spec_key_for 生成，规格组合变化时自动维护
+    spec_key = models.CharField(max_length=255, blank=True, editable=False, verbose_name='规格组合键')
 
     # 图片（可覆盖商品主图）
     image = models.ImageField(upload_to='products/skus/', blank=True, null=True, verbose_name='SKU图片')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='SKU图片缩略图')
 
     # 状态
     is_active = models.BooleanField(default=True, verbose_name='是否启用')
+    # 热点库存模式（秒杀），开启后库存由缓存计数器扣减，见 apps.products.hotstock
+    is_hot_stock = models.BooleanField(default=False, editable=False, verbose_name='热点库存模式')
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -196,6 +311,16 @@ class ProductSKU(models.Model):
         db_table = 'product_skus'
         verbose_name = '商品SKU'
         verbose_name_plural = '商品SKU'
+        indexes = [
+            # 低库存列表（条件需与 low_stock_alert 的查询一致）
+            models.Index(
+                fields=['product'],
+                name='product_skus_low_stock_idx',
+                condition=models.Q(stock_quantity__lte=F('low_stock_threshold'), stock_quantity__gt=0)
+            ),
+            # 按规格组合定位 SKU
+            models.Index(fields=['product', 'spec_key'], name='product_skus_spec_key_idx'),
+        ]
 
     def __str__(self):
         spec_values = " | ".join([str(sv) for sv in self.specifications.all()])
@@ -211,6 +336,56 @@ class ProductSKU(models.Model):
         """检查是否低库存"""
         return 0 < self.stock_quantity <= self.low_stock_threshold
 
+    @staticmethod
+    def spec_key_for(value_ids):
+        """规格值ID集合 -> 规格组合键（与选择顺序无关）"""
+        return '-'.join(str(value_id) for value_id in sorted({int(value_id) for value_id in value_ids}))
+
+    @classmethod
+    def refresh_spec_keys(cls, sku_ids):
+        """按规格组合表重新计算规格组合键（一次查询读取，一次批量更新）"""
+        sku_ids = {sku_id for sku_id in sku_ids if sku_id}
+        if not sku_ids:
+            return
+
+        values = {sku_id: [] for sku_id in sku_ids}
+        for sku_id, value_id in cls.specifications.through.objects.filter(
+            productsku_id__in=sku_ids
+        ).values_list('productsku_id', 'specificationvalue_id'):
+            values[sku_id].append(value_id)
+
+        skus = [cls(pk=sku_id, spec_key=cls.spec_key_for(value_ids)) for sku_id, value_ids in values.items()]
+        cls.objects.bulk_update(skus, ['spec_key'], batch_size=1000)
+
+
+class ProductBarcode(models.Model):
+    """商品条码（一个 SKU 可以有多个条码；不关联 SKU 时为商品条码）"""
+    barcode = models.CharField(max_length=64, unique=True, verbose_name='条码')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='barcodes')
+    sku = models.ForeignKey(
+        ProductSKU,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='barcodes'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'product_barcodes'
+        verbose_name = '商品条码'
+        verbose_name_plural = '商品条码'
+
+    def __str__(self):
+        return self.barcode
+
+    def save(self, *args, **kwargs):
+        self.barcode = self.barcode.strip()
+        if self.sku_id:
+            self.product_id = self.sku.product_id
+        super().save(*args, **kwargs)
+
 
 class ProductAttribute(models.Model):
     """商品属性（如：辣度、甜度等）"""
@@ -272,6 +447,88 @@ class ProductAttributeOption(models.Model):
         return f"{self.attribute.name}: {self.value}"
 
 
+class Ingredient(models.Model):
+    """原料（牛奶、茶汤、珍珠等），按配方随订单扣减，见 apps.products.ingredients"""
+    UNIT_CHOICES = (
+        ('g', '克'),
+        ('ml', '毫升'),
+        ('pcs', '个'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name='原料名称')
+    unit = models.CharField(max_length=10, choices=UNIT_CHOICES, default='g', verbose_name='单位')
+    stock_quantity = models.DecimalField(max_digits=12, decimal_places=3, default=0, verbose_name='库存数量')
+    low_stock_threshold = models.DecimalField(max_digits=12, decimal_places=3, default=0, verbose_name='低库存阈值')
+    is_active = models.BooleanField(default=True, verbose_name='是否启用')
+
+    shop = models.ForeignKey('shops.Shop', on_delete=models.CASCADE, related_name='ingredients')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ingredients'
+        verbose_name = '原料'
+        verbose_name_plural = '原料'
+        ordering = ['name']
+        unique_together = ['shop', 'name']
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeItem(models.Model):
+    """配方用量：每份 SKU 或每次选择属性选项（如加珍珠）消耗的原料"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='recipe_items')
+    sku = models.ForeignKey(
+        ProductSKU, on_delete=models.CASCADE, null=True, blank=True, related_name='recipe_items'
+    )
+    attribute_option = models.ForeignKey(
+        ProductAttributeOption, on_delete=models.CASCADE, null=True, blank=True, related_name='recipe_items'
+    )
+    quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=3,
+        validators=[MinValueValidator(Decimal('0.001'))],
+        verbose_name='用量'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'recipe_items'
+        verbose_name = '配方用量'
+        verbose_name_plural = '配方用量'
+        constraints = [
+            # 只能关联 SKU 和属性选项中的一个
+            models.CheckConstraint(
+                condition=(
+                    models.Q(sku__isnull=False, attribute_option__isnull=True)
+                    | models.Q(sku__isnull=True, attribute_option__isnull=False)
+                ),
+                name='recipe_items_single_target'
+            ),
+            models.UniqueConstraint(
+                fields=['sku', 'ingredient'],
+                name='recipe_items_sku_ingredient_uniq',
+                condition=models.Q(sku__isnull=False)
+            ),
+            models.UniqueConstraint(
+                fields=['attribute_option', 'ingredient'],
+                name='recipe_items_option_ingredient_uniq',
+                condition=models.Q(attribute_option__isnull=False)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sku or self.attribute_option} - {self.ingredient}: {self.quantity}"
+
+    def clean(self):
+        if bool(self.sku_id) == bool(self.attribute_option_id):
+            raise ValidationError('请选择 SKU 或属性选项中的一个')
+
+
 class InventoryLog(models.Model):
     """库存变更日志"""
     ACTION_CHOICES = (
@@ -297,11 +554,121 @@ class InventoryLog(models.Model):
         verbose_name = '库存日志'
         verbose_name_plural = '库存日志'
         ordering = ['-created_at']
+        indexes = [
+            # 按 SKU 和时间段回放日志（库存快照、历史库存重建，见 apps.products.stockhistory）
+            models.Index(fields=['sku', 'created_at'], name='inventory_logs_sku_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sku} - {self.action} - {self.quantity_change}"
 
 
+class StockSnapshot(models.Model):
+    """每日收盘库存快照（每个 SKU 每天一行，见 apps.products.stockhistory）"""
+    sku = models.ForeignKey(ProductSKU, on_delete=models.CASCADE, related_name='stock_snapshots')
+    date = models.DateField(verbose_name='日期')
+    stock_quantity = models.IntegerField(verbose_name='收盘库存')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_snapshots'
+        verbose_name = '库存快照'
+        verbose_name_plural = '库存快照'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'sku'], name='stock_snapshots_date_sku_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.sku} - {self.date}: {self.stock_quantity}"
+
+
+class IngredientLog(models.Model):
+    """原料库存流水"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='logs')
+    action = models.CharField(max_length=20, choices=InventoryLog.ACTION_CHOICES)
+    quantity_change = models.DecimalField(max_digits=12, decimal_places=3, verbose_name='数量变化')
+    current_quantity = models.DecimalField(max_digits=12, decimal_places=3, verbose_name='变更后数量')
+    reference_id = models.CharField(max_length=100, blank=True, verbose_name='关联单据ID')
+    notes = models.TextField(blank=True, verbose_name='备注')
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ingredient_logs'
+        verbose_name = '原料流水'
+        verbose_name_plural = '原料流水'
+        ordering = ['-created_at']
+        indexes = [
+            # 取消订单时按单据归还原料（见 apps.products.ingredients.IngredientService.release）
+            models.Index(fields=['reference_id'], name='ingredient_logs_reference_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient} - {self.action} - {self.quantity_change}"
+
+
+class StockAlert(models.Model):
+    """低库存预警（库存跌破阈值时产生，回升到阈值以上时解除，见 apps.products.alerts）"""
+    sku = models.ForeignKey(ProductSKU, on_delete=models.CASCADE, related_name='stock_alerts')
+    stock_quantity = models.IntegerField(verbose_name='触发时库存')
+    threshold = models.IntegerField(verbose_name='预警阈值')
+    notified_at = models.DateTimeField(null=True, blank=True, verbose_name='通知时间')
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name='解除时间')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_alerts'
+        verbose_name = '低库存预警'
+        verbose_name_plural = '低库存预警'
+        ordering = ['-created_at']
+        constraints = [
+            # 每个 SKU 同时只有一条未解除的预警
+            models.UniqueConstraint(
+                fields=['sku'],
+                name='stock_alerts_open_sku_uniq',
+                condition=models.Q(resolved_at__isnull=True)
+            ),
+        ]
+        indexes = [
+            # 待发送通知的预警
+            models.Index(
+                fields=['created_at'],
+                name='stock_alerts_pending_idx',
+                condition=models.Q(notified_at__isnull=True, resolved_at__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.sku} - {self.stock_quantity}/{self.threshold}"
+
+
+class CatalogChange(models.Model):
+    """商品目录变更日志（增量同步，见 apps.products.changes）"""
+    ENTITY_CHOICES = (
+        ('category', '分类'),
+        ('product', '商品'),
+        ('sku', 'SKU'),
+        ('attribute_option', '属性选项'),
+    )
+
+    # 每个租户 schema 有独立的序列；读取端只读取水位以内的序号（见 apps.products.changes.change_watermark）
+    seq = models.BigAutoField(primary_key=True, verbose_name='序号')
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES, verbose_name='对象类型')
+    object_id = models.BigIntegerField(verbose_name='对象ID')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'catalog_changes'
+        verbose_name = '目录变更'
+        verbose_name_plural = '目录变更'
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"#{self.seq} {self.entity}:{self.object_id}"
+
+
 class ProductImage(models.Model):
     """商品图片"""
     product = models.ForeignKey(
@@ -310,6 +677,7 @@ class ProductImage(models.Model):
         related_name='product_images'
     )
     image = models.ImageField(upload_to='products/gallery/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='缩略图')
     alt_text = models.CharField(max_length=200, blank=True, verbose_name='替代文本')
     sort_order = models.IntegerField(default=0, verbose_name='排序')
 
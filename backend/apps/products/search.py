@@ -0,0 +1,114 @@
+"""
+商品搜索
+search_text 保存预先分词的文本（中文按单字 + 双字切分），
+查询使用 simple 配置的全文索引，并结合商品名称的三元组相似度排序。
+需要数据库启用 pg_trgm 扩展（CREATE EXTENSION IF NOT EXISTS pg_trgm）。
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q
+from rest_framework import filters
+
+SEARCH_CONFIG = 'simple'
+
+_CJK_RUN = r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+'
+_TOKEN_RE = re.compile(rf'{_CJK_RUN}|[0-9a-z]+')
+_CJK_RE = re.compile(_CJK_RUN)
+
+
+def _cjk_bigrams(run):
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize_document(text):
+    """文档分词：中文输出单字和双字，其余按字母数字切分"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _CJK_RE.fullmatch(run):
+            tokens.extend(run)
+            tokens.extend(_cjk_bigrams(run))
+        else:
+            tokens.append(run)
+    return list(dict.fromkeys(tokens))
+
+
+def tokenize_query(text):
+    """查询分词：中文按双字切分（单字时保留单字），其余按字母数字切分"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _CJK_RE.fullmatch(run) and len(run) > 1:
+            tokens.extend(_cjk_bigrams(run))
+        else:
+            tokens.append(run)
+    return list(dict.fromkeys(tokens))
+
+
+def build_search_text(name, description='', category_name=''):
+    """生成商品的 search_text"""
+    return ' '.join(tokenize_document(' '.join(filter(None, [name, category_name, description]))))
+
+
+def build_search_query(text):
+    """构造 tsquery：所有词都需匹配，字母数字词按前缀匹配"""
+    tokens = tokenize_query(text)
+    if not tokens:
+        return None
+
+    terms = [token if _CJK_RE.fullmatch(token) else f'{token}:*' for token in tokens]
+    return SearchQuery(' & '.join(terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_vector():
+    """与 Product 上函数索引一致的表达式"""
+    return SearchVector('search_text', config=SEARCH_CONFIG)
+
+
+def search_products(queryset, text):
+    """
+    在商品查询集中搜索，按相关度排序
+    全文匹配或名称三元组相似（容错拼写）的商品都会返回
+    """
+    text = (text or '').strip()
+    if not text:
+        return queryset
+
+    query = build_search_query(text)
+    similarity = TrigramSimilarity('name', text)
+
+    if query is None:
+        return queryset.annotate(rank=similarity).filter(
+            Q(name__icontains=text) | Q(rank__gt=0.3)
+        ).order_by('-rank', 'sort_order')
+
+    return queryset.annotate(
+        document=search_vector(),
+        rank=SearchRank(F('document'), query) + similarity
+    ).filter(
+        Q(document=query) | Q(name__trigram_similar=text)
+    ).order_by('-rank', 'sort_order')
+
+
+def reindex_products(queryset):
+    """批量重建商品的 search_text（分类改名等场景）"""
+    from .models import Product
+
+    products = []
+    for product in queryset.select_related('category').only('id', 'name', 'description', 'category__name'):
+        product.search_text = build_search_text(
+            product.name,
+            product.description,
+            product.category.name if product.category else ''
+        )
+        products.append(product)
+
+    Product.objects.bulk_update(products, ['search_text'], batch_size=500)
+    return len(products)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """使用全文索引和三元组索引的搜索过滤器（替代逐行 icontains 扫描）"""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        return search_products(queryset, text)
@@ -1,26 +1,41 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
+from .images import SrcsetField
 from .models import (
     Category, Product, Specification, SpecificationValue,
     ProductSKU, ProductAttribute, ProductAttributeOption,
-    InventoryLog, ProductImage
+    InventoryLog, ProductImage, ProductBarcode, Ingredient, RecipeItem, IngredientLog
 )
 
 
+def build_sku_index(skus, include_stock=False):
+    """规格组合键 -> SKU，客户端把选中的规格值ID排序后用 - 连接即可直接查找"""
+    index = {}
+    for sku in skus:
+        if not sku.is_active:
+            continue
+        entry = {'id': sku.id, 'price': str(sku.price), 'is_in_stock': sku.is_in_stock}
+        if include_stock:
+            entry['stock_quantity'] = sku.stock_quantity
+        index[sku.spec_key] = entry
+    return index
+
+
 class CategorySerializer(serializers.ModelSerializer):
-    children_count = serializers.SerializerMethodField()
-    products_count = serializers.SerializerMethodField()
+    # children_count / products_count / path / depth 为模型上维护的冗余字段（只读）
+    image_srcset = SrcsetField(source='image_variants')
 
     class Meta:
         model = Category
         fields = '__all__'
         read_only_fields = ('shop', 'created_at', 'updated_at')
 
-    def get_children_count(self, obj):
-        return obj.children.count()
-
-    def get_products_count(self, obj):
-        return obj.products.count()
+    def validate_parent(self, value):
+        if value and self.instance and (value.pk == self.instance.pk or value.is_descendant_of(self.instance)):
+            raise serializers.ValidationError('不能将分类移动到自身或其子分类下')
+        return value
 
 
 class SpecificationValueSerializer(serializers.ModelSerializer):
@@ -53,11 +68,34 @@ class ProductAttributeSerializer(serializers.ModelSerializer):
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = SrcsetField(source='image_variants')
+
     class Meta:
         model = ProductImage
         fields = '__all__'
 
 
+class ProductBarcodeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductBarcode
+        fields = ['id', 'barcode', 'product', 'sku', 'created_at']
+        read_only_fields = ('created_at',)
+        extra_kwargs = {'product': {'required': False}}
+
+    def validate(self, data):
+        product = data.get('product', getattr(self.instance, 'product', None))
+        sku = data.get('sku', getattr(self.instance, 'sku', None))
+        if sku:
+            data['product'] = sku.product
+        elif product is None:
+            raise serializers.ValidationError('请选择商品或SKU')
+
+        shop = self.context['request'].tenant
+        if data['product'].shop_id != shop.pk:
+            raise serializers.ValidationError('商品不存在')
+        return data
+
+
 class ProductSKUSerializer(serializers.ModelSerializer):
     specifications = SpecificationValueSerializer(many=True, read_only=True)
     specification_ids = serializers.ListField(
@@ -67,10 +105,13 @@ class ProductSKUSerializer(serializers.ModelSerializer):
     )
     is_in_stock = serializers.BooleanField(read_only=True)
     is_low_stock = serializers.BooleanField(read_only=True)
+    image_srcset = SrcsetField(source='image_variants')
+    barcodes = serializers.SlugRelatedField(many=True, read_only=True, slug_field='barcode')
 
     class Meta:
         model = ProductSKU
         fields = '__all__'
+        read_only_fields = ['stock_quantity', 'is_hot_stock']
 
     def create(self, validated_data):
         specification_ids = validated_data.pop('specification_ids', [])
@@ -100,12 +141,13 @@ class ProductListSerializer(serializers.ModelSerializer):
     min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     has_variants = serializers.BooleanField(read_only=True)
+    main_image_srcset = SrcsetField(source='main_image_variants')
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'category', 'category_name', 'base_price',
-            'main_image', 'status', 'is_featured', 'sort_order',
+            'main_image', 'main_image_srcset', 'status', 'is_featured', 'sort_order',
             'min_price', 'max_price', 'has_variants', 'created_at'
         ]
 
@@ -118,12 +160,17 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     attributes = ProductAttributeSerializer(many=True, read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     specifications = SpecificationSerializer(many=True, read_only=True)
+    main_image_srcset = SrcsetField(source='main_image_variants')
+    sku_index = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = '__all__'
         read_only_fields = ('shop', 'created_by', 'created_at', 'updated_at')
 
+    def get_sku_index(self, obj):
+        return build_sku_index(obj.skus.all(), include_stock=True)
+
 
 class ProductCreateSerializer(serializers.ModelSerializer):
     """商品创建序列化器"""
@@ -166,21 +213,130 @@ class BulkStockUpdateSerializer(serializers.Serializer):
     )
 
 
-class ProductExportSerializer(serializers.ModelSerializer):
-    """商品导出序列化器"""
-    category_name = serializers.CharField(source='category.name', read_only=True)
-    sku_count = serializers.SerializerMethodField()
-    total_stock = serializers.SerializerMethodField()
+class IngredientSerializer(serializers.ModelSerializer):
+    # 库存只能通过调整接口或订单扣减变更（写流水）
+    class Meta:
+        model = Ingredient
+        fields = '__all__'
+        read_only_fields = ('shop', 'stock_quantity', 'created_at', 'updated_at')
+
+
+class RecipeItemSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(source='ingredient.name', read_only=True)
+    ingredient_unit = serializers.CharField(source='ingredient.unit', read_only=True)
 
     class Meta:
-        model = Product
-        fields = [
-            'id', 'name', 'category_name', 'base_price', 'status',
-            'sku_count', 'total_stock', 'created_at'
+        model = RecipeItem
+        fields = '__all__'
+        read_only_fields = ('created_at', 'updated_at')
+
+    def validate(self, data):
+        sku = data.get('sku', getattr(self.instance, 'sku', None))
+        option = data.get('attribute_option', getattr(self.instance, 'attribute_option', None))
+        if bool(sku) == bool(option):
+            raise serializers.ValidationError('请选择 SKU 或属性选项中的一个')
+
+        shop = self.context['request'].tenant
+        ingredient = data.get('ingredient', getattr(self.instance, 'ingredient', None))
+        product = sku.product if sku else option.attribute.product
+        if ingredient.shop_id != shop.pk or product.shop_id != shop.pk:
+            raise serializers.ValidationError('原料或商品不存在')
+        return data
+
+
+class IngredientLogSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(source='ingredient.name', read_only=True)
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = IngredientLog
+        fields = '__all__'
+
+
+class IngredientAdjustmentSerializer(serializers.Serializer):
+    """原料库存调整序列化器"""
+    action = serializers.ChoiceField(choices=[('purchase', '采购入库'), ('adjustment', '库存调整'), ('waste', '报损出库')])
+    quantity_change = serializers.DecimalField(max_digits=12, decimal_places=3)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        if not data['quantity_change']:
+            raise serializers.ValidationError('数量变化不能为 0')
+        if data['action'] == 'purchase' and data['quantity_change'] < 0:
+            raise serializers.ValidationError('入库数量必须为正数')
+        if data['action'] == 'waste' and data['quantity_change'] > 0:
+            raise serializers.ValidationError('报损数量必须为负数')
+        return data
+
+
+class MenuCategorySerializer(serializers.ModelSerializer):
+    """菜单快照中的分类"""
+    image_srcset = SrcsetField(source='image_variants')
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'description', 'parent', 'path', 'depth', 'image', 'image_srcset', 'sort_order']
+
+
+class MenuSKUSerializer(serializers.ModelSerializer):
+    """菜单快照中的 SKU（含规格值）"""
+    specifications = serializers.SerializerMethodField()
+    is_in_stock = serializers.BooleanField(read_only=True)
+    image_srcset = SrcsetField(source='image_variants')
+
+    class Meta:
+        model = ProductSKU
+        fields = ['id', 'sku_code', 'spec_key', 'price', 'image', 'image_srcset', 'is_in_stock', 'specifications']
+
+    def get_specifications(self, obj):
+        return [
+            {
+                'id': value.id,
+                'specification_id': value.specification_id,
+                'name': value.specification.display_name,
+                'value': value.display_value,
+            }
+            for value in obj.specifications.all()
         ]
 
-    def get_sku_count(self, obj):
-        return obj.skus.count()
 
-    def get_total_stock(self, obj):
-        return sum(sku.stock_quantity for sku in obj.skus.all())
\ No newline at end of file
+class MenuProductSerializer(ProductListSerializer):
+    """菜单快照中的商品（列表字段 + SKU、属性）"""
+    skus = MenuSKUSerializer(many=True, read_only=True)
+    attributes = ProductAttributeSerializer(many=True, read_only=True)
+    sku_index = serializers.SerializerMethodField()
+
+    class Meta(ProductListSerializer.Meta):
+        fields = ProductListSerializer.Meta.fields + [
+            'description', 'preparation_time', 'allow_customization', 'skus', 'sku_index', 'attributes'
+        ]
+
+    def get_sku_index(self, obj):
+        return build_sku_index(obj.skus.all())
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+
+        # 价格区间和多规格标记由快照中的 SKU 计算
+        prices = [sku['price'] for sku in data['skus']]
+        if prices:
+            data['min_price'] = min(prices, key=Decimal)
+            data['max_price'] = max(prices, key=Decimal)
+        data['has_variants'] = bool(prices)
+        return data
+
+
+class SyncSKUSerializer(MenuSKUSerializer):
+    """增量同步中的 SKU（附带所属商品ID）"""
+
+    class Meta(MenuSKUSerializer.Meta):
+        fields = MenuSKUSerializer.Meta.fields + ['product']
+
+
+class SyncAttributeOptionSerializer(serializers.ModelSerializer):
+    """增量同步中的属性选项（附带所属属性和商品ID）"""
+    product = serializers.IntegerField(source='attribute.product_id', read_only=True)
+
+    class Meta:
+        model = ProductAttributeOption
+        fields = ['id', 'attribute', 'product', 'value', 'additional_price', 'sort_order']
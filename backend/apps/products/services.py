@@ -0,0 +1,542 @@
+import gzip
+import json
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Prefetch
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.core.caching import (
+    current_schema_name, get_catalog_version, get_version, bump_version, bump_catalog_version,
+    get_item_versions, bump_item_versions
+)
+from .alerts import record_stock_changes
+from .availability import sync_availability
+from .changes import change_watermark, record_stock_flips
+from .hotstock import HotStockService
+from .images import absolute_image_urls
+from .models import Category, Product, ProductSKU, ProductAttribute, InventoryLog
+from .serializers import MenuCategorySerializer, MenuProductSerializer, ProductDetailSerializer
+
+MENU_FRAGMENT_SCOPE = 'menu_fragments'
+PRODUCT_DETAIL_SCOPE = 'product_detail'
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class MenuSnapshot:
+    """预序列化、预压缩的菜单快照"""
+
+    def __init__(self, version, document):
+        self.version = version
+        self.document = document
+        self.content = _dumps(document)
+        self.gzip_content = gzip.compress(self.content, 6)
+        self.products_content = _dumps(document['products'])
+        self.products_gzip_content = gzip.compress(self.products_content, 6)
+
+
+class MenuSnapshotService:
+    """
+    租户菜单快照服务
+    快照按商品目录版本号缓存；目录变化后只重新序列化发生变化的商品，
+    其余商品复用缓存中的片段
+    """
+    snapshot_timeout = 24 * 3600
+    fragment_timeout = 7 * 24 * 3600
+
+    def __init__(self, shop):
+        self.shop = shop
+        self.schema_name = shop.schema_name
+
+    def _snapshot_key(self):
+        return f'menu:{self.schema_name}:snapshot'
+
+    @staticmethod
+    def _fragment_key(schema_name, generation, product_id, version):
+        return f'menu:{schema_name}:{generation}:p:{product_id}:{version}'
+
+    def get_snapshot(self):
+        """获取当前版本的快照，版本落后时增量重建"""
+        version = get_catalog_version(self.schema_name)
+        snapshot = cache.get(self._snapshot_key())
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        snapshot = self.build_snapshot(version)
+        cache.set(self._snapshot_key(), snapshot, self.snapshot_timeout)
+        return snapshot
+
+    def build_snapshot(self, version):
+        # 先读取变更水位再读取数据：快照至少包含水位以内的变更，客户端从 change_seq 开始增量同步
+        change_seq = change_watermark() or 0
+        categories = Category.objects.filter(shop=self.shop, is_active=True)
+        product_ids = list(
+            Product.objects.filter(shop=self.shop, status__in=Product.MENU_STATUSES).values_list('id', flat=True)
+        )
+
+        fragments = self.get_fragments(product_ids)
+        document = {
+            'version': version,
+            'change_seq': change_seq,
+            'generated_at': timezone.now(),
+            'categories': MenuCategorySerializer(categories, many=True).data,
+            'products': [fragments[product_id] for product_id in product_ids if product_id in fragments],
+        }
+        return MenuSnapshot(version, document)
+
+    def get_fragments(self, product_ids):
+        """按商品ID获取菜单片段（优先读取缓存，缺失的重新序列化）"""
+        # 构建前读取版本号并写入键：构建期间的失效会递增版本号，写回的旧片段不会再被读到
+        generation = get_version(MENU_FRAGMENT_SCOPE, self.schema_name)
+        versions = get_item_versions(MENU_FRAGMENT_SCOPE, product_ids, self.schema_name)
+        keys = {
+            self._fragment_key(self.schema_name, generation, product_id, versions.get(product_id)): product_id
+            for product_id in product_ids
+        }
+        cached = cache.get_many(list(keys))
+        fragments = {keys[key]: value for key, value in cached.items()}
+
+        missing = [product_id for product_id in product_ids if product_id not in fragments]
+        if missing:
+            built = self._build_fragments(missing)
+            cache.set_many(
+                {
+                    self._fragment_key(self.schema_name, generation, product_id, versions.get(product_id)): fragment
+                    for product_id, fragment in built.items()
+                },
+                self.fragment_timeout
+            )
+            fragments.update(built)
+
+        return fragments
+
+    def _build_fragments(self, product_ids):
+        products = Product.objects.filter(id__in=product_ids).select_related('category').prefetch_related(
+            Prefetch(
+                'skus',
+                queryset=ProductSKU.objects.filter(is_active=True).prefetch_related(
+                    'specifications__specification'
+                )
+            ),
+            Prefetch(
+                'attributes',
+                queryset=ProductAttribute.objects.order_by('sort_order').prefetch_related('options')
+            ),
+        )
+
+        return {
+            product.id: json.loads(_dumps(MenuProductSerializer(product).data))
+            for product in products
+        }
+
+    @staticmethod
+    def invalidate_products(product_ids, schema_name=None):
+        """商品变化后递增对应商品的片段版本号（事务提交后执行）"""
+        bump_item_versions(MENU_FRAGMENT_SCOPE, product_ids, schema_name)
+
+    @staticmethod
+    def invalidate_all(schema_name=None):
+        """规格等共享数据变化后丢弃全部片段"""
+        bump_version(MENU_FRAGMENT_SCOPE, schema_name)
+
+
+class ProductDetailCache:
+    """
+    商品详情读缓存
+    序列化后的详情按商品缓存，商品、SKU、属性、图片、规格变化时由信号失效；
+    库存不写入缓存条目，读取时叠加一层短时缓存的库存（库存变化只丢弃这一层，不影响详情条目）
+    """
+    detail_timeout = 24 * 3600
+    stock_timeout = 10
+
+    def __init__(self, schema_name=None):
+        self.schema_name = schema_name or current_schema_name()
+
+    @staticmethod
+    def _detail_key(schema_name, generation, product_id, version):
+        return f'detail:{schema_name}:{generation}:p:{product_id}:{version}'
+
+    @staticmethod
+    def _stock_key(schema_name, product_id):
+        return f'detail:{schema_name}:stock:{product_id}'
+
+    def get(self, product_id, loader, request=None):
+        """
+        读取详情，未命中时调用 loader() 获取商品实例并序列化
+        调用方负责存在性和权限校验；序列化不传入 request，缓存条目中的图片为相对 URL，与请求的域名无关，
+        传入 request 时返回前按当前请求转为绝对 URL
+        """
+        # 版本号在序列化之前读取，序列化期间发生的失效不会被写回的旧数据覆盖
+        key = self._detail_key(
+            self.schema_name,
+            get_version(PRODUCT_DETAIL_SCOPE, self.schema_name),
+            product_id,
+            get_item_versions(PRODUCT_DETAIL_SCOPE, [product_id], self.schema_name).get(product_id)
+        )
+        data = cache.get(key)
+        if data is None:
+            data = json.loads(_dumps(ProductDetailSerializer(loader()).data))
+            cache.set(key, data, self.detail_timeout)
+        data = self._overlay_stock(product_id, data)
+        if request is not None:
+            absolute_image_urls(data, request)
+        return data
+
+    def _overlay_stock(self, product_id, data):
+        stock = self._get_stock(product_id)
+        for sku in data.get('skus', []):
+            if sku['id'] not in stock:
+                continue
+            sku['stock_quantity'] = stock[sku['id']]
+            sku['is_in_stock'] = sku['stock_quantity'] > 0
+            sku['is_low_stock'] = 0 < sku['stock_quantity'] <= sku['low_stock_threshold']
+
+        for entry in data.get('sku_index', {}).values():
+            if entry['id'] in stock:
+                entry['stock_quantity'] = stock[entry['id']]
+                entry['is_in_stock'] = entry['stock_quantity'] > 0
+        return data
+
+    def _get_stock(self, product_id):
+        """{SKU ID: 库存}，热点 SKU 读取缓存计数器"""
+        key = self._stock_key(self.schema_name, product_id)
+        overlay = cache.get(key)
+        if overlay is None:
+            stock, hot_ids = {}, []
+            for sku_id, stock_quantity, is_hot in ProductSKU.objects.filter(product_id=product_id).values_list(
+                'id', 'stock_quantity', 'is_hot_stock'
+            ):
+                stock[sku_id] = stock_quantity
+                if is_hot:
+                    hot_ids.append(sku_id)
+            overlay = (stock, hot_ids)
+            cache.set(key, overlay, self.stock_timeout)
+
+        stock, hot_ids = overlay
+        if hot_ids:
+            stock = dict(stock)
+            hot = HotStockService(self.schema_name)
+            for sku_id in hot_ids:
+                available = hot.available(sku_id)
+                if available is not None:
+                    stock[sku_id] = available
+        return stock
+
+    @staticmethod
+    def invalidate_products(product_ids, schema_name=None):
+        """商品变化后递增对应商品的详情版本号（事务提交后执行）"""
+        bump_item_versions(PRODUCT_DETAIL_SCOPE, product_ids, schema_name)
+
+    @classmethod
+    def invalidate_stock(cls, product_ids, schema_name=None):
+        """库存变化后丢弃库存覆盖层，详情条目保留"""
+        schema_name = schema_name or current_schema_name()
+        keys = [cls._stock_key(schema_name, product_id) for product_id in product_ids if product_id]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @staticmethod
+    def invalidate_all(schema_name=None):
+        """分类、规格等共享数据变化后丢弃全部详情"""
+        bump_version(PRODUCT_DETAIL_SCOPE, schema_name)
+
+
+def refresh_stock_caches(sku_products, flipped_sku_ids, schema_name=None):
+    """
+    库存写入后刷新缓存（事务内调用）
+    sku_products: {SKU ID: 商品ID}；flipped_sku_ids: 有货 / 售罄状态发生变化的 SKU
+    菜单片段只包含是否有货，普通增减只丢弃详情的库存覆盖层；
+    跨过 0 时才丢弃菜单片段、刷新商品可售状态（锁商品行）并递增目录版本号，
+    普通销售不会在商品行上排队
+    """
+    ProductDetailCache.invalidate_stock(set(sku_products.values()), schema_name)
+    if not flipped_sku_ids:
+        return
+
+    product_ids = {sku_products[sku_id] for sku_id in flipped_sku_ids}
+    MenuSnapshotService.invalidate_products(product_ids, schema_name)
+    sync_availability(product_ids, schema_name)
+    bump_catalog_version(schema_name)
+
+
+class InsufficientStockError(Exception):
+    """库存不足"""
+
+    def __init__(self, sku_id, requested):
+        self.sku_id = sku_id
+        self.requested = requested
+        super().__init__(f'SKU {sku_id} 库存不足（需要 {requested}）')
+
+
+def _merge_quantities(items):
+    """合并同一 SKU 的数量，按 SKU ID 排序（固定加锁顺序，避免死锁）"""
+    quantities = {}
+    for sku_id, quantity in items:
+        if sku_id and quantity > 0:
+            quantities[sku_id] = quantities.get(sku_id, 0) + quantity
+    return sorted(quantities.items())
+
+
+class InventoryService:
+    """
+    库存操作（集合化 SQL，不逐行保存）
+    扣减使用条件更新 stock_quantity >= 数量，并按 SKU ID 顺序加锁，并发下不会超卖
+    """
+
+    def __init__(self, shop, user=None):
+        self.shop = shop
+        self.user = user
+        # 本实例已变更的热点计数器 [(sku_id, 售出数量)]，外层事务回滚时由调用方撤销
+        self.hot_changes = []
+
+    def reserve(self, items, reference_id='', notes='订单扣减库存'):
+        """
+        扣减（预占）库存
+        items: [(sku_id, quantity)]；任一 SKU 库存不足时抛出 InsufficientStockError，
+        已执行的扣减随事务回滚
+        """
+        return self._apply(items, -1, 'sale', reference_id, notes)
+
+    def release(self, items, reference_id='', notes='订单取消恢复库存'):
+        """释放（归还）库存"""
+        return self._apply(items, 1, 'return', reference_id, notes)
+
+    def adjust(self, sku_id, quantity_change, notes=''):
+        """手动调整库存（减少时最多减到 0），返回调整后的库存"""
+        if quantity_change > 0:
+            return self._apply([(sku_id, quantity_change)], 1, 'adjustment', '', notes)[sku_id]
+
+        with transaction.atomic():
+            stock_quantity = ProductSKU.objects.select_for_update(of=('self',)).filter(
+                pk=sku_id, product__shop=self.shop
+            ).values_list('stock_quantity', flat=True).first()
+            if stock_quantity is None:
+                raise ProductSKU.DoesNotExist(f'SKU {sku_id} 不存在')
+
+            quantity = min(-quantity_change, stock_quantity)
+            if quantity <= 0:
+                return stock_quantity
+            return self._apply([(sku_id, quantity)], -1, 'adjustment', '', notes)[sku_id]
+
+    def _apply(self, items, direction, action, reference_id, notes):
+        quantities = _merge_quantities(items)
+        if not quantities:
+            return {}
+
+        sku_ids = [sku_id for sku_id, _ in quantities]
+        owned = dict(
+            ProductSKU.objects.filter(pk__in=sku_ids, product__shop=self.shop).values_list('id', 'is_hot_stock')
+        )
+        for sku_id in sku_ids:
+            if sku_id not in owned:
+                raise ProductSKU.DoesNotExist(f'SKU {sku_id} 不存在')
+
+        hot_ids = {sku_id for sku_id, is_hot in owned.items() if is_hot}
+        hot = HotStockService(self.shop.schema_name)
+        hot_handled = []
+        if hot_ids:
+            quantities, hot_handled = self._apply_hot(hot, quantities, hot_ids, direction)
+
+        try:
+            result = self._apply_database(quantities, direction, action, reference_id, notes) if quantities else {}
+        except Exception:
+            # 数据库部分失败时撤销热点计数的变更
+            for sku_id, quantity in hot_handled:
+                if direction < 0:
+                    hot.give_back(sku_id, quantity)
+                else:
+                    hot.take(sku_id, quantity)
+            raise
+
+        if hot_handled:
+            # 售出数量在事务提交后计入待同步，由 sync_hot_stock 批量写回数据库
+            transaction.on_commit(lambda: [
+                hot.record(sku_id, -direction * quantity) for sku_id, quantity in hot_handled
+            ])
+            self.hot_changes.extend((sku_id, -direction * quantity) for sku_id, quantity in hot_handled)
+        return result
+
+    def revert_hot_changes(self, start=0):
+        """
+        撤销本实例从 hot_changes[start] 起对热点计数器的变更
+        计数器不随数据库事务回滚，同一事务中后续步骤失败（如原料不足）时由调用方在重新抛出异常前调用
+        """
+        hot = HotStockService(self.shop.schema_name)
+        for sku_id, sold in self.hot_changes[start:]:
+            if sold > 0:
+                hot.give_back(sku_id, sold)
+            else:
+                hot.take(sku_id, -sold)
+        del self.hot_changes[start:]
+
+    @staticmethod
+    def _apply_hot(hot, quantities, hot_ids, direction):
+        """热点 SKU 走缓存计数器，返回 (需要走数据库的剩余项, 已处理的热点项)"""
+        remaining, handled = [], []
+        for sku_id, quantity in quantities:
+            if sku_id not in hot_ids:
+                remaining.append((sku_id, quantity))
+                continue
+
+            if direction > 0:
+                hot.give_back(sku_id, quantity)
+            else:
+                taken = hot.take(sku_id, quantity)
+                if taken is None:
+                    # 计数器丢失，改走数据库条件更新
+                    remaining.append((sku_id, quantity))
+                    continue
+                if not taken:
+                    for handled_id, handled_quantity in handled:
+                        hot.give_back(handled_id, handled_quantity)
+                    raise InsufficientStockError(sku_id, quantity)
+            handled.append((sku_id, quantity))
+        return remaining, handled
+
+    def _apply_database(self, quantities, direction, action, reference_id, notes):
+        sku_ids = [sku_id for sku_id, _ in quantities]
+        now = timezone.now()
+        with transaction.atomic():
+            for sku_id, quantity in quantities:
+                # 单表条件更新：等待行锁后 PostgreSQL 会按最新库存重新判断条件
+                skus = ProductSKU.objects.filter(pk=sku_id)
+                if direction < 0:
+                    skus = skus.filter(stock_quantity__gte=quantity)
+                updated = skus.update(stock_quantity=F('stock_quantity') + direction * quantity, updated_at=now)
+                if not updated:
+                    raise InsufficientStockError(sku_id, quantity)
+
+            # 行锁由本事务持有，读取到的即为本次变更后的库存
+            current = {
+                sku_id: (stock_quantity, product_id, threshold)
+                for sku_id, stock_quantity, product_id, threshold in ProductSKU.objects.filter(
+                    pk__in=sku_ids
+                ).values_list('id', 'stock_quantity', 'product_id', 'low_stock_threshold')
+            }
+            InventoryLog.objects.bulk_create([
+                InventoryLog(
+                    sku_id=sku_id,
+                    action=action,
+                    quantity_change=direction * quantity,
+                    current_quantity=current[sku_id][0],
+                    reference_id=reference_id,
+                    notes=notes,
+                    created_by=self.user
+                )
+                for sku_id, quantity in quantities
+            ])
+            record_stock_changes([
+                (sku_id, current[sku_id][0] - direction * quantity, current[sku_id][0], current[sku_id][2])
+                for sku_id, quantity in quantities
+            ])
+            flipped = record_stock_flips([
+                (sku_id, current[sku_id][0] - direction * quantity, current[sku_id][0])
+                for sku_id, quantity in quantities
+            ])
+
+            # 条件更新不触发信号，手动刷新详情库存（有货 / 售罄变化时刷新菜单）
+            refresh_stock_caches(
+                {sku_id: product_id for sku_id, (_, product_id, _) in current.items()},
+                flipped,
+                self.shop.schema_name
+            )
+
+        return {sku_id: stock_quantity for sku_id, (stock_quantity, _, _) in current.items()}
+
+    def bulk_set_stock(self, updates, default_notes='批量更新'):
+        """
+        批量设置库存
+        updates: [{'sku_id', 'stock_quantity', 'notes'}]，按原顺序返回逐行结果
+        一次加锁查询、一次 UPDATE ... FROM (VALUES ...)、一次批量写入日志
+        """
+        results = [None] * len(updates)
+        targets = {}
+        for index, update in enumerate(updates):
+            try:
+                sku_id = int(update['sku_id'])
+                stock_quantity = int(update['stock_quantity'])
+            except (KeyError, TypeError, ValueError):
+                results[index] = {'sku_id': update.get('sku_id'), 'success': False, 'error': '参数无效'}
+                continue
+            if stock_quantity < 0:
+                results[index] = {'sku_id': sku_id, 'success': False, 'error': '库存不能为负数'}
+                continue
+
+            if sku_id in targets:
+                previous = targets[sku_id][0]
+                results[previous] = {'sku_id': sku_id, 'success': False, 'error': '同一批次中SKU重复，已使用最后一条'}
+            targets[sku_id] = (index, stock_quantity, update.get('notes') or default_notes)
+
+        with transaction.atomic():
+            current = {
+                sku_id: (stock_quantity, product_id, is_hot, threshold)
+                for sku_id, stock_quantity, product_id, is_hot, threshold in ProductSKU.objects.select_for_update(
+                    of=('self',)
+                ).filter(
+                    id__in=list(targets), product__shop=self.shop
+                ).order_by('id').values_list(
+                    'id', 'stock_quantity', 'product_id', 'is_hot_stock', 'low_stock_threshold'
+                )
+            }
+
+            changed = {}
+            for sku_id, (index, stock_quantity, notes) in targets.items():
+                if sku_id not in current:
+                    results[index] = {'sku_id': sku_id, 'success': False, 'error': 'SKU不存在'}
+                    continue
+                if current[sku_id][2]:
+                    results[index] = {'sku_id': sku_id, 'success': False, 'error': '热点库存模式下不能直接设置库存'}
+                    continue
+
+                results[index] = {'sku_id': sku_id, 'success': True, 'current_stock': stock_quantity}
+                if current[sku_id][0] != stock_quantity:
+                    changed[sku_id] = (stock_quantity, notes)
+
+            if changed:
+                self._update_stock({sku_id: stock for sku_id, (stock, _) in changed.items()})
+                InventoryLog.objects.bulk_create([
+                    InventoryLog(
+                        sku_id=sku_id,
+                        action='adjustment',
+                        quantity_change=stock_quantity - current[sku_id][0],
+                        current_quantity=stock_quantity,
+                        notes=notes,
+                        created_by=self.user
+                    )
+                    for sku_id, (stock_quantity, notes) in changed.items()
+                ])
+                record_stock_changes([
+                    (sku_id, current[sku_id][0], stock_quantity, current[sku_id][3])
+                    for sku_id, (stock_quantity, _) in changed.items()
+                ])
+                flipped = record_stock_flips([
+                    (sku_id, current[sku_id][0], stock_quantity)
+                    for sku_id, (stock_quantity, _) in changed.items()
+                ])
+
+                # 集合更新不触发信号，手动刷新详情库存（有货 / 售罄变化时刷新菜单）
+                refresh_stock_caches(
+                    {sku_id: current[sku_id][1] for sku_id in changed},
+                    flipped,
+                    self.shop.schema_name
+                )
+
+        return results
+
+    @staticmethod
+    def _update_stock(stock_by_sku):
+        """UPDATE ... FROM (VALUES ...) 一条语句更新多个 SKU 的库存"""
+        table = connection.ops.quote_name(ProductSKU._meta.db_table)
+        values = ', '.join(['(%s, %s)'] * len(stock_by_sku))
+        params = [item for pair in stock_by_sku.items() for item in pair]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS sku SET stock_quantity = v.stock_quantity, updated_at = %s '
+                f'FROM (VALUES {values}) AS v(id, stock_quantity) WHERE sku.id = v.id',
+                [timezone.now(), *params]
+            )
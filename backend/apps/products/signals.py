@@ -0,0 +1,249 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from apps.core.caching import bump_catalog_version
+from .availability import sync_availability
+from .barcodes import bump_barcode_version
+from .changes import record_changes
+from .images import IMAGE_FIELDS, variants_match
+from .ingredients import bump_ingredient_version
+from .models import (
+    Category, Product, Specification, SpecificationValue,
+    ProductSKU, ProductAttribute, ProductAttributeOption, ProductImage, ProductBarcode,
+    Ingredient, RecipeItem
+)
+from .search import reindex_products
+from .services import MenuSnapshotService, ProductDetailCache
+
+CATALOG_MODELS = (
+    Category, Product, Specification, SpecificationValue,
+    ProductSKU, ProductAttribute, ProductAttributeOption, ProductImage,
+)
+
+
+def _affected_product_id(instance):
+    """获取变更对象所属的商品ID"""
+    if isinstance(instance, Product):
+        return instance.id
+    if isinstance(instance, (ProductSKU, ProductAttribute, ProductImage)):
+        return instance.product_id
+    if isinstance(instance, ProductAttributeOption):
+        return ProductAttribute.objects.filter(
+            pk=instance.attribute_id
+        ).values_list('product_id', flat=True).first()
+    return None
+
+
+def _on_catalog_change(sender, instance, **kwargs):
+    """商品目录变化时丢弃受影响的菜单片段，并递增租户目录版本号"""
+    # 先丢弃片段再递增版本号，避免新版本快照复用旧片段；分类变化影响其下全部商品的片段
+    if isinstance(instance, (Category, Specification, SpecificationValue)):
+        MenuSnapshotService.invalidate_all()
+    else:
+        MenuSnapshotService.invalidate_products([_affected_product_id(instance)])
+
+    # 商品详情中嵌套了分类和规格，这两类变化丢弃全部详情
+    if isinstance(instance, (Category, Specification, SpecificationValue)):
+        ProductDetailCache.invalidate_all()
+    else:
+        ProductDetailCache.invalidate_products([_affected_product_id(instance)])
+
+    bump_catalog_version()
+
+
+for _model in CATALOG_MODELS:
+    post_save.connect(_on_catalog_change, sender=_model, dispatch_uid=f'catalog_save_{_model.__name__}')
+    post_delete.connect(_on_catalog_change, sender=_model, dispatch_uid=f'catalog_delete_{_model.__name__}')
+
+
+@receiver(m2m_changed, sender=ProductSKU.specifications.through)
+def sku_specifications_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # 从规格值一侧清空时 post_clear 不带 SKU ID，提前记录
+        instance._cleared_sku_ids = list(instance.productsku_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    # 维护规格组合键
+    if isinstance(instance, ProductSKU):
+        sku_ids = [instance.pk]
+    elif action == 'post_clear':
+        sku_ids = getattr(instance, '_cleared_sku_ids', [])
+    else:
+        sku_ids = pk_set or []
+    ProductSKU.refresh_spec_keys(sku_ids)
+    record_changes('sku', sku_ids)
+
+    if isinstance(instance, ProductSKU):
+        MenuSnapshotService.invalidate_products([instance.product_id])
+        ProductDetailCache.invalidate_products([instance.product_id])
+    else:
+        MenuSnapshotService.invalidate_all()
+        ProductDetailCache.invalidate_all()
+    bump_catalog_version()
+
+
+@receiver(pre_delete, sender=SpecificationValue)
+def remember_value_skus(sender, instance, **kwargs):
+    """规格值删除时级联删除规格组合（不触发 m2m_changed），记录受影响的 SKU"""
+    instance._affected_sku_ids = list(instance.productsku_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=SpecificationValue)
+def value_deleted(sender, instance, **kwargs):
+    sku_ids = getattr(instance, '_affected_sku_ids', [])
+    ProductSKU.refresh_spec_keys(sku_ids)
+    record_changes('sku', sku_ids)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    """分类名称会写入商品的搜索文本，分类变更后重建其商品索引"""
+    if not created:
+        reindex_products(instance.products.all())
+
+
+# 分类树冗余计数（Category.children_count / products_count）
+_TREE_PARENT_FIELDS = {Category: 'parent_id', Product: 'category_id'}
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Product)
+def remember_tree_parent(sender, instance, **kwargs):
+    """记录保存前的上级分类"""
+    field = _TREE_PARENT_FIELDS[sender]
+    instance._previous_tree_parent_id = sender.objects.filter(pk=instance.pk).values_list(
+        field, flat=True
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+def tree_member_saved(sender, instance, created, **kwargs):
+    """新增或更换上级分类时，刷新新旧上级分类的计数"""
+    current = getattr(instance, _TREE_PARENT_FIELDS[sender])
+    previous = getattr(instance, '_previous_tree_parent_id', None)
+    if created or current != previous:
+        Category.refresh_counts([current, previous])
+    if sender is Category and not created and current != previous:
+        # 子分类的路径随之改变（批量更新，不触发信号）
+        record_changes('category', Category.objects.filter(
+            path__startswith=instance.path
+        ).exclude(pk=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+def tree_member_deleted(sender, instance, **kwargs):
+    Category.refresh_counts([getattr(instance, _TREE_PARENT_FIELDS[sender])])
+
+
+# 图片缩略图（见 apps.products.images）
+
+def clear_stale_variants(sender, instance, **kwargs):
+    """
+    图片清空、新上传或被替换时清空缩略图，由 generate_image_variants 重新生成
+    （清空前客户端使用原图，上传请求不等待渲染）
+    """
+    image_field, variants_field = IMAGE_FIELDS[sender]
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and image_field not in update_fields:
+        return
+
+    image = getattr(instance, image_field)
+    if not image or not image._committed or not variants_match(image.name, getattr(instance, variants_field)):
+        setattr(instance, variants_field, {})
+
+
+for _model in IMAGE_FIELDS:
+    pre_save.connect(clear_stale_variants, sender=_model, dispatch_uid=f'image_upload_{_model.__name__}')
+
+
+# 收银台条码映射（见 apps.products.barcodes），库存变化不影响映射
+
+BARCODE_SOURCE_MODELS = (Product, ProductSKU, ProductBarcode, Specification, SpecificationValue)
+
+
+def _on_barcode_source_change(sender, **kwargs):
+    if kwargs.get('action', 'post').startswith('post'):
+        bump_barcode_version()
+    if sender is ProductBarcode:
+        # SKU 详情中包含条码
+        ProductDetailCache.invalidate_products([kwargs['instance'].product_id])
+
+
+for _model in BARCODE_SOURCE_MODELS:
+    post_save.connect(_on_barcode_source_change, sender=_model, dispatch_uid=f'barcode_save_{_model.__name__}')
+    post_delete.connect(_on_barcode_source_change, sender=_model, dispatch_uid=f'barcode_delete_{_model.__name__}')
+m2m_changed.connect(
+    _on_barcode_source_change, sender=ProductSKU.specifications.through, dispatch_uid='barcode_sku_specifications'
+)
+
+
+# 商品可售状态（见 apps.products.availability），SKU 编辑、启用 / 停用、删除时重新计算
+
+@receiver(post_save, sender=ProductSKU)
+@receiver(post_delete, sender=ProductSKU)
+def sku_availability_changed(sender, instance, **kwargs):
+    sync_availability([instance.product_id])
+
+
+# 目录增量同步（见 apps.products.changes）
+
+SYNC_ENTITIES = {
+    Category: 'category',
+    Product: 'product',
+    ProductSKU: 'sku',
+    ProductAttributeOption: 'attribute_option',
+}
+
+
+def _on_sync_entity_change(sender, instance, **kwargs):
+    record_changes(SYNC_ENTITIES[sender], [instance.pk])
+
+
+for _model in SYNC_ENTITIES:
+    post_save.connect(_on_sync_entity_change, sender=_model, dispatch_uid=f'sync_save_{_model.__name__}')
+    post_delete.connect(_on_sync_entity_change, sender=_model, dispatch_uid=f'sync_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+def attribute_changed(sender, instance, **kwargs):
+    """属性本身（名称、是否必选等）没有单独的同步对象，随商品整体下发"""
+    record_changes('product', [instance.product_id])
+
+
+@receiver(post_save, sender=Specification)
+@receiver(post_save, sender=SpecificationValue)
+def specification_renamed(sender, instance, created, **kwargs):
+    """SKU 中包含规格名称和显示值，规格修改后重新下发使用它的 SKU"""
+    if created:
+        return
+    through = ProductSKU.specifications.through
+    if sender is Specification:
+        skus = through.objects.filter(specificationvalue__specification=instance)
+    else:
+        skus = through.objects.filter(specificationvalue=instance)
+    record_changes('sku', skus.values_list('productsku_id', flat=True))
+
+
+# 原料配方（见 apps.products.ingredients），配方或原料启用状态变化时重新计算可制作状态
+
+@receiver(post_save, sender=RecipeItem)
+@receiver(post_delete, sender=RecipeItem)
+def recipe_changed(sender, instance, **kwargs):
+    if instance.sku_id:
+        sync_availability(ProductSKU.objects.filter(pk=instance.sku_id).values_list('product_id', flat=True))
+    bump_ingredient_version()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    sync_availability(RecipeItem.objects.filter(
+        ingredient=instance, sku__isnull=False
+    ).values_list('sku__product_id', flat=True))
+    bump_ingredient_version()
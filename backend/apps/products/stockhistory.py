@@ -0,0 +1,126 @@
+"""
+历史库存
+每天收盘后由 snapshot_stock 为每个 SKU 写入一行收盘库存：最近一天由当前库存减去之后的日志得到，
+补写更早的日期时从后一天的收盘库存减去当天的日志，只读取增量日志，不扫描全部历史。
+任意时刻的库存 = 距离该时刻最近的快照（之前或之后，没有快照时为当前库存）+ 两者之间的日志回放；
+快照每天生成时回放窗口不超过一天，数千个 SKU 的盘点、审计报表只需几条聚合查询。
+时间段统一为左闭右开：某一时刻的库存包含该时刻之前写入的日志。
+热点库存模式下的售出在 sync_hot_stock 写回时才产生日志，按写回时间计入。
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventoryLog, ProductSKU, StockSnapshot
+
+
+def day_end(day):
+    """某天的收盘时刻（次日 0 点，当前时区）"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _log_totals(skus, start, end=None):
+    """[start, end) 内每个 SKU 的库存变化合计"""
+    logs = InventoryLog.objects.filter(sku__in=skus, created_at__gte=start)
+    if end is not None:
+        logs = logs.filter(created_at__lt=end)
+    return dict(logs.order_by().values('sku_id').annotate(total=Sum('quantity_change')).values_list('sku_id', 'total'))
+
+
+def _rewind_current(skus, since):
+    """
+    当前库存减去 since 之后的日志，即 since 时刻的库存
+    库存和日志合计在同一条语句中读取，不会与并发的库存变更错位
+    """
+    later = InventoryLog.objects.filter(
+        sku=OuterRef('pk'), created_at__gte=since
+    ).order_by().values('sku').annotate(total=Sum('quantity_change')).values('total')[:1]
+    return dict(skus.annotate(later=Coalesce(Subquery(later), 0)).values_list(
+        'id', F('stock_quantity') - F('later')
+    ))
+
+
+class StockHistoryService:
+    """历史库存重建和每日库存快照"""
+
+    def __init__(self, shop):
+        self.shop = shop
+
+    def _skus(self, sku_ids=None, before=None):
+        skus = ProductSKU.objects.filter(product__shop=self.shop)
+        if sku_ids is not None:
+            skus = skus.filter(pk__in=sku_ids)
+        if before is not None:
+            skus = skus.filter(created_at__lt=before)
+        return skus
+
+    def stock_at(self, at, sku_ids=None):
+        """重建 at 时刻的库存，返回 {SKU ID: 库存}（只包含当时已创建的 SKU）"""
+        skus = self._skus(sku_ids, before=at)
+        day = timezone.localdate(at)
+        before = StockSnapshot.objects.filter(date__lt=day).aggregate(day=Max('date'))['day']
+        after = StockSnapshot.objects.filter(date__gte=day).aggregate(day=Min('date'))['day']
+
+        # 选择离 at 最近的锚点：之前的快照向后回放，之后的快照（或当前库存）向前倒推
+        backward_distance = (day_end(after) if after else timezone.now()) - at
+        if before is not None and at - day_end(before) <= backward_distance:
+            base = self._snapshot(before, skus)
+            totals = _log_totals(skus, day_end(before), at)
+            stock = {sku_id: quantity + totals.get(sku_id, 0) for sku_id, quantity in base.items()}
+        elif after is not None:
+            base = self._snapshot(after, skus)
+            totals = _log_totals(skus, at, day_end(after))
+            stock = {sku_id: quantity - totals.get(sku_id, 0) for sku_id, quantity in base.items()}
+        else:
+            return _rewind_current(skus, at)
+
+        # 快照之后新建的 SKU 没有快照，以当前库存倒推
+        missing = skus.exclude(pk__in=list(stock))
+        if missing.exists():
+            stock.update(_rewind_current(missing, at))
+        return stock
+
+    @staticmethod
+    def _snapshot(day, skus):
+        return dict(StockSnapshot.objects.filter(date=day, sku__in=skus).values_list('sku_id', 'stock_quantity'))
+
+    @transaction.atomic
+    def take_snapshots(self, until=None):
+        """
+        补齐截至 until（默认昨天）的每日收盘快照，返回写入的日期
+        首次执行只写入 until 当天；之后从上次的日期之后逐日补齐
+        """
+        until = until or timezone.localdate() - timedelta(days=1)
+        last = StockSnapshot.objects.aggregate(day=Max('date'))['day']
+        if last is not None and last >= until:
+            return []
+        first = last + timedelta(days=1) if last is not None else until
+
+        skus = self._skus(before=day_end(until))
+        created = dict(skus.values_list('id', 'created_at'))
+        closing = _rewind_current(skus, day_end(until))
+
+        days = []
+        day = until
+        while True:
+            end = day_end(day)
+            StockSnapshot.objects.bulk_create(
+                [
+                    StockSnapshot(sku_id=sku_id, date=day, stock_quantity=quantity)
+                    for sku_id, quantity in closing.items()
+                    if created[sku_id] < end
+                ],
+                batch_size=2000,
+                ignore_conflicts=True
+            )
+            days.append(day)
+            if day <= first:
+                return sorted(days)
+
+            # 前一天的收盘库存 = 当天收盘库存 - 当天的日志
+            totals = _log_totals(skus, day_end(day - timedelta(days=1)), end)
+            closing = {sku_id: quantity - totals.get(sku_id, 0) for sku_id, quantity in closing.items()}
+            day -= timedelta(days=1)
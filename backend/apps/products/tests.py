@@ -1 +1,229 @@
-# Create your tests here.
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django_tenants.test.cases import TenantTestCase
+
+from . import services
+from .hotstock import HotStockService, HotStockUnavailable
+from .models import InventoryLog, Product, ProductSKU
+from .services import InsufficientStockError, InventoryService, refresh_stock_caches
+
+
+class StockTestCase(TenantTestCase):
+    """库存写入路径测试（在测试租户 schema 中执行）"""
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = '测试店铺'
+        tenant.address = '测试地址'
+        return tenant
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.product = Product.objects.create(
+            shop=self.tenant, name='测试商品', base_price=Decimal('10.00'), status='active'
+        )
+        self.service = InventoryService(self.tenant)
+
+    def create_sku(self, code, stock_quantity, **kwargs):
+        return ProductSKU.objects.create(
+            product=self.product, sku_code=code, price=Decimal('10.00'), stock_quantity=stock_quantity, **kwargs
+        )
+
+    def stock_of(self, sku):
+        return ProductSKU.objects.values_list('stock_quantity', flat=True).get(pk=sku.pk)
+
+
+class ConditionalDecrementTests(StockTestCase):
+    """条件更新 stock_quantity >= 数量"""
+
+    def test_reserve_never_goes_negative(self):
+        sku = self.create_sku('COND-1', 2)
+
+        with self.assertRaises(InsufficientStockError):
+            self.service.reserve([(sku.pk, 3)])
+        self.assertEqual(self.stock_of(sku), 2)
+
+        self.assertEqual(self.service.reserve([(sku.pk, 2)]), {sku.pk: 0})
+        with self.assertRaises(InsufficientStockError):
+            self.service.reserve([(sku.pk, 1)])
+        self.assertEqual(self.stock_of(sku), 0)
+        self.assertEqual(InventoryLog.objects.filter(sku=sku, action='sale').count(), 1)
+
+    def test_failed_item_rolls_back_whole_reservation(self):
+        first = self.create_sku('COND-2', 5)
+        second = self.create_sku('COND-3', 1)
+
+        with self.assertRaises(InsufficientStockError):
+            self.service.reserve([(first.pk, 2), (second.pk, 2)])
+        self.assertEqual(self.stock_of(first), 5)
+        self.assertEqual(self.stock_of(second), 1)
+        self.assertFalse(InventoryLog.objects.filter(sku__in=[first, second]).exists())
+
+    def test_adjust_decrease_stops_at_zero(self):
+        sku = self.create_sku('COND-4', 3)
+        self.assertEqual(self.service.adjust(sku.pk, -5), 0)
+        self.assertEqual(self.stock_of(sku), 0)
+
+
+class BulkSetStockTests(StockTestCase):
+    """UPDATE ... FROM (VALUES ...) 批量设置"""
+
+    def test_bulk_set_updates_rows_and_logs(self):
+        first = self.create_sku('BULK-1', 5)
+        second = self.create_sku('BULK-2', 0)
+        unchanged = self.create_sku('BULK-3', 7)
+
+        results = self.service.bulk_set_stock([
+            {'sku_id': first.pk, 'stock_quantity': 3},
+            {'sku_id': second.pk, 'stock_quantity': 9, 'notes': '补货'},
+            {'sku_id': unchanged.pk, 'stock_quantity': 7},
+            {'sku_id': 'x', 'stock_quantity': 1},
+            {'sku_id': first.pk + second.pk + unchanged.pk, 'stock_quantity': 1},
+            {'sku_id': second.pk, 'stock_quantity': -1},
+        ])
+
+        self.assertEqual([result['success'] for result in results], [True, True, True, False, False, False])
+        self.assertEqual(self.stock_of(first), 3)
+        self.assertEqual(self.stock_of(second), 9)
+        self.assertEqual(self.stock_of(unchanged), 7)
+
+        logs = dict(InventoryLog.objects.filter(action='adjustment').values_list('sku_id', 'quantity_change'))
+        self.assertEqual(logs, {first.pk: -2, second.pk: 9})
+        self.assertEqual(InventoryLog.objects.get(sku=second).notes, '补货')
+
+    def test_bulk_set_keeps_last_duplicate(self):
+        sku = self.create_sku('BULK-4', 1)
+
+        results = self.service.bulk_set_stock([
+            {'sku_id': sku.pk, 'stock_quantity': 4},
+            {'sku_id': sku.pk, 'stock_quantity': 6},
+        ])
+
+        self.assertFalse(results[0]['success'])
+        self.assertTrue(results[1]['success'])
+        self.assertEqual(self.stock_of(sku), 6)
+
+    def test_bulk_set_rejects_hot_sku(self):
+        sku = self.create_sku('BULK-5', 4)
+        ProductSKU.objects.filter(pk=sku.pk).update(is_hot_stock=True)
+
+        results = self.service.bulk_set_stock([{'sku_id': sku.pk, 'stock_quantity': 1}])
+        self.assertFalse(results[0]['success'])
+        self.assertEqual(self.stock_of(sku), 4)
+
+
+@mock.patch('apps.products.hotstock.cache_is_shared', return_value=True)
+class HotStockTests(StockTestCase):
+    """热点库存计数器：扣减、归还、写回"""
+
+    def setUp(self):
+        super().setUp()
+        self.sku = self.create_sku('HOT-1', 5)
+        self.hot = HotStockService(self.tenant.schema_name)
+
+    def test_reserve_release_flush_round_trip(self, _shared):
+        self.hot.enable(self.sku)
+        self.assertEqual(self.hot.available(self.sku.pk), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.reserve([(self.sku.pk, 3)], reference_id='A')
+        # 计数器扣减，数据库库存等待写回
+        self.assertEqual(self.hot.available(self.sku.pk), 2)
+        self.assertEqual(self.stock_of(self.sku), 5)
+
+        with self.assertRaises(InsufficientStockError):
+            self.service.reserve([(self.sku.pk, 3)], reference_id='B')
+        self.assertEqual(self.hot.available(self.sku.pk), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.release([(self.sku.pk, 1)], reference_id='A')
+        self.assertEqual(self.hot.available(self.sku.pk), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.hot.flush(), {self.sku.pk: 2})
+        self.assertEqual(self.stock_of(self.sku), 3)
+        self.assertEqual(
+            list(InventoryLog.objects.filter(sku=self.sku).values_list('action', 'quantity_change')),
+            [('sale', -2)]
+        )
+        # 已写回的数量不会重复写回
+        self.assertEqual(self.hot.flush(), {})
+
+    def test_revert_hot_changes_gives_back_counter(self, _shared):
+        self.hot.enable(self.sku)
+
+        self.service.reserve([(self.sku.pk, 2)])
+        self.assertEqual(self.hot.available(self.sku.pk), 3)
+        self.service.revert_hot_changes()
+        self.assertEqual(self.hot.available(self.sku.pk), 5)
+
+    def test_late_record_after_disable_is_written_back(self, _shared):
+        self.hot.enable(self.sku)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.service.reserve([(self.sku.pk, 2)])
+
+        self.hot.disable(self.sku)
+        self.assertEqual(self.stock_of(self.sku), 5)
+
+        # 关闭后才执行的提交回调直接写回数据库
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.stock_of(self.sku), 3)
+
+    def test_enable_requires_shared_cache(self, shared):
+        shared.return_value = False
+        with self.assertRaises(HotStockUnavailable):
+            self.hot.enable(self.sku)
+        self.assertFalse(ProductSKU.objects.get(pk=self.sku.pk).is_hot_stock)
+
+
+class RefreshStockCachesTests(StockTestCase):
+    """库存写入后的缓存失效：只有跨过 0 的 SKU 所属商品丢弃菜单片段"""
+
+    def setUp(self):
+        super().setUp()
+        self.other = Product.objects.create(
+            shop=self.tenant, name='另一个商品', base_price=Decimal('10.00'), status='active'
+        )
+        self.patchers = {
+            name: mock.patch.object(services, name)
+            for name in ('MenuSnapshotService', 'ProductDetailCache', 'sync_availability', 'bump_catalog_version')
+        }
+        self.mocks = {name: patcher.start() for name, patcher in self.patchers.items()}
+        for patcher in self.patchers.values():
+            self.addCleanup(patcher.stop)
+
+    def test_only_flipped_skus_invalidate_menu(self):
+        refresh_stock_caches({1: self.product.pk, 2: self.other.pk}, [2], self.tenant.schema_name)
+
+        self.mocks['ProductDetailCache'].invalidate_stock.assert_called_once_with(
+            {self.product.pk, self.other.pk}, self.tenant.schema_name
+        )
+        self.mocks['MenuSnapshotService'].invalidate_products.assert_called_once_with(
+            {self.other.pk}, self.tenant.schema_name
+        )
+        self.mocks['sync_availability'].assert_called_once_with({self.other.pk}, self.tenant.schema_name)
+        self.mocks['bump_catalog_version'].assert_called_once_with(self.tenant.schema_name)
+
+    def test_no_flip_only_drops_stock_overlay(self):
+        refresh_stock_caches({1: self.product.pk}, [], self.tenant.schema_name)
+
+        self.mocks['ProductDetailCache'].invalidate_stock.assert_called_once()
+        self.mocks['MenuSnapshotService'].invalidate_products.assert_not_called()
+        self.mocks['sync_availability'].assert_not_called()
+        self.mocks['bump_catalog_version'].assert_not_called()
+
+    def test_reserve_passes_flipped_skus(self):
+        sold_out = self.create_sku('FLIP-1', 1)
+        remaining = self.create_sku('FLIP-2', 5)
+
+        with mock.patch.object(services, 'refresh_stock_caches') as refresh:
+            self.service.reserve([(sold_out.pk, 1), (remaining.pk, 1)])
+
+        sku_products, flipped, _ = refresh.call_args.args
+        self.assertEqual(sku_products, {sold_out.pk: self.product.pk, remaining.pk: self.product.pk})
+        self.assertEqual(flipped, [sold_out.pk])
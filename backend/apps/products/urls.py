@@ -3,8 +3,10 @@ from rest_framework.routers import DefaultRouter
 
 from .api import (
     CategoryViewSet, ProductViewSet, SpecificationViewSet,
-    ProductSKUViewSet, InventoryLogView, bulk_stock_update,
-    low_stock_alert, public_products
+    ProductSKUViewSet, ProductBarcodeViewSet, IngredientViewSet, RecipeItemViewSet,
+    InventoryLogView, bulk_stock_update,
+    low_stock_alert, stock_history, public_products, public_menu, public_search,
+    public_autocomplete, public_resolve_sku, public_catalog_changes, public_menu_availability
 )
 
 router = DefaultRouter()
@@ -12,11 +14,21 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'specifications', SpecificationViewSet)
 router.register(r'skus', ProductSKUViewSet)
+router.register(r'barcodes', ProductBarcodeViewSet)
+router.register(r'ingredients', IngredientViewSet)
+router.register(r'recipe-items', RecipeItemViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('inventory/logs/', InventoryLogView.as_view(), name='inventory-logs'),
     path('inventory/bulk-update/', bulk_stock_update, name='bulk-stock-update'),
     path('inventory/low-stock-alert/', low_stock_alert, name='low-stock-alert'),
+    path('inventory/history/', stock_history, name='stock-history'),
     path('public/products/', public_products, name='public-products'),
+    path('public/menu/', public_menu, name='public-menu'),
+    path('public/menu/availability/', public_menu_availability, name='public-menu-availability'),
+    path('public/search/', public_search, name='public-search'),
+    path('public/autocomplete/', public_autocomplete, name='public-autocomplete'),
+    path('public/products/<int:product_id>/sku/', public_resolve_sku, name='public-resolve-sku'),
+    path('public/catalog/changes/', public_catalog_changes, name='public-catalog-changes'),
 ]
\ No newline at end of file
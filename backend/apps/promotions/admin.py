@@ -14,12 +14,14 @@ class UserCouponAdmin(admin.ModelAdmin):
     list_display = ['user', 'coupon', 'status', 'used_at', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'coupon__name']
+    list_select_related = ['user', 'coupon']
 
 @admin.register(CouponRule)
 class CouponRuleAdmin(admin.ModelAdmin):
     list_display = ['name', 'rule_type', 'coupon', 'is_active']
     list_filter = ['rule_type', 'is_active', 'shop']
     search_fields = ['name']
+    list_select_related = ['coupon']
 
 @admin.register(Promotion)
 class PromotionAdmin(admin.ModelAdmin):
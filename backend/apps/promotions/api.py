@@ -1,4 +1,7 @@
+from apps.core.conditional import conditional_get
 from apps.core.permissions import IsShopOwnerOrStaff
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
 from rest_framework import permissions, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
@@ -192,8 +195,21 @@ def available_coupons(request):
     return Response(serializer.data)
 
 
+def current_promotions_version(request):
+    """当前有效促销的版本戳（数量、ID 之和与最后修改时间）"""
+    now = timezone.now()
+    stamp = Promotion.objects.filter(
+        shop=request.tenant,
+        is_active=True,
+        valid_from__lte=now,
+        valid_until__gte=now
+    ).aggregate(count=Count('id'), id_sum=Sum('id'), updated=Max('updated_at'))
+    return f"{stamp['count']}:{stamp['id_sum']}:{stamp['updated']}"
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(current_promotions_version)
 def current_promotions(request):
     """获取当前促销活动"""
     promotion_service = PromotionService(request.tenant)
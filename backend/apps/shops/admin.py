@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django_tenants.admin import TenantAdminMixin
 
+from apps.core.admin_utils import is_tenant_manager
 from .models import Shop, Domain, ShopStaff, ShopSettings
 
 User = get_user_model()
@@ -42,32 +43,12 @@ class ShopAdmin(TenantAdminMixin, admin.ModelAdmin):
     )
 
     def has_view_permission(self, request, obj=None):
-        """控制查看权限"""
-        if request.user.is_superuser:
-            return True
-        # 租户管理员可以查看自己管理的店铺
-        if hasattr(request, 'tenant'):
-            return ShopStaff.objects.filter(
-                user=request.user,
-                shop=request.tenant,
-                is_active=True,
-                role__in=['owner', 'manager']
-            ).exists()
-        return False
+        """控制查看权限 - 租户管理员可以查看自己管理的店铺"""
+        return is_tenant_manager(request)
 
     def has_change_permission(self, request, obj=None):
-        """控制编辑权限"""
-        if request.user.is_superuser:
-            return True
-        # 只有店主和店长可以编辑
-        if hasattr(request, 'tenant'):
-            return ShopStaff.objects.filter(
-                user=request.user,
-                shop=request.tenant,
-                is_active=True,
-                role__in=['owner', 'manager']
-            ).exists()
-        return False
+        """控制编辑权限 - 只有店主和店长可以编辑"""
+        return is_tenant_manager(request)
 
     def has_delete_permission(self, request, obj=None):
         """控制删除权限 - 只有超级管理员可以删除"""
@@ -82,6 +63,7 @@ class TableAdmin(admin.ModelAdmin):
     list_display = ['table_number', 'table_name', 'shop', 'table_type', 'status', 'min_capacity', 'max_capacity']
     list_filter = ['table_type', 'status', 'shop']
     search_fields = ['table_number', 'table_name']
+    list_select_related = ['shop']
 
     actions = ['generate_qr_codes']
 
@@ -102,9 +84,11 @@ class ShopStaffAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_filter = ('role', 'is_active', 'shop')
     search_fields = ('user__username', 'user__email', 'shop__name')
     raw_id_fields = ('user', 'shop')
+    list_select_related = ('user', 'shop')
 
 
 @admin.register(ShopSettings)
 class ShopSettingsAdmin(TenantAdminMixin, admin.ModelAdmin):
     list_display = ('shop', 'auto_confirm_order', 'points_enabled', 'updated_at')
     search_fields = ('shop__name',)
+    list_select_related = ('shop',)
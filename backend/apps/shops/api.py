@@ -1,8 +1,10 @@
 from django.db import transaction
+from django.db.models import Max
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
+from apps.core.conditional import ConditionalGetMixin
 from .models import Shop, ShopStaff, ShopSettings
 from .serializers import (
     ShopSerializer,
@@ -51,10 +53,20 @@ class ShopListView(generics.ListCreateAPIView):
         )
 
 
-class ShopDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ShopDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Shop.objects.all()
     serializer_class = ShopSerializer
     permission_classes = [permissions.IsAuthenticated]
+    conditional_actions = ('retrieve',)
+
+    def get_conditional_last_modified(self, request, action_name):
+        # 店铺及其设置的最后修改时间
+        stamps = self.get_queryset().filter(pk=self.kwargs.get('pk')).aggregate(
+            shop_updated=Max('updated_at'),
+            settings_updated=Max('settings__updated_at')
+        )
+        values = [value for value in stamps.values() if value is not None]
+        return max(values) if values else None
 
     def get_queryset(self):
         user = self.request.user
@@ -32,6 +32,7 @@ class MembershipLevelConfigAdmin(admin.ModelAdmin):
     list_display = ['level', 'name', 'shop', 'min_points', 'discount_rate', 'is_active']
     list_filter = ['level', 'is_active', 'shop']
     search_fields = ['name']
+    list_select_related = ['shop']
 
 
 @admin.register(PointsRule)
@@ -39,6 +40,7 @@ class PointsRuleAdmin(admin.ModelAdmin):
     list_display = ['rule_type', 'name', 'shop', 'is_active']
     list_filter = ['rule_type', 'is_active', 'shop']
     search_fields = ['name']
+    list_select_related = ['shop']
 
 
 @admin.register(PointsLog)
@@ -47,6 +49,7 @@ class PointsLogAdmin(admin.ModelAdmin):
     list_filter = ['points_type', 'created_at', 'shop']
     search_fields = ['user__username']
     readonly_fields = ['created_at']
+    list_select_related = ['user']
 
 
 @admin.register(MemberRecharge)
@@ -54,3 +57,4 @@ class MemberRechargeAdmin(admin.ModelAdmin):
     list_display = ['user', 'recharge_amount', 'gift_amount', 'payment_status', 'created_at']
     list_filter = ['payment_status', 'created_at', 'shop']
     search_fields = ['user__username']
+    list_select_related = ['user']
@@ -6,8 +6,8 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from .authentication import ClaimsRefreshToken, revoke_user_tokens
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -26,7 +26,7 @@ class RegisterView(APIView):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'refresh': str(refresh),
@@ -45,7 +45,7 @@ class LoginView(APIView):
         if serializer.is_valid():
             user = serializer.validated_data['user']
             login(request, user)
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'refresh': str(refresh),
@@ -92,6 +92,9 @@ class ChangePasswordView(APIView):
 
             user.set_password(serializer.validated_data['new_password'])
             user.save()
+
+            # 修改密码后旧令牌全部失效
+            revoke_user_tokens(user)
             return Response({"message": "密码修改成功"}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,143 @@
+"""
+JWT 认证快速通道
+令牌中签入用户类型、会员等级和令牌版本，读请求优先使用缓存的认证字段（不缓存密码哈希等其他字段），
+令牌版本号变化时旧令牌全部失效；停用账号、变更用户类型时自动递增令牌版本号
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import TokenClaimsUser
+
+User = get_user_model()
+
+TOKEN_VERSION_CLAIM = 'ver'
+USER_CACHE_TIMEOUT = 300
+# 读请求缓存的用户字段，其余字段为延迟字段，访问时从数据库读取
+USER_CACHE_FIELDS = (
+    'id', 'username', 'is_active', 'is_staff', 'is_superuser', 'user_type', 'membership_level', 'token_version'
+)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _version_cache_key(user_id):
+    return f'auth:ver:{user_id}'
+
+
+def _user_cache_key(user_id):
+    return f'auth:user_fields:{user_id}'
+
+
+def get_token_version(user_id):
+    """获取用户当前的令牌版本号（带缓存）"""
+    key = _version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+        if version is None:
+            return None
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate_user_cache(user):
+    """
+    用户信息变更后清除缓存（立即清除，事务提交后再清除一次）
+    不写入内存中的令牌版本号：实例可能已过期，下次认证时从数据库重新读取
+    """
+    keys = [_user_cache_key(user.pk), _version_cache_key(user.pk)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def revoke_user_tokens(user):
+    """递增令牌版本号，使该用户已签发的全部令牌失效"""
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    invalidate_user_cache(user)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """签入用户声明的刷新令牌（访问令牌会复制这些声明）"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['username'] = user.username
+        token['user_type'] = user.user_type
+        token['membership_level'] = user.membership_level
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    带用户缓存的 JWT 认证
+    - 令牌版本号与用户当前版本不一致时拒绝
+    - 读请求使用缓存的认证字段构造用户对象（其余字段延迟加载）；视图设置 trust_token_claims = True 时，
+      直接根据令牌声明构造用户，不访问数据库
+    - 写请求始终从数据库加载用户
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_request_user(request, validated_token), validated_token
+
+    def get_request_user(self, request, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('令牌中缺少用户标识')
+
+        version = get_token_version(user_id)
+        if version is None:
+            raise AuthenticationFailed('用户不存在', code='user_not_found')
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != version:
+            raise AuthenticationFailed('令牌已失效，请重新登录', code='token_revoked')
+
+        if request.method not in SAFE_METHODS:
+            return self.get_user(validated_token)
+
+        view = (getattr(request, 'parser_context', None) or {}).get('view')
+        if getattr(view, 'trust_token_claims', False) and 'user_type' in validated_token:
+            return self.get_claims_user(user_id, validated_token)
+
+        return self.get_cached_user(user_id, validated_token)
+
+    def get_cached_user(self, user_id, validated_token):
+        """
+        只缓存 USER_CACHE_FIELDS 中的字段值，由此构造只加载了这些字段的用户实例；
+        视图访问资料等其他字段时按延迟字段从数据库读取，不会读到过期数据
+        """
+        key = _user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = self.get_user(validated_token)
+            cache.set(key, [getattr(user, name) for name in USER_CACHE_FIELDS], USER_CACHE_TIMEOUT)
+        else:
+            user = User.from_db(User.objects.db, USER_CACHE_FIELDS, values)
+        if not user.is_active:
+            raise AuthenticationFailed('用户已被禁用', code='user_inactive')
+        return user
+
+    def get_claims_user(self, user_id, validated_token):
+        """由令牌声明构造未保存的用户对象（仅包含 id、用户名、用户类型和会员等级）"""
+        return TokenClaimsUser(
+            pk=user_id,
+            username=validated_token.get('username', ''),
+            user_type=validated_token['user_type'],
+            membership_level=validated_token.get('membership_level', 'regular'),
+        )
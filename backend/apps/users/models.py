@@ -50,13 +50,50 @@ class User(AbstractUser):
                                  verbose_name='推荐人')
     referral_code = models.CharField(max_length=20, unique=True, blank=True, null=True, verbose_name='推荐码')
 
+    # 令牌版本（递增后已签发的 JWT 全部失效）
+    token_version = models.PositiveIntegerField(default=0, verbose_name='令牌版本')
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # 变更后需要使已签发令牌失效的字段（令牌中签入了用户类型，停用账号需立即生效）
+    TOKEN_FIELDS = ('is_active', 'user_type')
+
     class Meta:
         db_table = 'users'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_token_fields = {
+            name: getattr(instance, name) for name in cls.TOKEN_FIELDS if name in field_names
+        }
+        return instance
+
+    def _bump_token_version_if_needed(self, update_fields):
+        loaded = getattr(self, '_loaded_token_fields', None)
+        if not loaded:
+            return update_fields
+
+        changed = [
+            name for name, value in loaded.items()
+            if getattr(self, name) != value and (update_fields is None or name in update_fields)
+        ]
+        if not changed:
+            return update_fields
+
+        self.token_version += 1
+        self._loaded_token_fields.update({name: getattr(self, name) for name in changed})
+        if update_fields is not None:
+            update_fields = {*update_fields, 'token_version'}
+        return update_fields
+
     def save(self, *args, **kwargs):
+        if 'update_fields' in kwargs:
+            kwargs['update_fields'] = self._bump_token_version_if_needed(kwargs['update_fields'])
+        else:
+            self._bump_token_version_if_needed(None)
+
         # 先保存以获取id
         super().save(*args, **kwargs)
 
@@ -88,6 +125,19 @@ class User(AbstractUser):
         return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
 
+class TokenClaimsUser(User):
+    """由 JWT 声明构造的只读用户，仅包含 id、用户名、用户类型和会员等级"""
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError('令牌声明用户是只读对象，不能保存')
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('令牌声明用户是只读对象，不能删除')
+
+
 def get_anonymous_user_instance():
     """获取匿名用户实例（用于Guardian）"""
     from django.contrib.auth.models import AnonymousUser
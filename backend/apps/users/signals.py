@@ -0,0 +1,13 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user_cache
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """用户信息变更后清除认证缓存"""
+    invalidate_user_cache(instance)
@@ -62,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.AllocationTrackingMiddleware',  # 内存分配跟踪（默认关闭）
 ]
 
 # 模板配置
@@ -93,6 +94,24 @@ DATABASES = {
     }
 }
 
+# 缓存配置（配置 REDIS_URL 时使用 Redis，否则使用本地内存缓存）
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'zdrink',
+        }
+    }
+
 # 多租户配置
 SHARED_APPS = [
     'django_tenants',
@@ -102,6 +121,7 @@ SHARED_APPS = [
     'django.contrib.messages',
     'django.contrib.admin',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -178,10 +198,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # JWT 优先（带用户缓存），会话和 Basic 认证仅作为后备
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'apps.users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -228,6 +249,13 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
 }
+
+# 预生成的 Schema 文件（python manage.py build_api_schema）
+API_SCHEMA_PATH = config('API_SCHEMA_PATH', default=os.path.join(BASE_DIR, 'schema', 'openapi.json'))
+# Schema 文件的构建标识（如部署的提交号），与文件中记录的不一致时忽略预生成文件；
+# 留空时使用后端源码和 API 文档配置的哈希，每次代码变化都会不同
+API_SCHEMA_BUILD = config('API_SCHEMA_BUILD', default='')
+
 # 租户配置
 TENANT_LIMIT_SET_CALLS = True
 
@@ -244,5 +272,21 @@ GUARDIAN_GET_INIT_ANONYMOUS_USER = 'apps.users.models.get_anonymous_user_instanc
 FEIE_USER = config('FEIE_USER', default='')
 FEIE_UKEY = config('FEIE_UKEY', default='')
 
+# 内存分配跟踪（tracemalloc，会带来明显的性能开销，仅在排查问题时开启）
+MEMORY_PROFILING_ENABLED = config('MEMORY_PROFILING_ENABLED', default=False, cast=bool)
+MEMORY_PROFILING_SAMPLE_RATE = config('MEMORY_PROFILING_SAMPLE_RATE', default=0.01, cast=float)
+MEMORY_PROFILING_FRAMES = config('MEMORY_PROFILING_FRAMES', default=10, cast=int)
+
 # 前端URL（用于生成二维码）
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
+
+# 未支付订单的库存保留时间（分钟），超时后由 release_expired_orders 取消订单并归还库存
+STOCK_RESERVATION_MINUTES = config('STOCK_RESERVATION_MINUTES', default=15, cast=int)
+
+# 商品图片缩略图（WebP），上传时在进程池中生成，见 apps.products.images
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1080)
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+
+# 低库存预警通知的最短间隔（秒），期间产生的预警合并到下一次通知，见 apps.products.alerts
+STOCK_ALERT_DEBOUNCE_SECONDS = config('STOCK_ALERT_DEBOUNCE_SECONDS', default=300, cast=int)